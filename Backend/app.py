@@ -1,6 +1,9 @@
 from app import create_app
+from app.services.report_jobs import report_jobs
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Not at import time: spawned process pool workers re-import this module as __mp_main__
+    report_jobs.start()
     app.run(debug=True)
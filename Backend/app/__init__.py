@@ -35,6 +35,7 @@ def create_app():
     CORS(app, 
          origins=allowed_origins,
          allow_headers=['Content-Type', 'Authorization'],
+         expose_headers=['Content-Disposition', 'X-File-Path'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
          supports_credentials=True)
     
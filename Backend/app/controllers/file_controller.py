@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify, send_from_directory, send_file
 from flask_cors import cross_origin
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from app.services.file_service import extract_file_data
+from app.services.file_service import extract_file_data, extract_source_data
+from app.services.dxf_source import DxfSource
+from app.services.dxf_streaming import EXTRACTION_MODES
+from app.services.extraction_profiles import resolve_extraction_profile
+from app.services.polyline_set import serialize_extraction_result
 from app.storage import storage_service
 import logging
 import os
@@ -161,13 +165,24 @@ def extract_data():
         logger.error(f"Format non supporté : {file.filename}")
         return jsonify({"error": "Seuls les fichiers .dxf sont acceptés"}), 400
     
-    result = extract_file_data(file)
+    mode = request.form.get('mode', 'auto')
+    if mode not in EXTRACTION_MODES:
+        logger.error(f"Mode d'extraction inconnu : {mode}")
+        return jsonify({"error": f"Mode d'extraction inconnu : {mode}"}), 400
+    
+    try:
+        profile = resolve_extraction_profile(request.form.get('profile'), request.form.get('layers'))
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    
+    result = extract_file_data(file, mode, profile)
     if "error" in result:
         logger.error(f"Erreur d'extraction : {result['error']}")
         return jsonify(result), 400
     
     logger.debug("Données extraites avec succès")
-    return jsonify(result), 200
+    return jsonify(serialize_extraction_result(result, request.form.get('geometry'))), 200
 
 @file_blueprint.route("/api/transfer-files", methods=["POST"])
 @cross_origin()
@@ -390,11 +405,22 @@ def extract_data_from_file():
         data = request.get_json()
         filename = data.get("filename")
         folder = data.get("folder", "")  # Path relative to user folder
+        mode = data.get("mode", "auto")  # 'auto', 'full' or 'streaming'
 
         if not filename:
             logger.error("Nom de fichier manquant")
             return jsonify({"error": "Nom de fichier requis"}), 400
 
+        if mode not in EXTRACTION_MODES:
+            logger.error(f"Mode d'extraction inconnu : {mode}")
+            return jsonify({"error": f"Mode d'extraction inconnu : {mode}"}), 400
+
+        try:
+            profile = resolve_extraction_profile(data.get("profile"), data.get("layers"))
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
         user_folder_path = get_user_folder_path()
         if not user_folder_path or not os.path.exists(user_folder_path):
             logger.error("Dossier utilisateur non trouvé ou inaccessible")
@@ -408,22 +434,15 @@ def extract_data_from_file():
             logger.error(f"Fichier non trouvé : {file_path}")
             return jsonify({"error": f"Fichier non trouvé : {filename}"}), 404
 
-        # Open the file and wrap it as a FileStorage object
-        with open(file_path, 'rb') as f:
-            file_content = f.read()  # Read the entire file content
-            file_obj = FileStorage(
-                stream=io.BytesIO(file_content),  # Wrap in BytesIO for FileStorage
-                filename=filename,
-                content_type='application/octet-stream'  # Generic binary type
-            )
-            result = extract_file_data(file_obj)
+        # Parse the file in place, no in-memory copy or temporary file
+        result = extract_source_data(DxfSource.from_path(file_path, filename), mode, profile)
 
         if "error" in result:
             logger.error(f"Erreur d'extraction : {result['error']}")
             return jsonify(result), 400
 
         logger.debug(f"Données extraites pour : {filename}")
-        return jsonify(result), 200
+        return jsonify(serialize_extraction_result(result, data.get("geometry"))), 200
 
     except Exception as e:
         logger.error(f"Erreur lors de l'extraction : {str(e)}", exc_info=True)
@@ -17,11 +17,25 @@ from folder_service import (
     get_folder_files,
     transfer_files,
     extract_data_from_file,
+    probe_dxf_file,
+    extract_data_batch,
+    extract_data_summary,
+    extract_data_page,
+    get_extraction_cache_stats,
+    get_process_pool_stats,
+    cancel_process_pool_task,
     get_visa_content,
     download_visa_file,
     generate_visa_file,
     generate_excel_file,
-    download_excel_file
+    generate_project_excel_file,
+    generate_report_files,
+    download_excel_file,
+    submit_report_job,
+    get_report_job,
+    follow_report_job,
+    download_report_job_artifact,
+    get_report_jobs_stats
 )
 
 # Create a blueprint with a URL prefix to match what the frontend expects
@@ -47,6 +61,34 @@ def transfer_files_route():
 def extract_data_route():
     return extract_data_from_file()
 
+@folder_service_blueprint.route('/extract-data-batch', methods=['POST'])
+def extract_data_batch_route():
+    return extract_data_batch()
+
+@folder_service_blueprint.route('/probe-dxf-file', methods=['POST'])
+def probe_dxf_file_route():
+    return probe_dxf_file()
+
+@folder_service_blueprint.route('/extract-data-summary', methods=['POST'])
+def extract_data_summary_route():
+    return extract_data_summary()
+
+@folder_service_blueprint.route('/extract-data-page', methods=['POST'])
+def extract_data_page_route():
+    return extract_data_page()
+
+@folder_service_blueprint.route('/extraction-cache-stats', methods=['GET'])
+def extraction_cache_stats_route():
+    return get_extraction_cache_stats()
+
+@folder_service_blueprint.route('/process-pool-stats', methods=['GET'])
+def process_pool_stats_route():
+    return get_process_pool_stats()
+
+@folder_service_blueprint.route('/process-pool/tasks/<int:task_id>/cancel', methods=['POST'])
+def cancel_process_pool_task_route(task_id):
+    return cancel_process_pool_task(task_id)
+
 @folder_service_blueprint.route('/get-visa-content', methods=['POST'])
 def get_visa_content_route():
     return get_visa_content()
@@ -63,6 +105,34 @@ def generate_visa_route():
 def generate_excel_route():
     return generate_excel_file()
 
+@folder_service_blueprint.route('/generate-report-files', methods=['POST'])
+def generate_report_files_route():
+    return generate_report_files()
+
+@folder_service_blueprint.route('/generate-project-excel-file', methods=['POST'])
+def generate_project_excel_route():
+    return generate_project_excel_file()
+
 @folder_service_blueprint.route('/download-excel-file', methods=['GET'])
 def download_excel_route():
     return download_excel_file()
+
+@folder_service_blueprint.route('/report-jobs', methods=['POST'])
+def submit_report_job_route():
+    return submit_report_job()
+
+@folder_service_blueprint.route('/report-jobs/stats', methods=['GET'])
+def report_jobs_stats_route():
+    return get_report_jobs_stats()
+
+@folder_service_blueprint.route('/report-jobs/<job_id>', methods=['GET'])
+def get_report_job_route(job_id):
+    return get_report_job(job_id)
+
+@folder_service_blueprint.route('/report-jobs/<job_id>/events', methods=['GET'])
+def follow_report_job_route(job_id):
+    return follow_report_job(job_id)
+
+@folder_service_blueprint.route('/report-jobs/<job_id>/artifacts/<artifact>', methods=['GET'])
+def download_report_job_artifact_route(job_id, artifact):
+    return download_report_job_artifact(job_id, artifact)
@@ -0,0 +1,166 @@
+"""
+Catalog of SDP destinations and classifier of GEX_EDS_SDP_1 layer names.
+
+A layer such as 'GEX_EDS_SDP_1-HABITATION_L' is mapped to a destination
+key (exact match on the catalog first, then a partial match). A floor has
+thousands of polylines but only a handful of distinct layers, so each
+layer name is classified once and the answer is kept in a per-process LRU.
+The catalog can be replaced with a JSON file of {key: label}
+(DESTINATION_CATALOG_FILE).
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Destination keys found in GEX_EDS_SDP_1-<destination> layer names, with their display label
+DEFAULT_DESTINATIONS = {
+    "AUTRE_BUREAU": "Autre bureau",
+    "AUTRE_CONGRE": "Autre congrès exposition",
+    "AUTRE_ENTREP": "Autre entrepôt",
+    "AUTRE_INDUST": "Autre industrie",
+    "COMMERCE_ART": "Commerce artisanat",
+    "COMMERCE_AUT": "Commerce autre hébergement touristique",
+    "COMMERCE_CIN": "Commerce cinéma",
+    "COMMERCE_DE_": "Commerce de gros",
+    "COMMERCE_HOT": "Commerce hôtel",
+    "COMMERCE_RES": "Commerce restauration",
+    "COMMERCE_SER": "Commerce service accueil clientèle",
+    "EXPLOITATIO": "Exploitation forestière",
+    "EXPLOITATION": "Exploitation agricole",
+    "HABITATION_H": "Habitation hébergement",
+    "HABITATION_L": "Habitation logement",
+    "SPIC_ADMINIS": "Spic administration",
+    "SPIC_ART_SPE": "Spic art spectacle",
+    "SPIC_AUTRE": "Spic autre",
+    "SPIC_ENSEIGN": "Spic enseignement santé",
+    "SPIC_LT": "Spic lt",
+    "SPIC_SPORT": "Spic sport"
+}
+
+MAIN_LAYER = 'GEX_EDS_SDP_1'
+MAIN_LAYER_PREFIX = 'GEX_EDS_SDP_1-'
+
+# Layer suffixes rewritten before matching (seen in real drawings)
+SUFFIX_ALIASES = (("EXPLOITATIO0", "EXPLOITATIO"),)
+
+
+class DestinationCatalog:
+    """Destination keys and labels, with a memoized layer classifier."""
+
+    def __init__(self, labels: Optional[Mapping[str, str]] = None, max_layers: Optional[int] = None):
+        """
+        Args:
+            labels: Destination key -> display label, in matching order (DEFAULT_DESTINATIONS by default)
+            max_layers: Number of classified layer names kept (DESTINATION_CACHE_SIZE)
+        """
+        if max_layers is None:
+            max_layers = int(os.getenv('DESTINATION_CACHE_SIZE', '4096'))
+        self.labels: Dict[str, str] = dict(labels if labels is not None else DEFAULT_DESTINATIONS)
+        self._keys: Tuple[str, ...] = tuple(self.labels)
+        self.max_layers = max(1, max_layers)
+        self._layers: 'OrderedDict[str, Optional[str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'DestinationCatalog':
+        """Build the catalog from DESTINATION_CATALOG_FILE if set, the default destinations otherwise."""
+        path = os.getenv('DESTINATION_CATALOG_FILE')
+        if not path:
+            return cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+            if not isinstance(labels, dict) or not all(isinstance(v, str) for v in labels.values()):
+                raise ValueError("le fichier doit contenir un objet {clé: libellé}")
+            logger.info(f"Catalogue de destinations chargé depuis {path}: {len(labels)} destinations")
+            return cls(labels)
+        except (OSError, ValueError) as e:
+            logger.error(f"Catalogue de destinations illisible ({path}), catalogue par défaut utilisé: {str(e)}")
+            return cls()
+
+    def classify(self, layer: Any) -> Optional[str]:
+        """
+        Return the destination key of a GEX_EDS_SDP_1 layer.
+
+        Args:
+            layer: Layer name
+
+        Returns:
+            str: Catalog key (exact then partial match) or the raw layer suffix,
+                None if the layer is not a SDP_1 layer
+        """
+        if not isinstance(layer, str):
+            logger.warning(f"Layer n'est pas une chaîne: {layer}")
+            return None
+
+        with self._lock:
+            if layer in self._layers:
+                self._layers.move_to_end(layer)
+                return self._layers[layer]
+
+        destination = self._classify(layer)
+        with self._lock:
+            self._layers[layer] = destination
+            while len(self._layers) > self.max_layers:
+                self._layers.popitem(last=False)
+        return destination
+
+    def _classify(self, layer: str) -> Optional[str]:
+        if MAIN_LAYER not in layer:
+            return None
+
+        parts = layer.split(MAIN_LAYER_PREFIX)
+        if len(parts) < 2:
+            return None
+
+        raw_destination = parts[1]
+        if raw_destination.endswith('_'):
+            raw_destination = raw_destination[:-1]
+        for alias, replacement in SUFFIX_ALIASES:
+            if alias in raw_destination:
+                raw_destination = replacement
+
+        if raw_destination in self.labels:
+            destination = raw_destination
+        else:
+            destination = next((key for key in self._keys if key in raw_destination or raw_destination in key),
+                               raw_destination)
+        logger.info(f"Calque {layer} classé dans la destination {destination}")
+        return destination
+
+    def label(self, destination: str, humanize: bool = False) -> str:
+        """
+        Display label of a destination key.
+
+        Args:
+            destination: Destination key
+            humanize: For unknown keys, turn 'SOME_KEY' into 'Some key' instead of keeping the key
+        """
+        if humanize:
+            return self.labels.get(destination, destination.replace('_', ' ').lower().capitalize())
+        return self.labels.get(destination, destination)
+
+    def group(self, polylines: Iterable[Dict[str, Any]]) -> Tuple[List[Optional[str]], Dict[str, List[int]]]:
+        """
+        Classify polylines in a single pass.
+
+        Returns:
+            tuple: (destination of each polyline, positions of the polylines of each
+                destination in first-seen order)
+        """
+        destinations = [self.classify(polyline.get('layer', '')) for polyline in polylines]
+        groups: Dict[str, List[int]] = {}
+        for position, destination in enumerate(destinations):
+            if destination:
+                groups.setdefault(destination, []).append(position)
+        return destinations, groups
+
+
+# Global destination catalog instance
+destination_catalog = DestinationCatalog.from_env()
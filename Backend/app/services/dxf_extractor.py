@@ -0,0 +1,271 @@
+"""
+Single-pass entity extraction shared by every DXF extraction path.
+
+Each supported DXF type registers one handler in a dispatch table. The
+DXF attributes a handler needs are resolved once per entity class (their
+DXF defaults and whether the class defines them at all), so extracting an
+entity is a dict lookup on its type followed by plain dict reads on its
+attribute namespace. Types the caller did not ask for are skipped on the
+type lookup, before any attribute is read.
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ezdxf.lldxf.attributes import XType
+
+from app.services.extraction_profiles import ALL_ENTITY_TYPES, ExtractionProfile
+from app.services.polyline_set import PolylineSetBuilder
+
+logger = logging.getLogger(__name__)
+
+# Attributes read for every entity, before the handler-specific ones
+COMMON_ATTRIBUTES = ('layer', 'color', 'lineweight')
+
+# Entity collections of an extraction result, besides the polyline set
+ENTITY_LISTS = ('lines', 'circles', 'arcs', 'texts')
+
+Handler = Callable[[Any, Sequence[Any], 'EntityExtractor'], None]
+
+# dxftype -> (handler, attribute names)
+_HANDLERS: Dict[str, Tuple[Handler, Tuple[str, ...]]] = {}
+
+
+def register_handler(dxftype: str, attributes: Sequence[str] = ()):
+    """
+    Register the extraction handler of a DXF type.
+
+    The handler is called as handler(entity, values, extractor), where values
+    holds COMMON_ATTRIBUTES followed by attributes, in order.
+
+    Args:
+        dxftype: DXF type handled, e.g. 'LINE'
+        attributes: DXF attributes the handler reads besides COMMON_ATTRIBUTES
+    """
+    def decorator(handler: Handler) -> Handler:
+        _HANDLERS[dxftype] = (handler, COMMON_ATTRIBUTES + tuple(attributes))
+        return handler
+    return decorator
+
+
+def registered_types() -> Tuple[str, ...]:
+    return tuple(_HANDLERS)
+
+
+def _display_color(color: int):
+    return color if color != 0 else 'N/A'
+
+
+@register_handler('LWPOLYLINE')
+def _extract_lwpolyline(entity, values, extractor):
+    layer, color, lineweight = values
+    extractor.polylines.add('LWPOLYLINE', layer, entity.get_points(), entity.closed, color, lineweight)
+
+
+@register_handler('POLYLINE')
+def _extract_polyline(entity, values, extractor):
+    layer, color, lineweight = values
+    extractor.polylines.add('POLYLINE', layer, entity.points(), entity.is_closed, color, lineweight)
+
+
+@register_handler('LINE', ('start', 'end'))
+def _extract_line(entity, values, extractor):
+    layer, color, lineweight, start, end = values
+    extractor.lines.append({
+        'type': 'LINE',
+        'layer': layer,
+        'start': {'x': start[0], 'y': start[1]},
+        'end': {'x': end[0], 'y': end[1]},
+        'color': _display_color(color),
+        'lineweight': lineweight
+    })
+
+
+@register_handler('CIRCLE', ('center', 'radius'))
+def _extract_circle(entity, values, extractor):
+    layer, color, lineweight, center, radius = values
+    extractor.circles.append({
+        'type': 'CIRCLE',
+        'layer': layer,
+        'center': {'x': center[0], 'y': center[1]},
+        'radius': radius,
+        'color': _display_color(color),
+        'lineweight': lineweight
+    })
+
+
+@register_handler('ARC', ('center', 'radius', 'start_angle', 'end_angle'))
+def _extract_arc(entity, values, extractor):
+    layer, color, lineweight, center, radius, start_angle, end_angle = values
+    extractor.arcs.append({
+        'type': 'ARC',
+        'layer': layer,
+        'center': {'x': center[0], 'y': center[1]},
+        'radius': radius,
+        'start_angle': start_angle,
+        'end_angle': end_angle,
+        'color': _display_color(color),
+        'lineweight': lineweight
+    })
+
+
+@register_handler('TEXT', ('text', 'insert', 'height'))
+def _extract_text(entity, values, extractor):
+    layer, color, lineweight, text, insert, height = values
+    extractor.texts.append({
+        'type': 'TEXT',
+        'layer': layer,
+        'text': text,
+        'position': {'x': insert[0], 'y': insert[1]},
+        'height': height,
+        'color': _display_color(color),
+        'lineweight': lineweight
+    })
+
+
+class _AttributeReader:
+    """Reads a fixed list of DXF attributes of one entity class."""
+
+    __slots__ = ('plain', 'specs')
+
+    def __init__(self, entity_class: type, names: Sequence[str]):
+        # (name, default, kind): 0 = stored or DXF default, 1 = computed by ezdxf, 2 = undefined (None)
+        specs = []
+        for name in names:
+            attrib = entity_class.DXFATTRIBS.get(name)
+            if attrib is None:
+                specs.append((name, None, 2))
+            elif attrib.xtype == XType.callback:
+                specs.append((name, None, 1))
+            else:
+                specs.append((name, attrib.default, 0))
+        self.specs = tuple(specs)
+        self.plain = all(kind == 0 for _, _, kind in specs)
+
+    def read(self, dxf) -> List[Any]:
+        values = dxf.__dict__
+        if self.plain:
+            return [values.get(name, default) for name, default, _ in self.specs]
+        return [values.get(name, default) if kind == 0 else (getattr(dxf, name) if kind == 1 else None)
+                for name, default, kind in self.specs]
+
+
+class EntityExtractor:
+    """Accumulates extracted entities of the requested types and layers."""
+
+    def __init__(self, profile: Optional[ExtractionProfile] = None):
+        """
+        Args:
+            profile: Entity type and layer filter, None to extract every registered type
+        """
+        types = profile.types if profile is not None else ALL_ENTITY_TYPES
+        self._handlers = {dxftype: _HANDLERS[dxftype] for dxftype in types if dxftype in _HANDLERS}
+        self._layer_filter = profile.accepts_layer if profile is not None and profile.filters_layers else None
+        # Entity class -> (handler, attribute reader), built on first sight of the class
+        self._dispatch: Dict[type, Optional[Tuple[Handler, _AttributeReader]]] = {}
+
+        self.polylines = PolylineSetBuilder()
+        self.lines: List[Dict[str, Any]] = []
+        self.circles: List[Dict[str, Any]] = []
+        self.arcs: List[Dict[str, Any]] = []
+        self.texts: List[Dict[str, Any]] = []
+
+    def _resolve(self, entity_class: type, dxftype: str):
+        registered = self._handlers.get(dxftype)
+        entry = None
+        if registered is not None:
+            handler, names = registered
+            entry = (handler, _AttributeReader(entity_class, names))
+        self._dispatch[entity_class] = entry
+        return entry
+
+    def add(self, entity) -> bool:
+        """
+        Extract one entity if its type and layer are requested.
+
+        Returns:
+            bool: True if the entity was extracted
+        """
+        entity_class = type(entity)
+        try:
+            entry = self._dispatch[entity_class]
+        except KeyError:
+            entry = self._resolve(entity_class, entity.dxftype())
+        if entry is None:
+            return False
+
+        handler, reader = entry
+        values = reader.read(entity.dxf)
+        if self._layer_filter is not None and not self._layer_filter(values[0]):
+            return False
+        handler(entity, values, self)
+        return True
+
+    def extract(self, entities: Iterable) -> 'EntityExtractor':
+        """Extract every entity of an iterable (modelspace or stream reader)."""
+        add = self.add
+        for entity in entities:
+            add(entity)
+        return self
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "polyline_count": len(self.polylines),
+            "line_count": len(self.lines),
+            "circle_count": len(self.circles),
+            "arc_count": len(self.arcs),
+            "text_count": len(self.texts)
+        }
+
+    def result(self, layers: List[Dict[str, Any]], total_entities: int) -> Dict[str, Any]:
+        """
+        Build the extraction result returned by extract_file_data.
+
+        Args:
+            layers: Layer table entries
+            total_entities: Number of modelspace entities, extracted or not
+
+        Returns:
+            dict: layers, polylines (PolylineSet), lines, circles, arcs, texts and statistics
+        """
+        statistics = {"layer_count": len(layers)}
+        statistics.update(self.counts())
+        statistics["total_entities"] = total_entities
+        return {
+            "layers": layers,
+            "polylines": self.polylines.build(),
+            "lines": self.lines,
+            "circles": self.circles,
+            "arcs": self.arcs,
+            "texts": self.texts,
+            "statistics": statistics
+        }
+
+
+def document_layers(doc) -> List[Dict[str, Any]]:
+    """Return the layer table of a loaded document, without system layers."""
+    return [
+        {
+            "name": layer.dxf.name,
+            "color": _display_color(layer.dxf.color),
+            "lineweight": layer.dxf.lineweight if hasattr(layer.dxf, 'lineweight') else None
+        }
+        for layer in doc.layers
+        if not layer.dxf.name.startswith('*')  # Exclure les calques système
+    ]
+
+
+def extract_document(doc, profile: Optional[ExtractionProfile] = None) -> Dict[str, Any]:
+    """
+    Extract layers and modelspace entities from a loaded ezdxf document.
+
+    Args:
+        doc: ezdxf Drawing
+        profile: Entity type and layer filter, None to extract everything
+
+    Returns:
+        dict: layers, polylines, lines, circles, arcs, texts and statistics
+    """
+    modelspace = doc.modelspace()
+    extractor = EntityExtractor(profile).extract(modelspace)
+    return extractor.result(document_layers(doc), len(modelspace))
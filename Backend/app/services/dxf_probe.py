@@ -0,0 +1,225 @@
+"""
+Quick DXF probe: version, units, extents, layer table and an approximate
+entity count, without building the document.
+
+Only the HEADER and TABLES sections are parsed. The ENTITIES section is
+located with a byte-level scan of the memory-mapped file and its entity
+count is extrapolated from a sample, so probing stays fast on files of
+several hundred megabytes. Results are cached per (path, size, mtime) and
+shared with the file listing.
+"""
+
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ezdxf.addons.iterdxf import binary_tagger
+from ezdxf.lldxf.const import acad_release
+from ezdxf.tools.codepage import toencoding
+
+from app.services.dxf_source import BINARY_DXF_SIGNATURE
+
+logger = logging.getLogger(__name__)
+
+# $INSUNITS codes
+INSUNITS = {
+    0: 'unitless', 1: 'inches', 2: 'feet', 3: 'miles', 4: 'millimeters', 5: 'centimeters',
+    6: 'meters', 7: 'kilometers', 8: 'microinches', 9: 'mils', 10: 'yards', 11: 'angstroms',
+    12: 'nanometers', 13: 'microns', 14: 'decimeters', 15: 'decameters', 16: 'hectometers',
+    17: 'gigameters', 18: 'astronomical units', 19: 'light years', 20: 'parsecs'
+}
+
+# Bytes of the ENTITIES section sampled to extrapolate the entity count
+ENTITY_SAMPLE_BYTES = 256 * 1024
+
+_ENTITIES_SECTION = re.compile(rb'\n *2\r?\nENTITIES\r?\n')
+# A (0, NAME) tag starting a modelspace entity; sub-entities and section markers are not entities
+_ENTITY_START = re.compile(rb'^ *0\r?\n(?!VERTEX|SEQEND|ATTRIB|ENDSEC|SECTION)[A-Z]', re.M)
+
+
+def _point(value: Dict[int, float]) -> Optional[Dict[str, float]]:
+    if 10 not in value or 20 not in value:
+        return None
+    return {'x': value[10], 'y': value[20]}
+
+
+def _read_header_and_tables(mapped) -> Tuple[Dict[str, Any], list, str]:
+    """Parse HEADER variables and LAYER records; stop at the first section after TABLES."""
+    header: Dict[str, Any] = {}
+    records = []
+    section = None
+    prev_code = -1
+    prev_value = b''
+    variable = None
+    record = None
+
+    for code, value in binary_tagger(mapped):
+        if code == 0:
+            if record is not None:
+                records.append(record)
+                record = None
+            if value == b'ENDSEC':
+                if section == b'TABLES':
+                    break
+                section = None
+            elif section == b'TABLES' and value == b'LAYER':
+                record = {'name': b'', 'color': 7, 'lineweight': -3}
+        elif code == 2 and prev_code == 0 and prev_value == b'SECTION':
+            section = value
+            if section not in (b'HEADER', b'CLASSES', b'TABLES'):
+                # BLOCKS or ENTITIES reached: nothing left to read here
+                break
+        elif section == b'HEADER':
+            if code == 9:
+                variable = value.decode('ascii', errors='ignore')
+                header[variable] = {}
+            elif variable is not None:
+                header[variable][code] = value
+        elif record is not None:
+            if code == 2:
+                record['name'] = value
+            elif code == 62:
+                record['color'] = int(value)
+            elif code == 370:
+                record['lineweight'] = int(value)
+        prev_code = code
+        prev_value = value
+
+    version = header.get('$ACADVER', {}).get(1, b'AC1009').decode('ascii', errors='ignore')
+    encoding = 'cp1252'
+    if 3 in header.get('$DWGCODEPAGE', {}):
+        encoding = toencoding(header['$DWGCODEPAGE'][3].decode('ascii', errors='ignore'))
+    if version >= 'AC1021':
+        encoding = 'utf-8'
+    return header, records, encoding
+
+
+def _approximate_entity_count(mapped, size: int) -> Tuple[int, bool]:
+    """Count entities in a sample of the ENTITIES section and scale it to the section length."""
+    match = _ENTITIES_SECTION.search(mapped)
+    if match is None:
+        return 0, True
+    start = match.end()
+
+    # OBJECTS follows ENTITIES in R2000+ files; R12 files end with ENTITIES
+    end = mapped.rfind(b'\nOBJECTS')
+    if end < start:
+        end = size
+
+    sample = mapped[start:min(end, start + ENTITY_SAMPLE_BYTES)]
+    count = len(_ENTITY_START.findall(sample))
+    if end - start <= ENTITY_SAMPLE_BYTES:
+        return count, True
+    return int(round(count * (end - start) / max(1, len(sample)))), False
+
+
+def probe_dxf(path: str) -> Dict[str, Any]:
+    """
+    Read the DXF version, units, extents and layer table of a file.
+
+    Args:
+        path: Path of the DXF file
+
+    Returns:
+        dict: version, release, encoding, units, extents, layers, layer_count,
+            entity_count (exact when the ENTITIES section is smaller than the
+            sample, extrapolated otherwise) and size
+
+    Raises:
+        ValueError: If the file is a binary DXF (not supported by the probe)
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_DXF_SIGNATURE)) == BINARY_DXF_SIGNATURE:
+            raise ValueError("Les fichiers DXF binaires ne sont pas pris en charge par la sonde")
+        if size == 0:
+            raise ValueError("Fichier DXF vide")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header, records, encoding = _read_header_and_tables(mapped)
+            entity_count, exact = _approximate_entity_count(mapped, size)
+
+    version = header.get('$ACADVER', {}).get(1, b'AC1009').decode('ascii', errors='ignore')
+    units_code = int(header['$INSUNITS'][70]) if 70 in header.get('$INSUNITS', {}) else None
+
+    def coordinates(name):
+        values = header.get(name, {})
+        return _point({code: float(values[code]) for code in (10, 20) if code in values})
+
+    extmin, extmax = coordinates('$EXTMIN'), coordinates('$EXTMAX')
+    extents = None
+    # AutoCAD writes +/-1e20 when the extents were never computed
+    if extmin and extmax and extmin['x'] <= extmax['x'] and abs(extmin['x']) < 1e19:
+        extents = {'min_x': extmin['x'], 'min_y': extmin['y'], 'max_x': extmax['x'], 'max_y': extmax['y']}
+
+    layers = []
+    for record in records:
+        name = record['name'].decode(encoding, errors='replace')
+        if not name or name.startswith('*'):
+            continue
+        layers.append({
+            'name': name,
+            'color': record['color'] if record['color'] != 0 else 'N/A',
+            'lineweight': record['lineweight']
+        })
+    if not any(layer['name'] == '0' for layer in layers):
+        layers.insert(0, {'name': '0', 'color': 7, 'lineweight': -3})
+
+    return {
+        'version': version,
+        'release': acad_release.get(version, 'unknown'),
+        'encoding': encoding,
+        'units': INSUNITS.get(units_code) if units_code is not None else None,
+        'units_code': units_code,
+        'extents': extents,
+        'layers': layers,
+        'layer_count': len(layers),
+        'entity_count': entity_count,
+        'entity_count_exact': exact,
+        'size': size
+    }
+
+
+class ProbeCache:
+    """Per-process LRU of probe results, keyed by path, size and modification time."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_entries: Number of probed files kept (DXF_PROBE_CACHE_SIZE)
+        """
+        if max_entries is None:
+            max_entries = int(os.getenv('DXF_PROBE_CACHE_SIZE', '1024'))
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[Tuple[str, int, int], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Dict[str, Any]:
+        """
+        Return the probe of path, probing the file only if it changed since last time.
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file cannot be probed
+        """
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            probe = self._entries.get(key)
+            if probe is not None:
+                self._entries.move_to_end(key)
+                return probe
+
+        probe = probe_dxf(path)
+        with self._lock:
+            self._entries[key] = probe
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return probe
+
+
+# Global probe cache instance
+dxf_probes = ProbeCache()
@@ -0,0 +1,211 @@
+"""
+DXF input sources for the extraction engine.
+
+A DxfSource parses a drawing from whatever the caller already holds: a path
+on disk (read in place, memory-mapped for hashing and streaming), or bytes
+already in memory (decoded through an in-memory text stream). Uploads are
+used where werkzeug spooled them, in memory or in its temporary file; only
+an upload arriving as a bare network stream is copied to a temporary file,
+hashed on the way so it is read exactly once.
+"""
+
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional
+
+import ezdxf
+from ezdxf.document import Drawing
+from ezdxf.filemanagement import dxf_stream_info
+from ezdxf.lldxf.const import DXFStructureError
+from ezdxf.lldxf.tagger import binary_tags_loader
+from ezdxf.lldxf.validator import is_dxf_stream
+
+logger = logging.getLogger(__name__)
+
+BINARY_DXF_SIGNATURE = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+# Chunk size used when spooling and hashing network streams
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class DxfSource:
+    """A DXF file to extract, backed either by a path or by bytes in memory."""
+
+    def __init__(self, filename: str, path: Optional[str] = None, data: Optional[bytes] = None,
+                 digest: Optional[str] = None, temporary: bool = False):
+        """
+        Use from_path, from_bytes or from_upload instead.
+
+        Args:
+            filename: Name reported in logs and results
+            path: File on disk, exclusive with data
+            data: Raw DXF content, exclusive with path
+            digest: SHA-256 hex digest of the content, if already known
+            temporary: Delete path when the source is closed
+        """
+        if (path is None) == (data is None):
+            raise ValueError("A DXF source needs exactly one of path or data")
+        self.filename = filename
+        self.path = path
+        self.data = data
+        self._digest = digest
+        self._temporary = temporary
+
+    @classmethod
+    def from_path(cls, path: str, filename: Optional[str] = None) -> 'DxfSource':
+        return cls(filename or os.path.basename(path), path=path)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, filename: str) -> 'DxfSource':
+        return cls(filename, data=data)
+
+    @classmethod
+    def from_upload(cls, file) -> 'DxfSource':
+        """
+        Build a source from an uploaded werkzeug FileStorage.
+
+        werkzeug spools uploads to a SpooledTemporaryFile: one still in memory
+        is used as bytes, one rolled over to disk is read in place through its
+        path (or /proc/<pid>/fd/<n> for an anonymous temporary file, which the
+        process pool workers can open too). Anything else is a network stream
+        and is copied once to a temporary file while being hashed.
+
+        Args:
+            file: FileStorage (or any object with .stream and .filename)
+
+        Returns:
+            DxfSource: Close it (or use it as a context manager) to drop the temporary file
+        """
+        stream = file.stream
+        # SpooledTemporaryFile : tampon mémoire ou fichier sur disque
+        spooled = getattr(stream, '_file', stream)
+        if isinstance(spooled, io.BytesIO):
+            return cls.from_bytes(spooled.getvalue(), file.filename)
+        path = cls._spooled_path(spooled)
+        if path is not None:
+            logger.debug(f"Upload {file.filename} read in place from {path}")
+            return cls(file.filename, path=path)
+
+        sha256 = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(suffix='.dxf')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                while True:
+                    chunk = stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    temp_file.write(chunk)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        logger.debug(f"Upload {file.filename} spooled to {temp_path}")
+        return cls(file.filename, path=temp_path, digest=sha256.hexdigest(), temporary=True)
+
+    @staticmethod
+    def _spooled_path(spooled) -> Optional[str]:
+        """Path of the file on disk behind an upload stream, None if it has none."""
+        try:
+            spooled.flush()
+            descriptor = spooled.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+        name = getattr(spooled, 'name', None)
+        if isinstance(name, str) and os.path.isfile(name):
+            return name
+        # Fichier temporaire anonyme (Linux) : ouvert par descripteur, y compris depuis les processus du pool
+        path = os.path.join('/proc', str(os.getpid()), 'fd', str(descriptor))
+        return path if os.path.exists(path) else None
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path)
+
+    @contextmanager
+    def _mapped(self) -> Iterator[BinaryIO]:
+        """Yield the file memory-mapped read-only, or opened normally if it cannot be mapped."""
+        with open(self.path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                yield f
+                return
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def digest(self) -> str:
+        """Return the SHA-256 hex digest of the content, computed once."""
+        if self._digest is None:
+            if self.data is not None:
+                self._digest = hashlib.sha256(self.data).hexdigest()
+            else:
+                with self._mapped() as mapped:
+                    if isinstance(mapped, mmap.mmap):
+                        self._digest = hashlib.sha256(mapped).hexdigest()
+                    else:
+                        self._digest = hashlib.sha256(mapped.read()).hexdigest()
+        return self._digest
+
+    @property
+    def is_binary_dxf(self) -> bool:
+        if self.data is not None:
+            return self.data.startswith(BINARY_DXF_SIGNATURE)
+        with open(self.path, 'rb') as f:
+            return f.read(len(BINARY_DXF_SIGNATURE)) == BINARY_DXF_SIGNATURE
+
+    @contextmanager
+    def open_stream(self) -> Iterator[BinaryIO]:
+        """Yield a binary stream over the content for sequential reading, without copying it."""
+        if self.data is not None:
+            yield io.BytesIO(self.data)
+        else:
+            with self._mapped() as mapped:
+                yield mapped
+
+    def read_document(self, errors: str = 'surrogateescape') -> Drawing:
+        """
+        Load the whole document with ezdxf.
+
+        Returns:
+            Drawing: The loaded document
+
+        Raises:
+            DXFStructureError: For invalid or corrupted DXF content
+        """
+        if self.path is not None:
+            return ezdxf.readfile(self.path, errors=errors)
+
+        if self.is_binary_dxf:
+            return Drawing.load(binary_tags_loader(self.data, errors=errors))
+        if not is_dxf_stream(io.TextIOWrapper(io.BytesIO(self.data), encoding='cp1252', errors='ignore')):
+            raise DXFStructureError(f"'{self.filename}' is not a DXF file.")
+
+        # Same encoding detection as ezdxf.readfile, on an in-memory text stream
+        info = dxf_stream_info(io.TextIOWrapper(io.BytesIO(self.data), encoding='cp1252', errors='ignore'))
+        return ezdxf.read(io.TextIOWrapper(io.BytesIO(self.data), encoding=info.encoding, errors=errors))
+
+    def close(self):
+        """Remove the temporary file of a spooled upload."""
+        if self._temporary and self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+                logger.debug(f"Fichier temporaire supprimé : {self.path}")
+            except Exception as e:
+                logger.error(f"Erreur lors de la suppression du fichier temporaire : {str(e)}")
+        self._temporary = False
+
+    def __enter__(self) -> 'DxfSource':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,240 @@
+"""
+Constant-memory DXF extraction for very large drawings.
+
+Instead of loading the whole document with ezdxf.readfile, the DXF tag
+stream is read once from top to bottom: layer records are picked up from
+the TABLES section and modelspace entities are built one at a time from
+the ENTITIES section, handed to the caller and dropped. Peak memory is
+bounded by the extracted result rather than by the size of the drawing.
+"""
+
+import logging
+import os
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ezdxf.addons.iterdxf import binary_tagger
+from ezdxf.entities import DXFGraphic, factory
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import tag_compiler
+from ezdxf.tools.codepage import toencoding
+
+from app.services.extraction_profiles import ALL_ENTITY_TYPES, ExtractionProfile
+from app.services.dxf_extractor import EntityExtractor
+
+logger = logging.getLogger(__name__)
+
+# Extraction modes accepted by extract_file_data
+EXTRACTION_MODE_AUTO = 'auto'
+EXTRACTION_MODE_FULL = 'full'
+EXTRACTION_MODE_STREAMING = 'streaming'
+EXTRACTION_MODES = (EXTRACTION_MODE_AUTO, EXTRACTION_MODE_FULL, EXTRACTION_MODE_STREAMING)
+
+# Files at least this large are streamed when the mode is 'auto'
+STREAMING_THRESHOLD_BYTES = int(float(os.getenv('DXF_STREAMING_THRESHOLD_MB', '64')) * 1024 * 1024)
+
+# Sub-entities owned by the preceding entity; they are not modelspace entities themselves
+LINKED_TYPES = frozenset(('VERTEX', 'SEQEND', 'ATTRIB'))
+
+
+def resolve_extraction_mode(mode: Optional[str], size: int,
+                            profile: Optional[ExtractionProfile] = None) -> str:
+    """
+    Decide between full and streaming extraction.
+
+    In 'auto' mode, layer-filtered extractions are always streamed since
+    non-matching entities are then skipped without being built.
+
+    Args:
+        mode: Requested mode, None or 'auto' to decide from the size
+        size: Size of the DXF file in bytes
+        profile: Extraction profile of the request, if any
+
+    Returns:
+        str: EXTRACTION_MODE_FULL or EXTRACTION_MODE_STREAMING
+    """
+    if mode in (EXTRACTION_MODE_FULL, EXTRACTION_MODE_STREAMING):
+        return mode
+    if profile is not None and profile.filters_layers:
+        return EXTRACTION_MODE_STREAMING
+    return EXTRACTION_MODE_STREAMING if size >= STREAMING_THRESHOLD_BYTES else EXTRACTION_MODE_FULL
+
+
+class DxfStreamReader:
+    """Single forward pass over an ASCII DXF stream."""
+
+    def __init__(self, stream: BinaryIO, types: Optional[Iterable[str]] = None,
+                 layer_filter: Optional[Callable[[str], bool]] = None,
+                 errors: str = 'surrogateescape'):
+        """
+        Args:
+            stream: Binary DXF stream, read sequentially (it does not need to be seekable)
+            types: DXF types to build, None for every type
+            layer_filter: Predicate on the layer name, checked on the raw tags before building
+            errors: Decoding error handler passed to the tagger
+        """
+        self.stream = stream
+        self.types = set(types) if types else None
+        if self.types is not None and 'POLYLINE' in self.types:
+            self.types.update(('VERTEX', 'SEQEND'))
+        self.layer_filter = layer_filter
+        self.errors = errors
+
+        # Raw layer records in file order, filled while the TABLES section is read
+        self.layers: List[Dict[str, Any]] = []
+        # Number of modelspace entities seen, whether they were built or not
+        self.entity_count = 0
+
+    def _read_header(self):
+        """Read the HEADER section undecoded and return (encoding, name of the section that follows)."""
+        encoding = 'cp1252'
+        version = 'AC1009'
+        fetch = None
+        prev_code = -1
+        next_section = None
+
+        for code, value in binary_tagger(self.stream):
+            if code == 0 and value == b'ENDSEC':
+                break
+            if code == 2 and prev_code == 0 and value != b'HEADER':
+                # No HEADER section: the first section has already started
+                next_section = value.decode(errors='ignore')
+                break
+            if code == 9 and value == b'$DWGCODEPAGE':
+                fetch = 'encoding'
+            elif code == 9 and value == b'$ACADVER':
+                fetch = 'version'
+            elif fetch == 'encoding':
+                encoding = toencoding(value.decode())
+                fetch = None
+            elif fetch == 'version':
+                version = value.decode()
+                fetch = None
+            prev_code = code
+
+        # R2007 files and later are always encoded as UTF-8
+        if version >= 'AC1021':
+            encoding = 'utf-8'
+        return encoding, next_section
+
+    def entities(self) -> Iterator[DXFGraphic]:
+        """
+        Yield modelspace entities one at a time.
+
+        Entities whose type or layer is not requested are counted but never built.
+        POLYLINE and INSERT entities are yielded once their VERTEX/ATTRIB
+        sub-entities have been attached.
+        """
+        encoding, section = self._read_header()
+        prev_code = -1
+        prev_value = None
+        layer_record = None
+        tags = []
+        queued = None
+        parent_wanted = False
+        linked_entity = entity_linker()
+
+        for tag in tag_compiler(binary_tagger(self.stream, encoding, self.errors)):
+            code = tag.code
+            value = tag.value
+
+            if section == 'ENTITIES':
+                if code != 0:
+                    tags.append(tag)
+                    continue
+
+                if tags:
+                    dxftype = tags[0].value
+                    linked = dxftype in LINKED_TYPES
+                    paperspace = any(t.code == 67 and t.value == 1 for t in tags)
+                    if not linked:
+                        parent_wanted = (not paperspace and
+                                         (self.types is None or dxftype in self.types))
+                        if parent_wanted and self.layer_filter is not None:
+                            layer = next((t.value for t in tags if t.code == 8), '0')
+                            parent_wanted = self.layer_filter(layer)
+                        if not paperspace:
+                            self.entity_count += 1
+                    if parent_wanted and (self.types is None or dxftype in self.types):
+                        entity = factory.load(ExtendedTags(tags))
+                        if not linked_entity(entity) and not linked:
+                            # Hold one entity back so its sub-entities can be linked first
+                            if queued is not None:
+                                yield queued
+                            queued = entity
+
+                if value == 'ENDSEC':
+                    if queued is not None:
+                        yield queued
+                    return
+                tags = [tag]
+                continue
+
+            if section == 'TABLES':
+                if code == 0:
+                    if layer_record is not None:
+                        self.layers.append(layer_record)
+                        layer_record = None
+                    if value == 'LAYER':
+                        layer_record = {'name': None, 'color': 7, 'lineweight': -3}
+                elif layer_record is not None:
+                    if code == 2:
+                        layer_record['name'] = value
+                    elif code == 62:
+                        layer_record['color'] = value
+                    elif code == 370:
+                        layer_record['lineweight'] = value
+
+            if code == 2 and prev_code == 0 and prev_value == 'SECTION':
+                section = value
+            elif code == 0 and value == 'ENDSEC':
+                section = None
+            prev_code = code
+            prev_value = value
+
+        # Truncated file: hand out whatever was read
+        if queued is not None:
+            yield queued
+
+
+def stream_extract_dxf(stream: BinaryIO, profile: Optional[ExtractionProfile] = None) -> Dict[str, Any]:
+    """
+    Extract layers and entities from a DXF stream without loading the document.
+
+    The result has the same schema as extract_file_data. statistics.total_entities
+    counts every modelspace entity, including the types that are not extracted.
+
+    Args:
+        stream: Binary DXF stream
+        profile: Entity type and layer filter, None to extract everything
+
+    Returns:
+        dict: layers, polylines, lines, circles, arcs, texts and statistics
+    """
+    if profile is None:
+        reader = DxfStreamReader(stream, types=ALL_ENTITY_TYPES)
+    else:
+        reader = DxfStreamReader(stream, types=profile.types,
+                                 layer_filter=profile.accepts_layer if profile.filters_layers else None)
+
+    extractor = EntityExtractor(profile)
+    # Unrequested types and layers were already skipped by the reader without being built
+    extractor.extract(reader.entities())
+
+    # ezdxf always provides layer '0', even when the file does not define it
+    records = reader.layers
+    if not any(record['name'] == '0' for record in records):
+        records = [{'name': '0', 'color': 7, 'lineweight': -3}] + records
+
+    layers = [
+        {
+            "name": record['name'],
+            "color": record['color'] if record['color'] != 0 else 'N/A',
+            "lineweight": record['lineweight']
+        }
+        for record in records
+        if record['name'] and not record['name'].startswith('*')  # Exclure les calques système
+    ]
+
+    logger.info(f"Extraction en flux terminée: {reader.entity_count} entités lues")
+    return extractor.result(layers, reader.entity_count)
@@ -0,0 +1,318 @@
+"""
+Persistent, size-bounded cache for DXF extraction results.
+
+Entries are keyed by the SHA-256 of the raw file bytes plus the extractor
+version, so re-opening an unchanged drawing skips ezdxf entirely. The cache
+lives on disk and is shared by every gunicorn worker; least recently used
+entries are evicted once the configured size budget is exceeded.
+
+Entries are plain JSON (polylines in their columnar form), so reading an
+entry never runs code, and the directory is private to the user running
+the application: a directory owned by someone else is refused.
+"""
+
+import json
+import logging
+import os
+import re
+import stat
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.services.polyline_set import PolylineSet
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the result schema of extract_file_data changes so stale entries are ignored
+EXTRACTOR_VERSION = 3
+
+ENTRY_SUFFIX = '.json'
+
+# Default location: the Flask instance folder of the backend
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                 'instance', 'extraction_cache')
+
+# Keys built by make_key: SHA-256 hex digest, extractor version, optional variant tag
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}-v\d+(-[\w.]+)?', re.ASCII)
+
+
+class ExtractionCache:
+    """Disk-backed LRU cache of extract_file_data results."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        """
+        Initialize the cache with configuration from environment variables.
+
+        Args:
+            cache_dir: Directory holding cache entries (EXTRACTION_CACHE_DIR)
+            max_bytes: Size budget before LRU eviction (EXTRACTION_CACHE_MAX_MB)
+            enabled: Turn the cache on or off (EXTRACTION_CACHE_ENABLED)
+        """
+        self.cache_dir = cache_dir or os.getenv('EXTRACTION_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('EXTRACTION_CACHE_MAX_MB', '512')) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        if enabled is None:
+            enabled = os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._dir_checked = False
+
+    @staticmethod
+    def make_key(digest: str, variant: Optional[str] = None) -> str:
+        """
+        Build the cache key for a file.
+
+        Args:
+            digest: SHA-256 hex digest of the raw DXF bytes (see DxfSource.digest)
+            variant: Tag of a partial extraction (e.g. a profile), None for a full one
+
+        Returns:
+            str: Digest suffixed with the extractor version and variant
+        """
+        key = f"{digest}-v{EXTRACTOR_VERSION}"
+        return f"{key}-{variant}" if variant else key
+
+    @staticmethod
+    def is_valid_key(key: Any) -> bool:
+        """True if key has the shape of a make_key key (keys may come from clients)."""
+        return isinstance(key, str) and KEY_PATTERN.fullmatch(key) is not None
+
+    def _entry_path(self, key: str) -> str:
+        """
+        Path of the entry of a key, always a file directly inside the cache directory.
+
+        Raises:
+            ValueError: If the key is malformed or would point outside the cache directory
+        """
+        if not self.is_valid_key(key):
+            raise ValueError(f"Invalid extraction cache key: {key!r}")
+        cache_dir = os.path.realpath(self.cache_dir)
+        path = os.path.realpath(os.path.join(cache_dir, f"{key}{ENTRY_SUFFIX}"))
+        if os.path.dirname(path) != cache_dir:
+            raise ValueError(f"Invalid extraction cache key: {key!r}")
+        return path
+
+    def _usable(self) -> bool:
+        """Create the private cache directory on first use; disable the cache if it cannot be trusted."""
+        if not self.enabled or self._dir_checked:
+            return self.enabled
+        with self._lock:
+            if not self._dir_checked:
+                try:
+                    ensure_private_dir(self.cache_dir)
+                except OSError as e:
+                    logger.error(f"Extraction cache disabled: {str(e)}")
+                    self.enabled = False
+                self._dir_checked = True
+        return self.enabled
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a cached extraction result.
+
+        Args:
+            key: Key returned by make_key
+
+        Returns:
+            dict or None: A fresh copy of the cached result, None on a miss
+
+        Raises:
+            ValueError: If the key is not a make_key key
+        """
+        path = self._entry_path(key)
+        if not self._usable():
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                result = load_entry(f.read())
+            # Refresh the modification time so the entry counts as recently used
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {key}: {str(e)}")
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> bool:
+        """
+        Store an extraction result, then evict old entries if over budget.
+
+        Args:
+            key: Key returned by make_key
+            result: Result of extract_file_data
+
+        Returns:
+            bool: True if the entry was written, False otherwise
+        """
+        if not self._usable():
+            return False
+
+        try:
+            path = self._entry_path(key)
+            payload = dump_entry(result)
+            if len(payload) > self.max_bytes:
+                logger.info(f"Extraction result for {key} exceeds the cache budget, not cached")
+                return False
+
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to write extraction cache entry {key}: {str(e)}")
+            return False
+
+        self._evict()
+        return True
+
+    def get_or_extract(self, digest: str, extractor: Callable[[], Dict[str, Any]],
+                       variant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return the cached result for a file, running extractor on a miss.
+
+        Results containing an "error" key are never cached.
+
+        Args:
+            digest: SHA-256 hex digest of the raw DXF bytes
+            extractor: Callable performing the actual extraction
+            variant: Tag of a partial extraction, see make_key
+
+        Returns:
+            dict: Extraction result
+        """
+        key = self.make_key(digest, variant)
+        cached = self.get(key)
+        if cached is not None:
+            logger.info(f"Extraction cache hit: {key}")
+            return cached
+
+        result = extractor()
+        if "error" not in result:
+            self.put(key, result)
+        return result
+
+    def _list_entries(self):
+        entries = []
+        if not self._usable():
+            return entries
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(ENTRY_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits its budget."""
+        with self._lock:
+            entries = self._list_entries()
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total -= size
+                    self.evictions += 1
+                    logger.info(f"Evicted extraction cache entry: {os.path.basename(path)}")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"Failed to remove extraction cache entry {path}: {str(e)}")
+            return False
+
+    def clear(self):
+        """Remove every cache entry."""
+        with self._lock:
+            for _, _, path in self._list_entries():
+                self._remove(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache counters for this process and the shared disk usage.
+
+        Returns:
+            dict: hits, misses, hit ratio, evictions, entry count and sizes
+        """
+        entries = self._list_entries()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "extractor_version": EXTRACTOR_VERSION,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+
+def ensure_private_dir(path: str) -> None:
+    """
+    Create a directory readable by the current user only, or check an existing one.
+
+    Raises:
+        PermissionError: If the directory belongs to another user or is not a directory
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if hasattr(os, 'geteuid') and info.st_uid != os.geteuid():
+        raise PermissionError(f"{path} belongs to another user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+
+
+def dump_entry(result: Dict[str, Any]) -> bytes:
+    """Serialize an extraction result to JSON, the PolylineSet in its columnar form."""
+    polylines = result.get('polylines')
+    if isinstance(polylines, PolylineSet):
+        result = dict(result, polylines=polylines.to_columnar())
+    return json.dumps(result, separators=(',', ':')).encode('utf-8')
+
+
+def load_entry(payload: bytes) -> Dict[str, Any]:
+    """Rebuild an extraction result written by dump_entry."""
+    result = json.loads(payload)
+    if isinstance(result.get('polylines'), dict):
+        result['polylines'] = PolylineSet.from_columnar(result['polylines'])
+    return result
+
+
+# Global extraction cache instance
+extraction_cache = ExtractionCache()
@@ -0,0 +1,327 @@
+"""
+Layer index over extraction results, for progressive loading.
+
+A client first asks for a summary of a drawing (layers with per-type entity
+counts and extents, plus a document id), then pages through the entities of
+a given layer and/or type with an opaque cursor. Indexed results are kept in
+a small per-process LRU, tied to the users they were extracted for.
+A document indexed by another worker or evicted from the LRU is rebuilt
+from the requesting user's own file, which the disk extraction cache
+usually serves without running ezdxf again.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.polyline_set import GEOMETRY_FORMAT_COLUMNAR, PolylineSet
+
+logger = logging.getLogger(__name__)
+
+# Entity collections of an extraction result, in paging order
+ENTITY_COLLECTIONS = ('polylines', 'lines', 'circles', 'arcs', 'texts')
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+
+def _encode_cursor(collection_index: int, offset: int) -> str:
+    raw = json.dumps({'c': collection_index, 'o': offset}, separators=(',', ':')).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        collection_index, offset = int(position['c']), int(position['o'])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise ValueError("Curseur de pagination invalide")
+    if not 0 <= collection_index < len(ENTITY_COLLECTIONS) or offset < 0:
+        raise ValueError("Curseur de pagination invalide")
+    return collection_index, offset
+
+
+def _entity_bounds(collection: str, items: Any) -> Tuple[List[str], np.ndarray]:
+    """Return the layer of every entity and an (n, 4) array of min_x, min_y, max_x, max_y."""
+    if collection == 'polylines':
+        polylines: PolylineSet = items
+        counts = np.diff(polylines.offsets)
+        bounds = np.full((len(polylines), 4), np.nan)
+        non_empty = counts > 0
+        if non_empty.any():
+            starts = polylines.offsets[:-1][non_empty]
+            xs, ys = polylines.coords[:, 0], polylines.coords[:, 1]
+            bounds[non_empty, 0] = np.minimum.reduceat(xs, starts)
+            bounds[non_empty, 1] = np.minimum.reduceat(ys, starts)
+            bounds[non_empty, 2] = np.maximum.reduceat(xs, starts)
+            bounds[non_empty, 3] = np.maximum.reduceat(ys, starts)
+        return polylines.layers(), bounds
+
+    layers = [item.get('layer', '') for item in items]
+    if collection == 'lines':
+        points = np.array([[i['start']['x'], i['start']['y'], i['end']['x'], i['end']['y']] for i in items],
+                          dtype=np.float64).reshape(-1, 4)
+        bounds = np.column_stack([
+            np.minimum(points[:, 0], points[:, 2]), np.minimum(points[:, 1], points[:, 3]),
+            np.maximum(points[:, 0], points[:, 2]), np.maximum(points[:, 1], points[:, 3])
+        ])
+    elif collection in ('circles', 'arcs'):
+        # Arcs are bounded by their full circle
+        circles = np.array([[i['center']['x'], i['center']['y'], i['radius']] for i in items],
+                           dtype=np.float64).reshape(-1, 3)
+        bounds = np.column_stack([
+            circles[:, 0] - circles[:, 2], circles[:, 1] - circles[:, 2],
+            circles[:, 0] + circles[:, 2], circles[:, 1] + circles[:, 2]
+        ])
+    else:
+        points = np.array([[i['position']['x'], i['position']['y']] for i in items],
+                          dtype=np.float64).reshape(-1, 2)
+        bounds = np.column_stack([points, points])
+    return layers, bounds
+
+
+def _extents_dict(bounds: np.ndarray) -> Optional[Dict[str, float]]:
+    if not len(bounds) or np.all(np.isnan(bounds)):
+        return None
+    return {
+        'min_x': float(np.nanmin(bounds[:, 0])),
+        'min_y': float(np.nanmin(bounds[:, 1])),
+        'max_x': float(np.nanmax(bounds[:, 2])),
+        'max_y': float(np.nanmax(bounds[:, 3]))
+    }
+
+
+class ExtractionIndex:
+    """Per-layer, per-type index over one extraction result."""
+
+    def __init__(self, document_id: str, result: Dict[str, Any]):
+        """
+        Args:
+            document_id: Extraction cache key of the result
+            result: Result of extract_source_data (polylines as a PolylineSet)
+        """
+        self.document_id = document_id
+        self.result = result
+        polylines = result.get('polylines')
+        if not isinstance(polylines, PolylineSet):
+            result = dict(result, polylines=PolylineSet.from_payload(polylines))
+            self.result = result
+
+        # (collection, layer) -> entity indices, in document order
+        self._positions: Dict[Tuple[str, str], np.ndarray] = {}
+        self._layer_counts: Dict[str, Dict[str, int]] = {}
+        self._layer_bounds: Dict[str, List[np.ndarray]] = {}
+        all_bounds = []
+
+        for collection in ENTITY_COLLECTIONS:
+            items = result.get(collection) or []
+            if not len(items):
+                continue
+            layers, bounds = _entity_bounds(collection, items)
+            all_bounds.append(bounds)
+
+            names, inverse = np.unique(np.array(layers, dtype=object), return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            splits = np.cumsum(np.bincount(inverse, minlength=len(names)))[:-1]
+            for name, positions in zip(names.tolist(), np.split(order, splits)):
+                self._positions[(collection, name)] = positions
+                self._layer_counts.setdefault(name, {c: 0 for c in ENTITY_COLLECTIONS})[collection] = len(positions)
+                self._layer_bounds.setdefault(name, []).append(bounds[positions])
+
+        self.extents = _extents_dict(np.vstack(all_bounds)) if all_bounds else None
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Build the first-phase response: layers, per-layer counts and extents.
+
+        Returns:
+            dict: documentId, layers, extents and statistics
+        """
+        layer_table = {layer['name']: layer for layer in self.result.get('layers', [])}
+        names = list(layer_table)
+        names += sorted(name for name in self._layer_counts if name not in layer_table)
+
+        layers = []
+        for name in names:
+            counts = self._layer_counts.get(name, {c: 0 for c in ENTITY_COLLECTIONS})
+            bounds = self._layer_bounds.get(name)
+            table_entry = layer_table.get(name, {})
+            layers.append({
+                'name': name,
+                'color': table_entry.get('color'),
+                'lineweight': table_entry.get('lineweight'),
+                'counts': counts,
+                'total': sum(counts.values()),
+                'extents': _extents_dict(np.vstack(bounds)) if bounds else None
+            })
+
+        return {
+            'documentId': self.document_id,
+            'layers': layers,
+            'extents': self.extents,
+            'statistics': self.result.get('statistics', {}),
+            'pageSize': {'default': DEFAULT_PAGE_SIZE, 'max': MAX_PAGE_SIZE}
+        }
+
+    def _positions_for(self, collection: str, layer: Optional[str]) -> np.ndarray:
+        if layer is not None:
+            return self._positions.get((collection, layer), np.empty(0, dtype=np.int64))
+        return np.arange(len(self.result.get(collection) or []))
+
+    def page(self, layer: Optional[str] = None, entity_type: Optional[str] = None,
+             cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+             geometry_format: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return one page of entities, optionally restricted to a layer and a type.
+
+        Without entity_type, pages walk through polylines, lines, circles, arcs
+        then texts.
+
+        Args:
+            layer: Layer name, None for every layer
+            entity_type: One of ENTITY_COLLECTIONS, None for all of them
+            cursor: nextCursor of the previous page, None for the first page
+            limit: Maximum number of entities in the page
+            geometry_format: 'legacy' or 'columnar' for the polylines
+
+        Returns:
+            dict: documentId, items grouped by type, total and nextCursor (None on the last page)
+
+        Raises:
+            ValueError: On an unknown type or an invalid cursor
+        """
+        if entity_type is not None and entity_type not in ENTITY_COLLECTIONS:
+            raise ValueError(f"Type d'entité inconnu : {entity_type}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        collections = [entity_type] if entity_type else list(ENTITY_COLLECTIONS)
+
+        collection_index, offset = _decode_cursor(cursor) if cursor else (
+            ENTITY_COLLECTIONS.index(collections[0]), 0)
+        if ENTITY_COLLECTIONS[collection_index] not in collections:
+            raise ValueError("Curseur de pagination invalide")
+
+        items: Dict[str, Any] = {}
+        remaining = limit
+        next_cursor = None
+        for collection in collections[collections.index(ENTITY_COLLECTIONS[collection_index]):]:
+            positions = self._positions_for(collection, layer)
+            start = offset if ENTITY_COLLECTIONS.index(collection) == collection_index else 0
+            if start >= len(positions):
+                continue
+            if remaining == 0:
+                next_cursor = _encode_cursor(ENTITY_COLLECTIONS.index(collection), start)
+                break
+
+            selected = positions[start:start + remaining]
+            remaining -= len(selected)
+            if collection == 'polylines':
+                subset = self.result['polylines'].select(selected)
+                items[collection] = (subset.to_columnar() if geometry_format == GEOMETRY_FORMAT_COLUMNAR
+                                     else subset.to_dicts())
+            else:
+                source = self.result[collection]
+                items[collection] = [source[i] for i in selected.tolist()]
+
+            end = start + len(selected)
+            if end < len(positions):
+                next_cursor = _encode_cursor(ENTITY_COLLECTIONS.index(collection), end)
+                break
+
+        total = sum(len(self._positions_for(c, layer)) for c in collections)
+        return {
+            'documentId': self.document_id,
+            'layer': layer,
+            'type': entity_type,
+            'items': items,
+            'count': limit - remaining,
+            'total': total,
+            'nextCursor': next_cursor
+        }
+
+
+class ExtractionIndexCache:
+    """
+    Small per-process LRU of ExtractionIndex objects.
+
+    Each index remembers the users it was built for: a document id alone does
+    not give access to a document, its pages are only served to a user whose
+    own file produced that id (through the summary, or the loader of get).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Args:
+            max_entries: Number of indexed documents kept in memory (EXTRACTION_INDEX_CACHE_SIZE)
+        """
+        if max_entries is None:
+            max_entries = int(os.getenv('EXTRACTION_INDEX_CACHE_SIZE', '4'))
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[str, ExtractionIndex]' = OrderedDict()
+        self._owners: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, document_id: str, result: Dict[str, Any], owner: str) -> ExtractionIndex:
+        """Index result under document_id, keep it in memory and grant owner access to it."""
+        with self._lock:
+            index = self._entries.get(document_id)
+            if index is not None:
+                self._entries.move_to_end(document_id)
+                self._owners[document_id].add(owner)
+                return index
+
+        index = ExtractionIndex(document_id, result)
+        with self._lock:
+            self._entries[document_id] = index
+            self._entries.move_to_end(document_id)
+            self._owners.setdefault(document_id, set()).add(owner)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._owners.pop(evicted, None)
+        return index
+
+    def get(self, document_id: str, owner: str,
+            loader: Optional[Callable[[], Optional[Tuple[str, Dict[str, Any]]]]] = None) -> Optional[ExtractionIndex]:
+        """
+        Return the index of a document for a user, rebuilding it with loader if needed.
+
+        Args:
+            document_id: Id returned in the summary
+            owner: Requesting user
+            loader: Fallback extracting the user's own file (through the disk extraction
+                cache), returning (document_id, result)
+
+        Returns:
+            ExtractionIndex or None if the document is unknown to this user
+
+        Raises:
+            LookupError: If the loader produced a different document (the file changed)
+        """
+        with self._lock:
+            index = self._entries.get(document_id)
+            if index is not None and owner in self._owners.get(document_id, ()):
+                self._entries.move_to_end(document_id)
+                return index
+
+        if loader is None:
+            return None
+        loaded = loader()
+        if loaded is None:
+            return None
+        loaded_id, result = loaded
+        if loaded_id != document_id:
+            raise LookupError("Le fichier a été modifié depuis le résumé")
+        if "error" in result:
+            return None
+        return self.put(document_id, result, owner)
+
+
+# Global extraction index cache instance
+extraction_indexes = ExtractionIndexCache()
@@ -0,0 +1,124 @@
+"""
+Extraction profiles: which entity types and layers extract_file_data keeps.
+
+A profile is matched against the entity type and layer name before any
+other attribute of the entity is read; in streaming mode non-matching
+entities are not even built. Layer patterns are shell-style globs
+(fnmatch), matched case-sensitively like the surface calculation does.
+"""
+
+import fnmatch
+import functools
+import hashlib
+import re
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
+from app.services.polyline_set import POLYLINE_TYPES
+
+# Entity types extracted when no profile restricts them
+ALL_ENTITY_TYPES = ('LWPOLYLINE', 'POLYLINE', 'LINE', 'CIRCLE', 'ARC', 'TEXT')
+
+# Layers read by generate_excel_file; it matches them by substring, hence the wildcards
+SURFACE_LAYER_PATTERNS = (
+    '*GEX_EDS_SDP_*',
+    '*GEX_EDS_TA_SDP_CAHIER_DEMO*',
+    '*LOC_SOC*',
+    '*SANITAIRES*'
+)
+
+# Distinct layer names whose match each profile remembers (profiles outlive requests)
+LAYER_MATCH_CACHE_SIZE = 1024
+
+
+class ExtractionProfile:
+    """Entity type and layer filter applied during extraction."""
+
+    def __init__(self, name: str, layer_patterns: Optional[Sequence[str]] = None,
+                 types: Sequence[str] = ALL_ENTITY_TYPES):
+        """
+        Args:
+            name: Profile name, reported in logs
+            layer_patterns: Layer globs to keep, None to keep every layer
+            types: DXF entity types to keep
+        """
+        self.name = name
+        self.layer_patterns = tuple(layer_patterns) if layer_patterns else None
+        self.types = frozenset(types)
+        self._layer_regex = (
+            re.compile('|'.join(fnmatch.translate(p) for p in self.layer_patterns))
+            if self.layer_patterns else None
+        )
+        self._init_layer_cache()
+
+    def _init_layer_cache(self):
+        # Drawings reuse a handful of layers across thousands of entities
+        self._layer_matches = functools.lru_cache(maxsize=LAYER_MATCH_CACHE_SIZE)(self._match_layer)
+
+    def _match_layer(self, layer: str) -> bool:
+        return self._layer_regex.match(layer) is not None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Profiles are sent to the process pool; the cache is rebuilt on the other side
+        state = self.__dict__.copy()
+        del state['_layer_matches']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._init_layer_cache()
+
+    @property
+    def filters_layers(self) -> bool:
+        return self._layer_regex is not None
+
+    def accepts_layer(self, layer: str) -> bool:
+        """Return True if entities on layer are kept."""
+        if self._layer_regex is None:
+            return True
+        return self._layer_matches(layer)
+
+    def accepts(self, dxftype: str, layer: str) -> bool:
+        return dxftype in self.types and self.accepts_layer(layer)
+
+    @property
+    def cache_tag(self) -> str:
+        """Short digest identifying what this profile keeps, used in cache keys."""
+        signature = '|'.join(sorted(self.types)) + '#' + '|'.join(self.layer_patterns or ())
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()[:12]
+
+
+# Named profiles accepted by the extraction endpoints; 'full' keeps everything
+EXTRACTION_PROFILES = {
+    'full': None,
+    'surfaces': ExtractionProfile('surfaces', SURFACE_LAYER_PATTERNS, POLYLINE_TYPES)
+}
+
+
+def resolve_extraction_profile(name: Optional[str] = None,
+                               layers: Union[str, Iterable[str], None] = None) -> Optional[ExtractionProfile]:
+    """
+    Build the profile requested by an API call.
+
+    Args:
+        name: Named profile ('full', 'surfaces'), None for 'full'
+        layers: Explicit layer globs, as a list or a comma-separated string;
+            they replace the layers of the named profile and keep its types
+
+    Returns:
+        ExtractionProfile or None: None when everything is extracted
+
+    Raises:
+        ValueError: If the profile name is unknown
+    """
+    if name and name not in EXTRACTION_PROFILES:
+        raise ValueError(f"Profil d'extraction inconnu : {name}")
+    profile = EXTRACTION_PROFILES.get(name or 'full')
+
+    if isinstance(layers, str):
+        layers = layers.split(',')
+    patterns = [p.strip() for p in layers or [] if isinstance(p, str) and p.strip()]
+    if not patterns:
+        return profile
+
+    types = profile.types if profile else ALL_ENTITY_TYPES
+    return ExtractionProfile(name or 'layers', patterns, types)
@@ -0,0 +1,229 @@
+"""
+Request-scoped cache of shapely geometries for SDP polylines.
+
+The surface calculations compare the same polylines many times: containment
+of special surfaces, demolition overlaps, TA voids and h < 1.80 m zones.
+A GeometryRegistry builds each polyline's Polygon once, checks its validity
+once, repairs it with buffer(0) at most once, and keeps its bounds and
+buffered versions. Predicate-heavy geometries are prepared in place.
+Shoelace areas are computed for a whole floor at once with load_areas, or
+taken from a PolylineSet with load_set (columnar payloads are never turned
+into vertex dicts), and zone layers (demolition) are unioned once so each
+room needs one overlay.
+Create one registry per calculation and drop it afterwards.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from app.services.polyline_set import PolylineSet, shoelace_areas
+from app.services.spatial_index import Bounds, PolygonIndex, polyline_bounds
+
+logger = logging.getLogger(__name__)
+
+
+class PolylineGeometry:
+    """Shapely views of one polyline, built lazily and kept for the whole calculation."""
+
+    __slots__ = ('polyline', 'bounds', 'polygon', 'error', 'signed_area', '_valid', '_repaired',
+                 '_repaired_valid', '_buffers', '_snapped', '_prepared')
+
+    def __init__(self, polyline: Dict[str, Any], vertices: Optional[np.ndarray] = None):
+        """
+        Args:
+            polyline: Polyline dict, the key of the geometry in its registry
+            vertices: (n, 2) coordinates of a polyline from a PolylineSet; read from polyline['vertices'] if None
+        """
+        self.polyline = polyline
+        if vertices is None:
+            self.bounds: Optional[Bounds] = polyline_bounds(polyline)
+        elif len(vertices) < 3:
+            self.bounds = None
+        else:
+            low = vertices.min(axis=0).tolist()
+            high = vertices.max(axis=0).tolist()
+            self.bounds = (low[0], low[1], high[0], high[1])
+        self.polygon: Optional[Polygon] = None
+        self.error: Optional[str] = None
+        self.signed_area: Optional[float] = None
+        self._valid: Optional[bool] = None
+        self._repaired = None
+        self._repaired_valid: Optional[bool] = None
+        self._buffers: Dict[float, Any] = {}
+        self._snapped: Dict[float, Any] = {}
+        self._prepared = False
+
+        if self.bounds is not None:
+            try:
+                if vertices is None:
+                    vertices = [(float(v['x']), float(v['y'])) for v in polyline['vertices']]
+                self.polygon = Polygon(vertices)
+            except Exception as e:
+                self.error = str(e)
+
+    @property
+    def valid(self) -> bool:
+        """Validity of the polygon as drawn (False if there is no polygon)."""
+        if self._valid is None:
+            self._valid = self.polygon is not None and self.polygon.is_valid
+        return self._valid
+
+    @property
+    def repaired(self):
+        """The polygon, or its buffer(0) repair if it is invalid."""
+        if self._repaired is None and self.polygon is not None:
+            self._repaired = self.polygon if self.valid else self.polygon.buffer(0)
+        return self._repaired
+
+    @property
+    def repaired_valid(self) -> bool:
+        if self._repaired_valid is None:
+            self._repaired_valid = self.repaired is not None and self.repaired.is_valid
+        return self._repaired_valid
+
+    def prepared(self) -> Polygon:
+        """The polygon, prepared for repeated predicates (contains, intersects)."""
+        if not self._prepared:
+            shapely.prepare(self.polygon)
+            self._prepared = True
+        return self.polygon
+
+    def buffered(self, distance: float):
+        """The repaired polygon buffered by distance, prepared; built once per distance."""
+        geometry = self._buffers.get(distance)
+        if geometry is None:
+            geometry = self.repaired.buffer(distance)
+            shapely.prepare(geometry)
+            self._buffers[distance] = geometry
+        return geometry
+
+    def snapped(self, grid_size: float):
+        """The repaired polygon with its coordinates snapped to grid_size, prepared; built once per grid."""
+        geometry = self._snapped.get(grid_size)
+        if geometry is None:
+            geometry = shapely.set_precision(self.repaired, grid_size)
+            shapely.prepare(geometry)
+            self._snapped[grid_size] = geometry
+        return geometry
+
+
+class ZoneUnion:
+    """Union of zone polygons (e.g. demolition zones), prepared for one overlay per room."""
+
+    __slots__ = ('count', 'geometry')
+
+    def __init__(self, geometries: Iterable[PolylineGeometry]):
+        """
+        Args:
+            geometries: Zone geometries; missing or invalid polygons are left out
+        """
+        polygons = [g.polygon for g in geometries if g.polygon is not None and g.valid]
+        self.count = len(polygons)
+        self.geometry = None
+        if polygons:
+            self.geometry = shapely.unary_union(polygons)
+            shapely.prepare(self.geometry)
+
+    def intersection_area(self, geometry: PolylineGeometry) -> float:
+        """Area of a valid polygon that lies inside the zones (0 if the polygon is missing or invalid)."""
+        if self.geometry is None or geometry.polygon is None or not geometry.valid:
+            return 0.0
+        if not self.geometry.intersects(geometry.polygon):
+            return 0.0
+        if self.geometry.contains(geometry.polygon):
+            return geometry.polygon.area
+        return self.geometry.intersection(geometry.polygon).area
+
+
+class GeometryRegistry:
+    """Maps polyline dicts to their PolylineGeometry for the duration of one calculation."""
+
+    def __init__(self):
+        # id(polyline) -> geometry; the geometry keeps the dict alive so ids cannot be reused
+        self._geometries: Dict[int, PolylineGeometry] = {}
+
+    def __len__(self) -> int:
+        return len(self._geometries)
+
+    def get(self, polyline: Dict[str, Any]) -> PolylineGeometry:
+        geometry = self._geometries.get(id(polyline))
+        if geometry is None:
+            geometry = PolylineGeometry(polyline)
+            self._geometries[id(polyline)] = geometry
+        return geometry
+
+    def bounds(self, polyline: Dict[str, Any]) -> Optional[Bounds]:
+        return self.get(polyline).bounds
+
+    def load_set(self, polylines: PolylineSet) -> List[Dict[str, Any]]:
+        """
+        Register the polylines of a PolylineSet, with their areas, straight from its arrays.
+
+        Args:
+            polylines: Polylines of one drawing
+
+        Returns:
+            list: One {'layer': ...} dict per polyline, in set order, to use as the polylines
+                of the calculation (their geometries never read vertex dicts)
+        """
+        records = []
+        for index, (layer, area) in enumerate(zip(polylines.layers(), polylines.signed_areas().tolist())):
+            record = {'layer': layer}
+            geometry = PolylineGeometry(record, polylines.vertices(index))
+            geometry.signed_area = area
+            self._geometries[id(record)] = geometry
+            records.append(record)
+        return records
+
+    def load_areas(self, polylines: Sequence[Dict[str, Any]]) -> None:
+        """
+        Compute the shoelace area of every polyline in one vectorized pass.
+
+        Args:
+            polylines: Polylines of a floor; those whose area is already known are skipped
+        """
+        polylines = [polyline for polyline in polylines if self.get(polyline).signed_area is None]
+        if not polylines:
+            return
+        try:
+            coords = np.array([(v['x'], v['y']) for polyline in polylines for v in polyline.get('vertices', [])],
+                              dtype=np.float64).reshape(-1, 2)
+        except (KeyError, TypeError, ValueError):
+            if len(polylines) == 1:
+                raise
+            # Load the well-formed polylines one by one; area() raises on the malformed ones
+            for polyline in polylines:
+                try:
+                    self.load_areas([polyline])
+                except (KeyError, TypeError, ValueError):
+                    pass
+            return
+        counts = [len(polyline.get('vertices', [])) for polyline in polylines]
+        offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        for polyline, area in zip(polylines, shoelace_areas(coords, offsets).tolist()):
+            self.get(polyline).signed_area = area
+
+    def area(self, polyline: Dict[str, Any]) -> float:
+        """Unsigned shoelace area of a polyline (0 below 3 vertices), loaded on first use if needed."""
+        geometry = self.get(polyline)
+        if geometry.signed_area is None:
+            self.load_areas([polyline])
+        return abs(geometry.signed_area)
+
+    def union(self, polylines: Sequence[Dict[str, Any]]) -> ZoneUnion:
+        """Union the valid polygons of polylines into one prepared zone."""
+        return ZoneUnion(self.get(polyline) for polyline in polylines)
+
+    def index(self, polylines: Sequence[Dict[str, Any]]) -> PolygonIndex:
+        """Build a PolygonIndex over polylines from the bounds already known to the registry."""
+        return PolygonIndex(polylines, [self.bounds(polyline) for polyline in polylines])
+
+    def stats(self) -> Tuple[int, int]:
+        """Return (number of polylines, number of polygons that needed a repair)."""
+        repaired = sum(1 for g in self._geometries.values() if g._valid is False)
+        return len(self._geometries), repaired
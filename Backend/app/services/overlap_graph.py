@@ -0,0 +1,226 @@
+"""
+Containment and overlap graph between the main SDP_1 polygons of a floor
+side and its special surfaces (voids, h < 1.80 m, parking...).
+
+Each special surface is linked once to the main polygons whose bounding box
+touches its own. A link answers, on first use and from memory afterwards,
+whether the main polygon contains the special surface and how much of the
+special surface lies inside it. The SDP deductions and the TA passes read
+the same graph instead of running their own overlays.
+
+With a grid size, areas come from a single overlay of the two polygons
+snapped to that grid (shapely precision model) instead of the legacy
+tolerance / buffer / estimate cascade.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import shapely
+
+from app.services.geometry_registry import GeometryRegistry
+
+logger = logging.getLogger(__name__)
+
+# Tolerance added around a special surface for nearly tangent intersections
+TANGENT_TOLERANCE = 0.001
+# Buffer of the TA Projet fallback estimate, when a special surface only touches a main polygon
+ESTIMATE_BUFFER = 0.05
+
+
+class OverlapLink:
+    """Edge between a special surface and one main polygon; geometric answers are memoized."""
+
+    __slots__ = ('graph', 'special', 'main', '_contained', '_area', '_estimate')
+
+    def __init__(self, graph: 'OverlapGraph', special: int, main: int):
+        """
+        Args:
+            graph: Graph owning the link
+            special: Position of the special surface in graph.specials
+            main: Position of the main polygon in graph.mains
+        """
+        self.graph = graph
+        self.special = special
+        self.main = main
+        self._contained: Optional[bool] = None
+        self._area: Optional[float] = None
+        self._estimate: Optional[float] = None
+
+    @property
+    def contained(self) -> bool:
+        """True if the special surface lies entirely inside the main polygon (both valid)."""
+        if self._contained is None:
+            self._contained = self.graph._contains(self.graph.mains[self.main], self.graph.specials[self.special])
+        return self._contained
+
+    @property
+    def area(self) -> float:
+        """
+        Intersection area: of the snapped polygons in snapped mode, otherwise of the repaired
+        polygons with TANGENT_TOLERANCE around the special surface.
+        """
+        if self._area is None:
+            graph = self.graph
+            if graph.grid_size:
+                self._area = graph._snapped_area(graph.specials[self.special], graph.mains[self.main])
+            else:
+                self._area = graph._intersection_area(graph.specials[self.special], graph.mains[self.main])
+        return self._area
+
+    def estimated_area(self) -> float:
+        """
+        Area counted by the TA Projet rules: the intersection area, or when it is 0, an
+        estimate from the intersection with the special surface buffered by ESTIMATE_BUFFER.
+        In snapped mode the snapped overlay is final and no estimate is made.
+        """
+        area = self.area
+        if area > 0 or self.graph.grid_size:
+            return area
+        if self._estimate is None:
+            self._estimate = self.graph._buffered_estimate(self.graph.specials[self.special],
+                                                           self.graph.mains[self.main])
+        return self._estimate
+
+
+class OverlapGraph:
+    """Links between the special surfaces and the main polygons of one floor side."""
+
+    def __init__(self, geometries: GeometryRegistry, mains: Sequence[Dict[str, Any]],
+                 specials: Sequence[Dict[str, Any]], margin: float = 0.0, grid_size: Optional[float] = None):
+        """
+        Args:
+            geometries: Registry of the floor's polygons
+            mains: Main SDP_1 polylines
+            specials: Special polylines
+            margin: Distance added around each special surface's box when linking it
+            grid_size: Snap grid of the overlays (e.g. 0.001 for 1 mm), None for the legacy cascade
+        """
+        self.geometries = geometries
+        self.grid_size = grid_size
+        self.mains = list(mains)
+        self.specials = list(specials)
+        index = geometries.index(self.mains)
+        # Links of each special surface, in main polyline order
+        self.links: List[List[OverlapLink]] = [
+            [OverlapLink(self, position, main) for main in
+             index.candidates(special, margin, geometries.bounds(special))]
+            for position, special in enumerate(self.specials)
+        ]
+        logger.info(f"Graphe de recouvrement: {len(self.mains)} polylignes principales, "
+                    f"{len(self.specials)} surfaces spéciales, {sum(len(links) for links in self.links)} liens")
+
+    def parent(self, special: int, accept: Optional[Callable[[int], Any]] = None) -> Optional[int]:
+        """
+        Position of the first main polygon that contains a special surface.
+
+        Args:
+            special: Position of the special surface
+            accept: Only consider main positions for which accept(position) is true
+
+        Returns:
+            int: Main position, None if no main polygon contains it
+        """
+        for link in self.links[special]:
+            if (accept is None or accept(link.main)) and link.contained:
+                return link.main
+        return None
+
+    # --- Overlays, run once per link ---------------------------------------------------------------
+
+    def _contains(self, container: Dict[str, Any], polyline: Dict[str, Any]) -> bool:
+        try:
+            inner = self.geometries.get(polyline)
+            outer = self.geometries.get(container)
+            if inner.polygon is None or outer.polygon is None:
+                return False
+            if not inner.valid or not outer.valid:
+                return False
+            # Polygone principal préparé, testé de nombreuses fois
+            return outer.prepared().contains(inner.polygon)
+        except Exception as e:
+            logger.warning(f"Erreur lors de la vérification de contenance: {str(e)}")
+            return False
+
+    def _intersection_area(self, polyline1: Dict[str, Any], polyline2: Dict[str, Any]) -> float:
+        try:
+            geometry1 = self.geometries.get(polyline1)
+            geometry2 = self.geometries.get(polyline2)
+            # Moins de 3 sommets : pas de bornes
+            if geometry1.bounds is None or geometry2.bounds is None:
+                return 0.0
+
+            if geometry1.polygon is None or geometry2.polygon is None:
+                logger.warning(f"Erreur lors de la création des polygones: {geometry1.error or geometry2.error}")
+                return 0.0
+
+            poly1 = geometry1.repaired
+            poly2 = geometry2.repaired
+            if not geometry1.repaired_valid or not geometry2.repaired_valid:
+                logger.warning(f"Polygone toujours invalide après réparation: "
+                               f"{polyline1.get('layer', 'inconnu')} / {polyline2.get('layer', 'inconnu')}")
+                return 0.0
+
+            poly1_buffered = geometry1.buffered(TANGENT_TOLERANCE)
+            if not poly1_buffered.intersects(poly2):
+                return 0.0
+
+            intersection_area = poly1_buffered.intersection(poly2).area
+            # Si l'intersection est très petite, essayer sans tolérance
+            if intersection_area < 0.01 and poly1.intersects(poly2):
+                intersection_area = poly1.intersection(poly2).area
+            return intersection_area
+        except Exception as e:
+            logger.warning(f"Erreur lors du calcul d'intersection: {str(e)}")
+            return 0.0
+
+    def _snapped_area(self, polyline1: Dict[str, Any], polyline2: Dict[str, Any]) -> float:
+        try:
+            geometry1 = self.geometries.get(polyline1)
+            geometry2 = self.geometries.get(polyline2)
+            if geometry1.polygon is None or geometry2.polygon is None:
+                return 0.0
+
+            snapped1 = geometry1.snapped(self.grid_size)
+            snapped2 = geometry2.snapped(self.grid_size)
+            if snapped1.is_empty or snapped2.is_empty or not snapped1.intersects(snapped2):
+                return 0.0
+            return shapely.intersection(snapped1, snapped2, grid_size=self.grid_size).area
+        except Exception as e:
+            logger.warning(f"Erreur lors du calcul d'intersection sur grille: {str(e)}")
+            return 0.0
+
+    def _buffered_estimate(self, special: Dict[str, Any], main: Dict[str, Any]) -> float:
+        try:
+            special_geometry = self.geometries.get(special)
+            main_geometry = self.geometries.get(main)
+            if special_geometry.polygon is None or not special_geometry.repaired_valid:
+                return 0.0
+            if main_geometry.polygon is None or not main_geometry.valid:
+                return 0.0
+
+            special_polygon = special_geometry.repaired
+            special_buffered = special_geometry.buffered(ESTIMATE_BUFFER)
+            main_polygon = main_geometry.polygon
+            if not special_buffered.intersects(main_polygon):
+                return 0.0
+            buffer_area = special_buffered.intersection(main_polygon).area
+            if buffer_area <= 0.001:
+                return 0.0
+
+            # Aire de la surface spéciale au prorata de son intersection avec le buffer
+            special_area = special_polygon.area
+            estimated_area = special_area * (buffer_area / special_buffered.area)
+            if estimated_area > 0.001 and estimated_area <= special_area:
+                return estimated_area
+
+            # Dernier essai avec un calcul direct, puis valeur minimale basée sur le buffer
+            actual_area = special_polygon.intersection(main_polygon).area
+            if actual_area > 0:
+                return actual_area
+            if buffer_area > 0.1:
+                return min(special_area, buffer_area * 0.5)
+            return 0.0
+        except Exception as e:
+            logger.warning(f"Erreur lors de la vérification d'intersection avec buffer: {str(e)}")
+            return 0.0
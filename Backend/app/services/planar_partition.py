@@ -0,0 +1,77 @@
+"""
+Planar partition of the polygons of one floor side.
+
+The boundaries of every polygon (SDP_1 rooms, voids, h < 1.80 m zones,
+demolition zones...) are noded together once and polygonized into faces
+that do not overlap. Each face is labelled with the polygons that cover
+it, found with one bulk STRtree query on a point inside each face. Every
+surface of the floor is then a sum of face areas: two overlapping rooms or
+a void across two rooms are counted exactly once, without pairwise
+intersections or tolerance clamps.
+"""
+
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.services.geometry_registry import GeometryRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PlanarPartition:
+    """Non-overlapping faces of a set of polylines, with the polylines covering each face."""
+
+    def __init__(self, geometries: GeometryRegistry, polylines: Sequence[Dict[str, Any]]):
+        """
+        Args:
+            geometries: Registry of the floor's polygons
+            polylines: Polylines to partition; covers are positions in this list.
+                Polylines without a polygon (fewer than 3 vertices, bad coordinates) are left out.
+        """
+        self.polylines = list(polylines)
+        positions: List[int] = []
+        polygons = []
+        for position, polyline in enumerate(self.polylines):
+            geometry = geometries.get(polyline)
+            if geometry.polygon is None:
+                continue
+            polygon = geometry.repaired
+            if polygon is None or polygon.is_empty:
+                continue
+            positions.append(position)
+            polygons.append(polygon)
+
+        self.areas = np.zeros(0, dtype=np.float64)
+        self.covers: List[Tuple[int, ...]] = []
+        if not polygons:
+            return
+
+        # Noeud unique de tous les contours, puis faces du graphe planaire
+        linework = shapely.union_all(shapely.boundary(np.array(polygons, dtype=object)))
+        faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(linework)))
+        if len(faces) == 0:
+            return
+
+        # Un point intérieur par face suffit : aucun contour ne traverse une face
+        tree = STRtree(polygons)
+        face_indices, polygon_indices = tree.query(shapely.point_on_surface(faces), predicate='within')
+        covers: List[List[int]] = [[] for _ in range(len(faces))]
+        for face, polygon in zip(face_indices.tolist(), polygon_indices.tolist()):
+            covers[face].append(positions[polygon])
+
+        self.areas = shapely.area(faces)
+        self.covers = [tuple(sorted(cover)) for cover in covers]
+        logger.info(f"Partition planaire: {len(polygons)} polygones, {len(faces)} faces")
+
+    def __len__(self) -> int:
+        return len(self.covers)
+
+    def faces(self):
+        """Yield (area, positions of the covering polylines in ascending order) for every covered face."""
+        for area, cover in zip(self.areas.tolist(), self.covers):
+            if cover:
+                yield area, cover
@@ -0,0 +1,419 @@
+"""
+Columnar, array-backed container for extracted polylines.
+
+All vertices of a drawing live in a single float64 (N, 2) NumPy buffer;
+each polyline is described by an offset into that buffer plus a layer id,
+closed flag, color, lineweight and entity type. The legacy
+{'x': .., 'y': ..} dict shape is only built at the API edge.
+"""
+
+import logging
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Entity types that end up in the polyline set, indexed by type id
+POLYLINE_TYPES = ('LWPOLYLINE', 'POLYLINE')
+
+# Below this many polylines still being summed, shoelace_areas finishes them one by one
+SHOELACE_SCALAR_TAIL = 16
+
+# Response shapes understood by serialize_extraction_result
+GEOMETRY_FORMAT_LEGACY = 'legacy'
+GEOMETRY_FORMAT_COLUMNAR = 'columnar'
+GEOMETRY_FORMATS = (GEOMETRY_FORMAT_LEGACY, GEOMETRY_FORMAT_COLUMNAR)
+
+
+class PolylineSet:
+    """Immutable set of polylines stored as flat NumPy arrays."""
+
+    __slots__ = ('coords', 'offsets', 'layer_ids', 'layer_names', 'closed',
+                 'colors', 'lineweights', 'type_ids')
+
+    def __init__(self, coords: np.ndarray, offsets: np.ndarray, layer_ids: np.ndarray,
+                 layer_names: Sequence[str], closed: np.ndarray, colors: np.ndarray,
+                 lineweights: np.ndarray, type_ids: np.ndarray):
+        """
+        Wrap pre-built arrays; use PolylineSetBuilder or the from_* constructors instead.
+
+        Args:
+            coords: float64 array of shape (N, 2) holding every vertex
+            offsets: int64 array of shape (M + 1,), polyline i spans coords[offsets[i]:offsets[i + 1]]
+            layer_ids: int32 array of shape (M,) indexing layer_names
+            layer_names: Distinct layer names
+            closed: bool array of shape (M,)
+            colors: int16 array of shape (M,), raw ACI color (0 = BYBLOCK)
+            lineweights: int16 array of shape (M,)
+            type_ids: uint8 array of shape (M,) indexing POLYLINE_TYPES
+        """
+        self.coords = coords
+        self.offsets = offsets
+        self.layer_ids = layer_ids
+        self.layer_names = list(layer_names)
+        self.closed = closed
+        self.colors = colors
+        self.lineweights = lineweights
+        self.type_ids = type_ids
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state[name])
+
+    @property
+    def vertex_count(self) -> int:
+        return int(self.offsets[-1])
+
+    def vertices(self, index: int) -> np.ndarray:
+        """Return an (n, 2) view on the vertices of polyline index."""
+        return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+    def layer(self, index: int) -> str:
+        return self.layer_names[self.layer_ids[index]]
+
+    def layers(self) -> List[str]:
+        """Return the layer name of every polyline, in order."""
+        names = self.layer_names
+        return [names[i] for i in self.layer_ids.tolist()]
+
+    def select(self, indices: Iterable[int]) -> 'PolylineSet':
+        """
+        Build a new set holding only the given polylines.
+
+        Args:
+            indices: Polyline indices to keep, in the desired order
+
+        Returns:
+            PolylineSet: Subset sharing the same layer table
+        """
+        indices = np.asarray(list(indices), dtype=np.int64)
+        starts = self.offsets[indices]
+        counts = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        if len(indices):
+            vertex_index = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+            coords = self.coords[vertex_index]
+        else:
+            coords = np.empty((0, 2), dtype=np.float64)
+        return PolylineSet(coords, offsets, self.layer_ids[indices], self.layer_names,
+                           self.closed[indices], self.colors[indices],
+                           self.lineweights[indices], self.type_ids[indices])
+
+    def signed_areas(self) -> np.ndarray:
+        """Return the signed shoelace area of every polyline (see shoelace_areas)."""
+        return shoelace_areas(self.coords, self.offsets)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Build the legacy list of polyline dicts expected by existing clients."""
+        names = self.layer_names
+        xs = self.coords[:, 0].tolist()
+        ys = self.coords[:, 1].tolist()
+        offsets = self.offsets.tolist()
+        layer_ids = self.layer_ids.tolist()
+        closed = self.closed.tolist()
+        colors = self.colors.tolist()
+        lineweights = self.lineweights.tolist()
+        type_ids = self.type_ids.tolist()
+
+        polylines = []
+        for i in range(len(layer_ids)):
+            start, end = offsets[i], offsets[i + 1]
+            polylines.append({
+                'type': POLYLINE_TYPES[type_ids[i]],
+                'layer': names[layer_ids[i]],
+                'vertices': [{'x': x, 'y': y} for x, y in zip(xs[start:end], ys[start:end])],
+                'closed': closed[i],
+                'color': colors[i] if colors[i] != 0 else 'N/A',
+                'lineweight': lineweights[i]
+            })
+        return polylines
+
+    def to_columnar(self) -> Dict[str, Any]:
+        """Build the compact JSON payload: flat coordinates plus per-polyline columns."""
+        return {
+            'format': GEOMETRY_FORMAT_COLUMNAR,
+            'types': list(POLYLINE_TYPES),
+            'layers': self.layer_names,
+            'coords': self.coords.ravel().tolist(),
+            'offsets': self.offsets.tolist(),
+            'layer_ids': self.layer_ids.tolist(),
+            'closed': self.closed.tolist(),
+            'colors': self.colors.tolist(),
+            'lineweights': self.lineweights.tolist(),
+            'type_ids': self.type_ids.tolist()
+        }
+
+    @classmethod
+    def empty(cls) -> 'PolylineSet':
+        return PolylineSetBuilder().build()
+
+    @classmethod
+    def from_dicts(cls, polylines: Iterable[Dict[str, Any]]) -> 'PolylineSet':
+        """
+        Build a set from the legacy list of polyline dicts (e.g. a client payload).
+
+        Args:
+            polylines: Dicts with 'layer', 'vertices' and optional 'closed', 'color', 'lineweight', 'type'
+
+        Returns:
+            PolylineSet: Columnar copy of the polylines
+        """
+        builder = PolylineSetBuilder()
+        for polyline in polylines or []:
+            color = polyline.get('color', 0)
+            lineweight = polyline.get('lineweight')
+            builder.add(
+                polyline.get('type', 'LWPOLYLINE'),
+                polyline.get('layer', '') if isinstance(polyline.get('layer', ''), str) else '',
+                [(float(v['x']), float(v['y'])) for v in polyline.get('vertices', [])],
+                bool(polyline.get('closed', False)),
+                color if isinstance(color, int) else 0,
+                lineweight if isinstance(lineweight, int) else -1
+            )
+        return builder.build()
+
+    @classmethod
+    def from_columnar(cls, payload: Dict[str, Any]) -> 'PolylineSet':
+        """
+        Build a set from the payload produced by to_columnar.
+
+        Args:
+            payload: Dict as returned by to_columnar
+
+        Returns:
+            PolylineSet: Rebuilt set
+
+        Raises:
+            ValueError: If the columns are malformed or inconsistent (payloads may come from clients)
+        """
+        offsets = _checked_array(payload.get('offsets', [0]), 'offsets', np.int64)
+        count = len(offsets) - 1
+        coords = _checked_array(payload.get('coords', []), 'coords', np.float64, ndim=None)
+        if coords.size % 2:
+            raise ValueError("Tampon de coordonnées de longueur impaire")
+        coords = coords.reshape(-1, 2)
+        if count < 0 or offsets[0] != 0 or offsets[-1] != len(coords) or np.any(np.diff(offsets) < 0):
+            raise ValueError("Offsets incohérents avec le tampon de coordonnées")
+
+        def column(name, dtype, default):
+            values = payload.get(name)
+            if values is None:
+                return np.full(count, default, dtype=dtype)
+            values = _checked_array(values, name, dtype)
+            if len(values) != count:
+                raise ValueError(f"Colonne '{name}' de longueur {len(values)}, attendu {count}")
+            return values
+
+        # Remap type ids through the sender's type table in case it differs from ours
+        sender_types = payload.get('types', list(POLYLINE_TYPES))
+        type_ids = column('type_ids', np.uint8, 0)
+        if count and type_ids.max() >= len(sender_types):
+            raise ValueError("Identifiant de type hors limites")
+        if list(sender_types) != list(POLYLINE_TYPES):
+            remap = np.array([POLYLINE_TYPES.index(t) if t in POLYLINE_TYPES else 0 for t in sender_types],
+                             dtype=np.uint8)
+            type_ids = remap[type_ids]
+
+        layer_names = list(payload.get('layers', []))
+        layer_ids = column('layer_ids', np.int32, 0)
+        if count and (layer_ids.min() < 0 or layer_ids.max() >= len(layer_names)):
+            raise ValueError("Identifiant de calque hors limites")
+
+        return cls(coords, offsets, layer_ids, layer_names,
+                   column('closed', np.bool_, False), column('colors', np.int16, 0),
+                   column('lineweights', np.int16, -1), type_ids)
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> 'PolylineSet':
+        """Build a set from either a legacy dict list or a columnar payload."""
+        if isinstance(payload, PolylineSet):
+            return payload
+        if isinstance(payload, dict):
+            return cls.from_columnar(payload)
+        return cls.from_dicts(payload or [])
+
+
+class PolylineSetBuilder:
+    """Accumulates polylines into growable typed buffers, then freezes them into a PolylineSet."""
+
+    def __init__(self):
+        self._coords = array('d')
+        self._offsets = array('q', [0])
+        self._layer_ids = array('i')
+        self._closed = array('b')
+        self._colors = array('h')
+        self._lineweights = array('h')
+        self._type_ids = array('B')
+        self._layer_index: Dict[str, int] = {}
+        self._layer_names: List[str] = []
+
+    def layer_id(self, layer: str) -> int:
+        """Return the id of layer, registering it on first use."""
+        layer_id = self._layer_index.get(layer)
+        if layer_id is None:
+            layer_id = len(self._layer_names)
+            self._layer_index[layer] = layer_id
+            self._layer_names.append(layer)
+        return layer_id
+
+    def add(self, dxftype: str, layer: str, points: Iterable[Sequence[float]], closed: bool,
+            color: int, lineweight: Optional[int]):
+        """
+        Append one polyline.
+
+        Args:
+            dxftype: 'LWPOLYLINE' or 'POLYLINE'
+            layer: Layer name
+            points: Vertices; only the first two components of each are kept
+            closed: Whether the polyline is closed
+            color: Raw ACI color
+            lineweight: DXF lineweight, None for default
+        """
+        coords = self._coords
+        count = 0
+        for point in points:
+            coords.append(point[0])
+            coords.append(point[1])
+            count += 1
+        self._offsets.append(self._offsets[-1] + count)
+        self._layer_ids.append(self.layer_id(layer))
+        self._closed.append(1 if closed else 0)
+        self._colors.append(color)
+        self._lineweights.append(-1 if lineweight is None else lineweight)
+        self._type_ids.append(POLYLINE_TYPES.index(dxftype) if dxftype in POLYLINE_TYPES else 0)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def build(self) -> PolylineSet:
+        return PolylineSet(
+            _to_numpy(self._coords, np.float64).reshape(-1, 2),
+            _to_numpy(self._offsets, np.int64),
+            _to_numpy(self._layer_ids, np.int32),
+            self._layer_names,
+            _to_numpy(self._closed, np.int8).astype(np.bool_),
+            _to_numpy(self._colors, np.int16),
+            _to_numpy(self._lineweights, np.int16),
+            _to_numpy(self._type_ids, np.uint8)
+        )
+
+
+def _checked_array(values: Any, name: str, dtype, ndim: Optional[int] = 1) -> np.ndarray:
+    """
+    Convert a column of a columnar payload, refusing values that do not fit dtype.
+
+    Raises:
+        ValueError: If the values are not numbers, overflow dtype or do not have ndim dimensions
+    """
+    try:
+        if np.issubdtype(dtype, np.integer):
+            wide = np.asarray(values, dtype=np.int64)
+            limits = np.iinfo(dtype)
+            if wide.size and (wide.min() < limits.min or wide.max() > limits.max):
+                raise ValueError(f"Colonne '{name}' hors limites")
+            checked = wide.astype(dtype)
+        else:
+            checked = np.asarray(values, dtype=dtype)
+            if not np.all(np.isfinite(checked)):
+                raise ValueError(f"Colonne '{name}' non finie")
+    except (TypeError, OverflowError) as e:
+        raise ValueError(f"Colonne '{name}' invalide: {str(e)}")
+    if ndim is not None and checked.ndim != ndim:
+        raise ValueError(f"Colonne '{name}' de dimension {checked.ndim}, attendu {ndim}")
+    return checked
+
+
+def _to_numpy(buffer: array, dtype) -> np.ndarray:
+    """Copy a typed array into a NumPy array without going through Python objects."""
+    if not len(buffer):
+        return np.empty(0, dtype=dtype)
+    return np.frombuffer(buffer, dtype=dtype).copy()
+
+
+def shoelace_areas(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Signed shoelace area of every polyline of a columnar buffer, in one pass.
+
+    Each polyline is summed vertex by vertex in the same order as the scalar
+    formula (area += xi * yj; area -= xj * yi), vectorized across polylines,
+    so results are bit-identical to the per-polyline Python loop. Polylines
+    with fewer than 3 vertices have an area of 0.
+
+    Args:
+        coords: float64 array of shape (N, 2)
+        offsets: int64 array of shape (M + 1,), polyline i spans coords[offsets[i]:offsets[i + 1]]
+
+    Returns:
+        np.ndarray: float64 array of shape (M,), positive for counter-clockwise polylines
+    """
+    counts = np.diff(offsets)
+    areas = np.zeros(len(counts), dtype=np.float64)
+    polygons = np.flatnonzero(counts >= 3)
+    if not len(polygons):
+        return areas
+
+    # Longest polylines first, so the ones still being summed at step k are a prefix
+    order = polygons[np.argsort(-counts[polygons], kind='stable')]
+    starts = offsets[order]
+    sizes = counts[order]
+    descending = -sizes
+    xs = np.ascontiguousarray(coords[:, 0])
+    ys = np.ascontiguousarray(coords[:, 1])
+    sums = np.zeros(len(order), dtype=np.float64)
+
+    k = 0
+    while True:
+        active = int(np.searchsorted(descending, -k, side='left'))
+        if active < SHOELACE_SCALAR_TAIL:
+            break
+        i = starts[:active] + k
+        j = np.where(sizes[:active] > k + 1, i + 1, starts[:active])
+        sums[:active] = (sums[:active] + xs[i] * ys[j]) - xs[j] * ys[i]
+        k += 1
+
+    # A few long polylines left: finish them with the scalar loop
+    for position in range(active):
+        start, n = int(starts[position]), int(sizes[position])
+        x = xs[start:start + n].tolist()
+        y = ys[start:start + n].tolist()
+        area = float(sums[position])
+        for a in range(k, n):
+            b = (a + 1) % n
+            area += x[a] * y[b]
+            area -= x[b] * y[a]
+        sums[position] = area
+
+    areas[order] = sums / 2.0
+    return areas
+
+
+def serialize_extraction_result(result: Dict[str, Any], geometry_format: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Turn an extraction result into a JSON-ready dict at the API edge.
+
+    Args:
+        result: Result of extract_file_data, whose 'polylines' may be a PolylineSet
+        geometry_format: 'legacy' (default) for vertex dicts, 'columnar' for flat arrays
+
+    Returns:
+        dict: Shallow copy of result with 'polylines' serialized
+    """
+    polylines = result.get('polylines')
+    if not isinstance(polylines, PolylineSet):
+        return result
+
+    response = dict(result)
+    if geometry_format == GEOMETRY_FORMAT_COLUMNAR:
+        response['polylines'] = polylines.to_columnar()
+    else:
+        response['polylines'] = polylines.to_dicts()
+    return response
@@ -0,0 +1,571 @@
+"""
+Managed process pool for CPU-bound work: DXF parsing and surface computation.
+
+ezdxf parsing and shapely overlays hold the GIL, so running them inside a
+gunicorn worker stalls every other request that worker serves. Tasks
+submitted here run in a fixed set of warm worker processes that have
+already imported ezdxf and shapely. Every task has a timeout; a task that
+overruns or is cancelled while running has its worker process killed and
+replaced without disturbing the other workers.
+"""
+
+import atexit
+import collections
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Imported by every worker at start-up so the first task does not pay for it
+PRELOAD_MODULES = (
+    'numpy',
+    'ezdxf',
+    'ezdxf.addons.iterdxf',
+    'shapely',
+    'shapely.geometry',
+    'shapely.ops',
+    'openpyxl'
+)
+
+# Maximum time for a new worker to import PRELOAD_MODULES (seconds)
+WORKER_START_TIMEOUT = 60
+
+# How often a dispatcher wakes up to check for timeouts and cancellation (seconds)
+POLL_INTERVAL = 0.05
+
+TASK_QUEUED = 'queued'
+TASK_RUNNING = 'running'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+TASK_CANCELLED = 'cancelled'
+TASK_TIMEOUT = 'timeout'
+
+
+class PoolTaskError(Exception):
+    """Base class for failures caused by the pool rather than by the task itself."""
+
+
+class TaskTimeoutError(PoolTaskError):
+    """The task ran longer than its timeout and its worker was killed."""
+
+
+class TaskCancelledError(PoolTaskError):
+    """The task was cancelled before it finished."""
+
+
+class WorkerCrashedError(PoolTaskError):
+    """The worker process died while running the task."""
+
+
+def _worker_main(conn, preload: Sequence[str]):
+    """Worker process loop: receive (task_id, fn, args, kwargs), send back (task_id, ok, payload)."""
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass
+    # Tell the pool this worker is warm
+    conn.send(None)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        task_id, fn, args, kwargs = message
+        try:
+            result = fn(*args, **kwargs)
+            conn.send((task_id, True, result))
+        except BaseException as e:
+            try:
+                conn.send((task_id, False, e))
+            except Exception:
+                # The exception itself could not be pickled
+                conn.send((task_id, False, RuntimeError(f"{type(e).__name__}: {str(e)}")))
+
+
+class PoolTask:
+    """Handle on a submitted task."""
+
+    def __init__(self, task_id: int, fn: Callable, args: tuple, kwargs: dict, timeout: Optional[float],
+                 owner: Optional[str] = None):
+        self.id = task_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.owner = owner
+        self.name = getattr(fn, '__qualname__', repr(fn))
+        self.state = TASK_QUEUED
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self._result = None
+        self._error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._callbacks: List[Callable[['PoolTask'], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def add_done_callback(self, callback: Callable[['PoolTask'], None]):
+        """Call callback(task) when the task ends, right away if it already has."""
+        with self._callbacks_lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """
+        Wait for the task and return its result.
+
+        Args:
+            timeout: Maximum time to wait in seconds, None to wait until the task ends
+
+        Returns:
+            Whatever the task function returned
+
+        Raises:
+            TimeoutError: If the wait itself timed out (the task keeps running)
+            PoolTaskError: If the task timed out, was cancelled or lost its worker
+            Exception: Any exception raised by the task function
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Task {self.id} still running")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _start(self):
+        self.state = TASK_RUNNING
+        self.started_at = time.monotonic()
+
+    def _finish(self, state: str, result: Any = None, error: Optional[BaseException] = None):
+        self.state = state
+        self._result = result
+        self._error = error
+        self.finished_at = time.monotonic()
+        # Drop references to the inputs, they can be large
+        self.args = ()
+        self.kwargs = {}
+        with self._callbacks_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Erreur dans le rappel de fin de la tâche {self.id} : {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "waited_s": round((self.started_at or now) - self.submitted_at, 3),
+            "running_s": round(now - self.started_at, 3) if self.started_at and not self.done() else None,
+            "timeout_s": self.timeout
+        }
+
+
+def as_completed(tasks: Iterable[PoolTask], timeout: Optional[float] = None) -> Iterator[PoolTask]:
+    """
+    Yield tasks as they finish, whatever their submission order.
+
+    Args:
+        tasks: Submitted tasks
+        timeout: Maximum total wait in seconds, None to wait for every task
+
+    Raises:
+        TimeoutError: If some tasks are still running when timeout expires
+    """
+    tasks = list(tasks)
+    finished: 'queue.Queue[PoolTask]' = queue.Queue()
+    for task in tasks:
+        task.add_done_callback(finished.put)
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    for _ in range(len(tasks)):
+        wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            yield finished.get(timeout=wait)
+        except queue.Empty:
+            raise TimeoutError(f"{sum(not t.done() for t in tasks)} tasks still running")
+
+
+class _Worker:
+    """One worker process and the parent end of its pipe."""
+
+    def __init__(self, context, preload: Sequence[str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, tuple(preload)), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Wait until the worker has finished preloading its modules."""
+        try:
+            if self.conn.poll(timeout):
+                return self.conn.recv() is None
+        except (EOFError, OSError):
+            pass
+        return False
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ProcessPool:
+    """Fixed-size pool of warm worker processes with per-task timeouts and cancellation."""
+
+    def __init__(self, max_workers: Optional[int] = None, task_timeout: Optional[float] = None,
+                 enabled: Optional[bool] = None, start_method: Optional[str] = None,
+                 preload: Sequence[str] = PRELOAD_MODULES, wait_timeout: Optional[float] = None):
+        """
+        Initialize the pool with configuration from environment variables.
+
+        Workers are started lazily on the first submission, in the process
+        that submits (each gunicorn worker gets its own pool).
+
+        Args:
+            max_workers: Number of worker processes (PROCESS_POOL_WORKERS)
+            task_timeout: Default per-task timeout in seconds (PROCESS_POOL_TASK_TIMEOUT)
+            enabled: When False tasks run inline in the caller (PROCESS_POOL_ENABLED)
+            start_method: multiprocessing start method (PROCESS_POOL_START_METHOD)
+            preload: Modules imported by each worker at start-up
+            wait_timeout: Default time run() waits for a result, queueing included
+                (PROCESS_POOL_WAIT_TIMEOUT)
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv('PROCESS_POOL_WORKERS', '2'))
+        self.max_workers = max(1, max_workers)
+        if task_timeout is None:
+            # Below gunicorn's 120 s worker timeout so the request can still answer
+            task_timeout = float(os.getenv('PROCESS_POOL_TASK_TIMEOUT', '110'))
+        self.task_timeout = task_timeout if task_timeout > 0 else None
+        if wait_timeout is None:
+            # task_timeout only runs once a worker has the task: this also bounds the time spent queued
+            wait_timeout = float(os.getenv('PROCESS_POOL_WAIT_TIMEOUT', '110'))
+        self.wait_timeout = wait_timeout if wait_timeout > 0 else None
+        if enabled is None:
+            enabled = os.getenv('PROCESS_POOL_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self.start_method = start_method or os.getenv('PROCESS_POOL_START_METHOD', 'spawn')
+        self.preload = tuple(preload)
+
+        self._lock = threading.Condition()
+        self._queue: Deque[PoolTask] = collections.deque()
+        self._tasks: Dict[int, PoolTask] = {}
+        self._ids = itertools.count(1)
+        self._threads: List[threading.Thread] = []
+        self._workers: Dict[int, _Worker] = {}
+        self._owner_pid: Optional[int] = None
+        self._shutdown = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        self.worker_restarts = 0
+
+    def _ensure_started(self):
+        """Start dispatcher threads, once per process (a forked child starts its own)."""
+        if self._owner_pid == os.getpid():
+            return
+        context = multiprocessing.get_context(self.start_method)
+        self._context = context
+        self._threads = []
+        self._workers = {}
+        self._shutdown = False
+        self._owner_pid = os.getpid()
+        for slot in range(self.max_workers):
+            thread = threading.Thread(target=self._dispatch, args=(slot,),
+                                      name=f"process-pool-{slot}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.shutdown)
+        logger.info(f"Process pool started: {self.max_workers} workers ({self.start_method})")
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None, owner: Optional[str] = None,
+               **kwargs) -> PoolTask:
+        """
+        Queue fn(*args, **kwargs) for execution in a worker process.
+
+        fn and its arguments must be picklable (fn defined at module level).
+
+        Args:
+            fn: Function to run
+            timeout: Time limit in seconds once the task has started, defaults to the pool's
+            owner: User the task runs for; only they can cancel it through cancel(task_id, owner)
+
+        Returns:
+            PoolTask: Handle to wait on or cancel
+        """
+        with self._lock:
+            task = PoolTask(next(self._ids), fn, args, kwargs,
+                            timeout if timeout is not None else self.task_timeout, owner)
+            self.submitted += 1
+            self._tasks[task.id] = task
+
+            if self.enabled:
+                self._ensure_started()
+                self._queue.append(task)
+                self._lock.notify()
+                return task
+            task._start()
+
+        # Pool désactivé : la tâche s'exécute dans l'appelant, hors du verrou
+        self._run_inline(task)
+        return task
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, wait_timeout: Optional[float] = None,
+            owner: Optional[str] = None, **kwargs) -> Any:
+        """
+        Submit fn and wait for its result; see submit and PoolTask.result.
+
+        Args:
+            fn: Function to run
+            timeout: Time limit once the task has started, defaults to the pool's
+            wait_timeout: Time limit from submission, queueing included, defaults to the pool's
+            owner: User the task runs for
+
+        Raises:
+            TaskTimeoutError: If the task is still queued or running after wait_timeout (it is cancelled)
+        """
+        task = self.submit(fn, *args, timeout=timeout, owner=owner, **kwargs)
+        wait = wait_timeout if wait_timeout is not None else self.wait_timeout
+        try:
+            return task.result(wait)
+        except TimeoutError:
+            if not self.cancel(task.id):
+                # Terminée entre-temps
+                return task.result()
+            logger.error(f"Tâche {task.id} ({task.name}) abandonnée après {wait:g} s d'attente")
+            raise TaskTimeoutError(f"Délai de {wait:g} s dépassé en attendant {task.name}")
+
+    def cancel(self, task_id: int, owner: Optional[str] = None) -> bool:
+        """
+        Cancel a queued or running task; a running task's worker is killed.
+
+        Args:
+            task_id: Id of the task
+            owner: If given, tasks submitted for another user (or for no user) are left alone
+
+        Returns:
+            bool: True if the task was still pending or running
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.done() or (owner is not None and task.owner != owner):
+                return False
+            if task.state == TASK_QUEUED:
+                self._queue.remove(task)
+                self._finish(task, TASK_CANCELLED, error=TaskCancelledError(f"Tâche {task_id} annulée"))
+                return True
+            task.cancel_requested = True
+            return True
+
+    def get_task(self, task_id: int) -> Optional[PoolTask]:
+        return self._tasks.get(task_id)
+
+    def _run_inline(self, task: PoolTask):
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except Exception as e:
+            with self._lock:
+                self._finish(task, TASK_FAILED, error=e)
+        else:
+            with self._lock:
+                self._finish(task, TASK_DONE, result=result)
+
+    def _finish(self, task: PoolTask, state: str, result: Any = None, error: Optional[BaseException] = None):
+        if state == TASK_DONE:
+            self.completed += 1
+        elif state == TASK_CANCELLED:
+            self.cancelled += 1
+        elif state == TASK_TIMEOUT:
+            self.timeouts += 1
+        else:
+            self.failed += 1
+        self._tasks.pop(task.id, None)
+        task._finish(state, result, error)
+
+    def _next_task(self) -> Optional[PoolTask]:
+        with self._lock:
+            while not self._queue and not self._shutdown:
+                self._lock.wait()
+            if self._shutdown:
+                return None
+            task = self._queue.popleft()
+            task._start()
+            return task
+
+    def _dispatch(self, slot: int):
+        """Dispatcher thread: feeds one worker process, enforcing timeouts and cancellation."""
+        # Start the worker right away so it is warm before the first task arrives
+        worker = self._spawn_worker(slot)
+        while True:
+            task = self._next_task()
+            if task is None:
+                break
+
+            if worker is None or not worker.alive:
+                worker = self._spawn_worker(slot)
+                if worker is None:
+                    with self._lock:
+                        self._finish(task, TASK_FAILED,
+                                     error=WorkerCrashedError("Impossible de démarrer un processus de calcul"))
+                    continue
+
+            # The timeout runs from the moment the task reaches a worker
+            task.started_at = time.monotonic()
+            try:
+                worker.conn.send((task.id, task.fn, task.args, task.kwargs))
+            except Exception as e:
+                with self._lock:
+                    self._finish(task, TASK_FAILED, error=e)
+                continue
+
+            worker = self._wait_for_result(worker, task)
+            if worker is None:
+                self._workers.pop(slot, None)
+
+        if worker is not None:
+            worker.stop()
+
+    def _spawn_worker(self, slot: int) -> Optional[_Worker]:
+        """Start a worker for slot and wait until it is warm; None if it failed to start."""
+        worker = _Worker(self._context, self.preload)
+        if not worker.wait_ready(WORKER_START_TIMEOUT):
+            logger.error(f"Le processus de calcul {slot} n'a pas démarré")
+            worker.kill()
+            self._workers.pop(slot, None)
+            return None
+        self._workers[slot] = worker
+        return worker
+
+    def _wait_for_result(self, worker: _Worker, task: PoolTask) -> Optional[_Worker]:
+        """Wait for the running task; returns the worker, or None if it had to be killed."""
+        deadline = task.started_at + task.timeout if task.timeout else None
+        while True:
+            wait = POLL_INTERVAL if deadline is None else max(0.0, min(POLL_INTERVAL, deadline - time.monotonic()))
+            try:
+                ready = worker.conn.poll(wait)
+            except (EOFError, OSError):
+                ready = True
+
+            if ready:
+                try:
+                    _, ok, payload = worker.conn.recv()
+                except (EOFError, OSError):
+                    worker.kill()
+                    self.worker_restarts += 1
+                    with self._lock:
+                        self._finish(task, TASK_FAILED,
+                                     error=WorkerCrashedError(f"Le processus de calcul s'est arrêté pendant {task.name}"))
+                    return None
+                with self._lock:
+                    if ok:
+                        self._finish(task, TASK_DONE, result=payload)
+                    else:
+                        self._finish(task, TASK_FAILED, error=payload)
+                return worker
+
+            if task.cancel_requested:
+                logger.warning(f"Tâche {task.id} ({task.name}) annulée en cours d'exécution")
+                worker.kill()
+                self.worker_restarts += 1
+                with self._lock:
+                    self._finish(task, TASK_CANCELLED, error=TaskCancelledError(f"Tâche {task.id} annulée"))
+                return None
+
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.error(f"Tâche {task.id} ({task.name}) interrompue après {task.timeout} s")
+                worker.kill()
+                self.worker_restarts += 1
+                with self._lock:
+                    self._finish(task, TASK_TIMEOUT,
+                                 error=TaskTimeoutError(f"Délai de {task.timeout} s dépassé pour {task.name}"))
+                return None
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Report queue depth, running tasks and lifetime counters for this process.
+
+        Returns:
+            dict: Pool configuration, queue depth, active tasks and counters
+        """
+        with self._lock:
+            active = [task.describe() for task in self._tasks.values()]
+            queue_depth = len(self._queue)
+        return {
+            "enabled": self.enabled,
+            "started": self._owner_pid == os.getpid(),
+            "max_workers": self.max_workers,
+            "alive_workers": sum(1 for worker in list(self._workers.values()) if worker.alive),
+            "task_timeout_s": self.task_timeout,
+            "wait_timeout_s": self.wait_timeout,
+            "queue_depth": queue_depth,
+            "running": sum(1 for task in active if task["state"] == TASK_RUNNING),
+            "active_tasks": active,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+            "worker_restarts": self.worker_restarts
+        }
+
+    def shutdown(self):
+        """Cancel queued tasks and stop the worker processes."""
+        if self._owner_pid != os.getpid():
+            return
+        with self._lock:
+            self._shutdown = True
+            while self._queue:
+                task = self._queue.popleft()
+                self._finish(task, TASK_CANCELLED, error=TaskCancelledError("Arrêt du pool de processus"))
+            for task in self._tasks.values():
+                task.cancel_requested = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._owner_pid = None
+
+
+# Global process pool instance
+process_pool = ProcessPool()
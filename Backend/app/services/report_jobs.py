@@ -0,0 +1,344 @@
+"""
+Persistent queue of surface report jobs, backed by a local SQLite file.
+
+Generating a report for a big floor can take longer than a request should
+hold a gunicorn worker. A client submits a job, gets its id back at once,
+then polls (or follows) its status and downloads the artifacts once it is
+done. Jobs are rows of a SQLite database shared by all the gunicorn
+workers of the box, so no external broker is needed and queued jobs survive
+a restart. Each process runs a few dispatcher threads that claim jobs in a
+transaction, run the handler registered for the job kind (the heavy work
+goes to the process pool) and retry failed jobs with a growing delay. A
+running job holds a lease that its dispatcher keeps renewing; a job whose
+process died is picked up again once the lease expires, until it has used
+up its attempts.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+TERMINAL_STATES = (JOB_DONE, JOB_FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_job (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS report_job_pending ON report_job (status, run_after);
+"""
+
+# Number of lease renewals per lease period while a job runs
+LEASE_RENEWALS = 3
+
+# Columns returned by status queries (the payload can be large and is left out)
+STATUS_COLUMNS = 'id, kind, owner, status, result, error, attempts, max_attempts, created_at, updated_at'
+
+
+class JobError(Exception):
+    """Permanent job failure: the job is marked failed without retry."""
+    pass
+
+
+class ReportJobQueue:
+    """SQLite-backed job queue with dispatcher threads, leases and retries."""
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None,
+                 max_attempts: Optional[int] = None, retry_delay: Optional[float] = None,
+                 lease: Optional[float] = None, poll_interval: Optional[float] = None):
+        """
+        Initialize the queue with configuration from environment variables.
+
+        Dispatcher threads are started by start(), called by the WSGI entry points,
+        or else on first use; each gunicorn worker runs its own dispatchers on the shared file.
+
+        Args:
+            db_path: SQLite file of the queue (REPORT_JOBS_DB)
+            workers: Dispatcher threads per process (REPORT_JOBS_WORKERS)
+            max_attempts: Runs of a job before it is marked failed (REPORT_JOBS_MAX_ATTEMPTS)
+            retry_delay: Delay before a retry, multiplied by the attempt number (REPORT_JOBS_RETRY_DELAY)
+            lease: Seconds without renewal after which a running job whose process died is
+                run again (REPORT_JOBS_LEASE)
+            poll_interval: Seconds between two looks at the queue when idle (REPORT_JOBS_POLL_INTERVAL)
+        """
+        if db_path is None:
+            default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                        'report_jobs.db')
+            db_path = os.getenv('REPORT_JOBS_DB', default_path)
+        self.db_path = db_path
+        if workers is None:
+            workers = int(os.getenv('REPORT_JOBS_WORKERS', '1'))
+        self.workers = max(1, workers)
+        if max_attempts is None:
+            max_attempts = int(os.getenv('REPORT_JOBS_MAX_ATTEMPTS', '3'))
+        self.max_attempts = max(1, max_attempts)
+        if retry_delay is None:
+            retry_delay = float(os.getenv('REPORT_JOBS_RETRY_DELAY', '5'))
+        self.retry_delay = max(0.0, retry_delay)
+        if lease is None:
+            lease = float(os.getenv('REPORT_JOBS_LEASE', '900'))
+        self.lease = lease
+        if poll_interval is None:
+            poll_interval = float(os.getenv('REPORT_JOBS_POLL_INTERVAL', '1'))
+        self.poll_interval = poll_interval
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._owner_pid: Optional[int] = None
+        self._schema_ready = False
+
+    # --- Storage ----------------------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _describe(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'attempts': row['attempts'],
+            'maxAttempts': row['max_attempts'],
+            'createdAt': row['created_at'],
+            'updatedAt': row['updated_at']
+        }
+
+    # --- Public API -------------------------------------------------------------------------------
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]]) -> None:
+        """
+        Register the handler of a job kind.
+
+        Args:
+            kind: Job kind
+            handler: Called with the job payload in a dispatcher thread; returns the JSON-ready
+                result. JobError fails the job at once, other exceptions are retried.
+        """
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, owner: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            kind: Registered job kind
+            owner: User the job belongs to (only they can read it)
+            payload: JSON-serializable handler input
+
+        Returns:
+            dict: Description of the queued job
+
+        Raises:
+            ValueError: If the kind has no handler
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Type de tâche inconnu : {kind}")
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO report_job (id, kind, owner, status, payload, attempts, max_attempts, '
+                'created_at, updated_at, run_after) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)',
+                (job_id, kind, owner, JOB_QUEUED, json.dumps(payload), self.max_attempts, now, now, now))
+            row = conn.execute(f'SELECT {STATUS_COLUMNS} FROM report_job WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        self._wakeup.set()
+        logger.info(f"Tâche {kind} {job_id} mise en file pour {owner}")
+        return self._describe(row)
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Description of a job.
+
+        Args:
+            job_id: Job id
+            owner: If given, jobs of other users are not returned
+
+        Returns:
+            dict: Job description, None if there is no such job
+        """
+        self.start()
+        conn = self._connect()
+        try:
+            row = conn.execute(f'SELECT {STATUS_COLUMNS} FROM report_job WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or (owner is not None and row['owner'] != owner):
+            return None
+        return self._describe(row)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Number of jobs by status and dispatcher configuration."""
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM report_job GROUP BY status').fetchall())
+        finally:
+            conn.close()
+        return {
+            'db_path': self.db_path,
+            'workers': self.workers,
+            'max_attempts': self.max_attempts,
+            'jobs': {status: counts.get(status, 0) for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+        }
+
+    # --- Dispatch ---------------------------------------------------------------------------------
+
+    def start(self):
+        """Start the dispatcher threads, once per process (a forked child starts its own)."""
+        with self._lock:
+            if self._owner_pid == os.getpid():
+                return
+            self._owner_pid = os.getpid()
+            self._threads = []
+            for slot in range(self.workers):
+                thread = threading.Thread(target=self._dispatch, name=f"report-jobs-{slot}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"File de tâches de rapport démarrée: {self.workers} threads ({self.db_path})")
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """
+        Take the oldest runnable job: queued and due, or running with an expired lease.
+
+        A job whose lease expired after its last attempt is marked failed instead.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE : un seul processus à la fois peut réserver une tâche
+            conn.execute('BEGIN IMMEDIATE')
+            expired = conn.execute(
+                'UPDATE report_job SET status = ?, error = ?, updated_at = ?, lease_until = NULL '
+                'WHERE status = ? AND lease_until < ? AND attempts >= max_attempts',
+                (JOB_FAILED, "Processus arrêté pendant la dernière exécution", now, JOB_RUNNING, now)).rowcount
+            if expired:
+                logger.error(f"{expired} tâche(s) abandonnée(s) : processus arrêté pendant la dernière exécution")
+            row = conn.execute(
+                'SELECT * FROM report_job WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?) '
+                'ORDER BY created_at LIMIT 1', (JOB_QUEUED, now, JOB_RUNNING, now)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE report_job SET status = ?, attempts = attempts + 1, updated_at = ?, '
+                             'lease_until = ? WHERE id = ?', (JOB_RUNNING, now, now + self.lease, row['id']))
+            conn.execute('COMMIT')
+            return row
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _renew_lease(self, job_id: str, attempt: int, stop: threading.Event):
+        """Push the lease of a running job forward until stop is set, so it is not run twice."""
+        while not stop.wait(self.lease / LEASE_RENEWALS):
+            try:
+                conn = self._connect()
+                try:
+                    conn.execute('UPDATE report_job SET lease_until = ? WHERE id = ? AND status = ? AND attempts = ?',
+                                 (time.time() + self.lease, job_id, JOB_RUNNING, attempt))
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Bail de la tâche {job_id} non renouvelé: {str(e)}")
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, run_after: Optional[float] = None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('UPDATE report_job SET status = ?, result = ?, error = ?, updated_at = ?, '
+                         'run_after = COALESCE(?, run_after), lease_until = NULL WHERE id = ?',
+                         (status, json.dumps(result) if result is not None else None, error, now, run_after, job_id))
+        finally:
+            conn.close()
+
+    def _dispatch(self):
+        while True:
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur d'accès à la file de tâches: {str(e)}")
+                row = None
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(row)
+
+    def _call(self, handler: Callable[[Dict[str, Any]], Dict[str, Any]], row: sqlite3.Row,
+              attempt: int) -> Dict[str, Any]:
+        """Run the handler of a claimed job, renewing its lease until it returns."""
+        stop_renewal = threading.Event()
+        threading.Thread(target=self._renew_lease, args=(row['id'], attempt, stop_renewal),
+                         name=f"report-jobs-lease-{row['id'][:8]}", daemon=True).start()
+        try:
+            return handler(json.loads(row['payload']))
+        finally:
+            stop_renewal.set()
+
+    def _run(self, row: sqlite3.Row):
+        job_id = row['id']
+        attempt = row['attempts'] + 1
+        handler = self._handlers.get(row['kind'])
+        if handler is None:
+            self._finish(job_id, JOB_FAILED, error=f"Type de tâche inconnu : {row['kind']}")
+            return
+
+        logger.info(f"Tâche {row['kind']} {job_id}: exécution {attempt}/{row['max_attempts']}")
+        started = time.time()
+        try:
+            result = self._call(handler, row, attempt)
+        except JobError as e:
+            logger.error(f"Tâche {job_id} en échec: {str(e)}")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+            return
+        except Exception as e:
+            if attempt < row['max_attempts']:
+                delay = self.retry_delay * attempt
+                logger.warning(f"Tâche {job_id} en échec (essai {attempt}), nouvel essai dans {delay:.0f} s: {str(e)}")
+                self._finish(job_id, JOB_QUEUED, error=str(e), run_after=time.time() + delay)
+            else:
+                logger.error(f"Tâche {job_id} en échec après {attempt} essais: {str(e)}")
+                self._finish(job_id, JOB_FAILED, error=str(e))
+            return
+        self._finish(job_id, JOB_DONE, result=result)
+        logger.info(f"Tâche {job_id} terminée en {time.time() - started:.2f} s")
+
+
+# Global report job queue instance
+report_jobs = ReportJobQueue()
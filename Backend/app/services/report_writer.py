@@ -0,0 +1,175 @@
+"""
+Streaming Excel writer for the surface comparison workbook.
+
+The SDP, TA Projet, TA Existant and TA Summary sheets are written with
+openpyxl write-only worksheets: rows are appended once and flushed to the
+file, so memory stays flat for multi-floor projects with thousands of
+destination rows. Cell formatting goes through a few named styles
+registered once per workbook instead of Font / Alignment / Border objects
+built for every cell.
+"""
+
+import logging
+from typing import IO, Any, Iterable, List, Optional, Sequence, Union
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.comments import Comment
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
+
+from app.services.destination_catalog import destination_catalog
+from app.services.surface_engine import FloorSurfaces
+
+logger = logging.getLogger(__name__)
+
+HEADER_STYLE = 'gex_header'
+DATA_STYLE = 'gex_data'
+
+SDP_HEADERS = ("Étages", "Destinations", "Surface existante avant travaux (A)", "Surface créée (B)",
+               "Surface démolie reconstruite", "Surface supprimée (D)",
+               "Surface supprimée par changement de destination", "Surface projet", "Surface RDV")
+TA_HEADERS = ("Étages", "Destinations", "TA avant déduction", "Vides", "Surfaces dont h < 1.80m",
+              "TA après déduction")
+SUMMARY_HEADERS = ("Étages", "TA Existant", "TA Projet", "TA créé", "TA démoli/reconstruit", "TA supprimé")
+
+# Column width of each sheet
+SDP_WIDTH = 22
+TA_WIDTH = 15
+SUMMARY_WIDTH = 18
+
+# Cell comments explaining the calculations: (text, author)
+TA_COMMENT = ("TA après déduction = TA avant déduction - (Vides + Surfaces dont h < 1.80m)", "Calcul T.A.")
+CREE_COMMENT = ("TA créé = TA Projet - TA Existant (si positif)", "Calcul TA créé")
+SUPPRIME_COMMENT = ("TA supprimé = TA Existant - TA Projet + TA démoli/reconstruit (si positif)", "Calcul TA supprimé")
+
+
+def _thin_border() -> Border:
+    side = Side(border_style="thin", color="000000")
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+class ReportStyles:
+    """Named styles of a report workbook, registered once and shared by every cell."""
+
+    __slots__ = ('header', 'data')
+
+    def __init__(self, workbook: Workbook):
+        """
+        Args:
+            workbook: Workbook the styles are added to
+        """
+        centered = Alignment(horizontal='center', vertical='center')
+        self.header = NamedStyle(name=HEADER_STYLE, font=Font(name='Arial', size=11, bold=True),
+                                 alignment=centered, border=_thin_border())
+        self.data = NamedStyle(name=DATA_STYLE, font=Font(name='Arial', size=12),
+                               alignment=centered, border=_thin_border())
+        workbook.add_named_style(self.header)
+        workbook.add_named_style(self.data)
+
+
+class ReportSheet:
+    """Write-only worksheet that appends styled rows."""
+
+    __slots__ = ('worksheet', 'styles')
+
+    def __init__(self, workbook: Workbook, styles: ReportStyles, title: str, headers: Sequence[str], width: float):
+        """
+        Args:
+            workbook: Write-only workbook
+            styles: Named styles of the workbook
+            title: Sheet title
+            headers: Header row, one column per entry
+            width: Width of every header column
+        """
+        self.worksheet = workbook.create_sheet(title=title)
+        self.styles = styles
+        # Les largeurs doivent être fixées avant la première ligne
+        for column in range(len(headers)):
+            self.worksheet.column_dimensions[chr(ord('A') + column)].width = width
+        self.append(headers, style=HEADER_STYLE)
+
+    def append(self, values: Iterable[Any], style: str = DATA_STYLE, skip: int = 0,
+               comments: Optional[dict] = None) -> None:
+        """
+        Append one row.
+
+        Args:
+            values: Cell values; the first skip values are written without a style
+            style: Named style of the other cells
+            skip: Number of leading cells left unstyled (an empty cell is written as None)
+            comments: Column position -> (text, author) of the comments to attach
+        """
+        row: List[Any] = []
+        for position, value in enumerate(values):
+            if position < skip:
+                row.append(value)
+                continue
+            cell = WriteOnlyCell(self.worksheet, value=value)
+            cell.style = style
+            if comments and position in comments:
+                text, author = comments[position]
+                # Un commentaire ne peut être rattaché qu'à une seule cellule
+                cell.comment = Comment(text, author, width=300, height=50)
+            row.append(cell)
+        self.worksheet.append(row)
+
+
+def _rounded(value: float, empty: Any = 0) -> Any:
+    return round(value, 4) if value > 0 else empty
+
+
+def write_surface_workbook(floors: Sequence[FloorSurfaces], target: Union[str, IO[bytes]]) -> None:
+    """
+    Write the SDP, TA Projet, TA Existant and TA Summary sheets of computed floors.
+
+    Args:
+        floors: Floor results, written in list order (one block per floor, one summary row
+            per floor, plus a Total row when there are several floors)
+        target: Path of the xlsx file or binary file object
+    """
+    workbook = Workbook(write_only=True)
+    styles = ReportStyles(workbook)
+
+    # Feuille SDP : une ligne par destination du projet, le nom de l'étage sur la première
+    sdp = ReportSheet(workbook, styles, "SDP", SDP_HEADERS, SDP_WIDTH)
+    for results in floors:
+        floor_name = results.floor_name
+        for destination, values in results.sdp.items():
+            sdp.append((floor_name, destination_catalog.label(destination),
+                        _rounded(values.existant, ""), _rounded(values.creee, ""),
+                        _rounded(values.demolie_reconstruite, ""), _rounded(values.supprimee, ""),
+                        _rounded(values.supprimee_changement, ""), _rounded(values.projet, ""),
+                        _rounded(values.rdv, "")))
+            floor_name = None
+
+    # Feuilles TA Projet et TA Existant : chaque étage occupe au moins une ligne
+    for title, attribute in (("TA Projet", 'ta_projet'), ("TA Existant", 'ta_existant')):
+        ta = ReportSheet(workbook, styles, title, TA_HEADERS, TA_WIDTH)
+        for results in floors:
+            ta_values = getattr(results, attribute)
+            if not ta_values:
+                ta.append((results.floor_name,))
+                continue
+            first = True
+            for destination, values in ta_values.items():
+                ta.append((results.floor_name if first else None,
+                           destination_catalog.label(destination, humanize=True),
+                           _rounded(values.planchers_avant_deductions), _rounded(values.vides),
+                           _rounded(values.surfaces_h_moins_180), _rounded(values.total_ta)),
+                          skip=0 if first else 1, comments={5: TA_COMMENT})
+                first = False
+
+    # Feuille TA Summary : une ligne par étage, puis le total du projet
+    summary_sheet = ReportSheet(workbook, styles, "TA Summary", SUMMARY_HEADERS, SUMMARY_WIDTH)
+    summary_comments = {3: CREE_COMMENT, 5: SUPPRIME_COMMENT}
+    names = ('existant', 'projet', 'cree', 'demoli_reconstruit', 'supprime')
+    for results in floors:
+        summary = results.summary
+        summary_sheet.append([results.floor_name] + [_rounded(getattr(summary, name)) for name in names],
+                             comments=summary_comments)
+    if len(floors) > 1:
+        totals = [sum(getattr(results.summary, name) for results in floors) for name in names]
+        summary_sheet.append(["Total"] + [_rounded(total) for total in totals], comments=summary_comments)
+
+    workbook.save(target)
+    logger.info(f"Classeur de surfaces écrit: {len(floors)} étages")
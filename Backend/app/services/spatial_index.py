@@ -0,0 +1,78 @@
+"""
+Bounding-box index over SDP polylines for the surface calculations.
+
+Matching a special surface (void, h < 1.80 m, parking...) against the main
+SDP_1 polygons of a floor used to test every pair. A PolygonIndex puts the
+main polygons' bounding boxes in a shapely STRtree once per floor so each
+special surface is only tested against the mains its box touches. Candidates
+come back in list order, so "first match wins" loops keep their result.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+
+
+def polyline_bounds(polyline: Dict[str, Any]) -> Optional[Bounds]:
+    """
+    Return (min_x, min_y, max_x, max_y) of a polyline dict.
+
+    Returns:
+        None if the polyline has fewer than 3 vertices (it cannot form a polygon)
+    """
+    vertices = polyline.get('vertices', [])
+    if len(vertices) < 3:
+        return None
+    xs = [v['x'] for v in vertices]
+    ys = [v['y'] for v in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class PolygonIndex:
+    """STRtree over the bounding boxes of a list of polylines."""
+
+    def __init__(self, polylines: Sequence[Dict[str, Any]], bounds: Optional[Sequence[Optional[Bounds]]] = None):
+        """
+        Args:
+            polylines: Polylines to index; candidates are positions in this list
+            bounds: Precomputed bounds of each polyline (None entries are not indexed)
+        """
+        if bounds is None:
+            bounds = [polyline_bounds(polyline) for polyline in polylines]
+        positions = [position for position, b in enumerate(bounds) if b is not None]
+        self._positions = np.array(positions, dtype=np.int64)
+        self._tree = None
+        if positions:
+            boxes = np.array([bounds[position] for position in positions], dtype=np.float64)
+            self._tree = STRtree(shapely.box(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]))
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def candidates(self, polyline: Dict[str, Any], margin: float = 0.0,
+                   bounds: Optional[Bounds] = None) -> List[int]:
+        """
+        Positions of the indexed polylines whose box touches the box of polyline.
+
+        Args:
+            polyline: Polyline to match
+            margin: Distance added around the polyline's box (buffered comparisons)
+            bounds: Precomputed bounds of polyline
+
+        Returns:
+            list: Positions in ascending order, empty if polyline cannot form a polygon
+        """
+        if bounds is None:
+            bounds = polyline_bounds(polyline)
+        if bounds is None or self._tree is None:
+            return []
+        min_x, min_y, max_x, max_y = bounds
+        hits = self._tree.query(shapely.box(min_x - margin, min_y - margin, max_x + margin, max_y + margin))
+        return sorted(self._positions[hits].tolist())
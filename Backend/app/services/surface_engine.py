@@ -0,0 +1,569 @@
+"""
+Headless SDP / TA surface computation for one floor.
+
+The SurfaceEngine takes the existant and projet polylines of a floor and
+returns a FloorSurfaces object: per-destination SDP values (existant,
+projet, demolition, created, removed, RDV), TA Projet and TA Existant
+breakdowns (floor area, voids, h < 1.80 m, TA) and the TA summary. It does
+not depend on Flask or openpyxl, so Excel writers, visa writers and JSON
+endpoints all consume the same results, and a floor can be computed,
+cached or benchmarked on its own.
+
+In the 'partition' overlay mode the floor sides are not overlaid pair by
+pair: each side is cut once into a planar partition and every surface is a
+sum of face areas (see planar_partition).
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Set, Union
+
+from app.services.destination_catalog import MAIN_LAYER, destination_catalog
+from app.services.geometry_registry import GeometryRegistry, ZoneUnion
+from app.services.overlap_graph import OverlapGraph
+from app.services.planar_partition import PlanarPartition
+from app.services.polyline_set import PolylineSet
+
+logger = logging.getLogger(__name__)
+
+VOID_LAYER = 'GEX_EDS_SDP_2'
+H180_LAYER = 'GEX_EDS_SDP_3'
+DEMOLITION_LAYER = 'GEX_EDS_TA_SDP_CAHIER_DEMO'
+# Layers whose surfaces are deducted from the main SDP_1 surface that contains them
+SPECIAL_LAYER_PATTERNS = ('GEX_EDS_SDP_2', 'GEX_EDS_SDP_3', 'GEX_EDS_SDP_4', 'GEX_EDS_SDP_5', 'GEX_EDS_SDP_7')
+
+# Extra distance around a void / h < 1.80 m box when looking for main polylines;
+# covers the 0.05 buffer applied to them on the TA sheets
+TA_SEARCH_MARGIN = 0.1
+
+# Overlay modes of the void / h < 1.80 m areas: the legacy tolerance / buffer / estimate
+# cascade, one overlay of polygons snapped to SURFACE_SNAP_GRID (metres), or one planar
+# partition per floor side with every surface summed from its faces
+OVERLAY_LEGACY = 'legacy'
+OVERLAY_SNAPPED = 'snapped'
+OVERLAY_PARTITION = 'partition'
+OVERLAY_MODES = (OVERLAY_LEGACY, OVERLAY_SNAPPED, OVERLAY_PARTITION)
+DEFAULT_OVERLAY_MODE = os.getenv('SURFACE_OVERLAY_MODE', OVERLAY_LEGACY)
+SNAP_GRID_SIZE = float(os.getenv('SURFACE_SNAP_GRID', '0.001'))
+
+# Share of the projet surface counted as RDV, by destination family
+RDV_RATIOS = (('HABITATION', 0.75), ('COMMERCE', 0.80))
+RDV_DEFAULT_RATIO = 0.85
+
+# Removed surfaces below this value are rounding noise
+NEGLIGIBLE_SURFACE = 0.01
+
+
+def resolve_overlay_mode(mode: Optional[str] = None) -> str:
+    """
+    Return the overlay mode requested by an API call, SURFACE_OVERLAY_MODE by default.
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    mode = mode or DEFAULT_OVERLAY_MODE
+    if mode not in OVERLAY_MODES:
+        raise ValueError(f"Mode de calcul des intersections inconnu : {mode}")
+    return mode
+
+
+def is_special_layer(layer: Any) -> bool:
+    """True for layers whose surfaces are deducted (SDP_2, SDP_3, SDP_4, SDP_5, SDP_7)."""
+    if not isinstance(layer, str):
+        return False
+    return any(pattern in layer for pattern in SPECIAL_LAYER_PATTERNS)
+
+
+def is_main_sdp_layer(layer: Any) -> bool:
+    return isinstance(layer, str) and layer.startswith(MAIN_LAYER)
+
+
+def rdv_ratio(destination: str) -> float:
+    upper = destination.upper()
+    for family, ratio in RDV_RATIOS:
+        if family in upper:
+            return ratio
+    return RDV_DEFAULT_RATIO
+
+
+class SdpValues:
+    """SDP sheet values of one destination."""
+
+    __slots__ = ('existant', 'creee', 'demolie_reconstruite', 'supprimee', 'supprimee_changement', 'projet', 'rdv')
+
+    def __init__(self, existant: float, creee: float, demolie_reconstruite: float, supprimee: float,
+                 supprimee_changement: float, projet: float, rdv: float):
+        self.existant = existant
+        self.creee = creee
+        self.demolie_reconstruite = demolie_reconstruite
+        self.supprimee = supprimee
+        self.supprimee_changement = supprimee_changement
+        self.projet = projet
+        self.rdv = rdv
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TaValues:
+    """TA breakdown of one destination (TA Projet or TA Existant sheet)."""
+
+    __slots__ = ('planchers_avant_deductions', 'vides', 'surfaces_h_moins_180', 'total_ta')
+
+    def __init__(self, planchers_avant_deductions: float, vides: float, surfaces_h_moins_180: float):
+        self.planchers_avant_deductions = planchers_avant_deductions
+        self.vides = vides
+        self.surfaces_h_moins_180 = surfaces_h_moins_180
+        self.total_ta = max(0, planchers_avant_deductions - (vides + surfaces_h_moins_180))
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class TaSummary:
+    """TA Summary sheet values of a floor."""
+
+    __slots__ = ('existant', 'projet', 'cree', 'demoli_reconstruit', 'supprime')
+
+    def __init__(self, existant: float, projet: float, demoli_reconstruit: float):
+        self.existant = existant
+        self.projet = projet
+        self.cree = max(0, projet - existant)
+        self.demoli_reconstruit = demoli_reconstruit
+        supprime = max(0, existant - projet + demoli_reconstruit)
+        self.supprime = supprime if supprime >= NEGLIGIBLE_SURFACE else 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class FloorSurfaces:
+    """Results of the surface computation of one floor; destination dicts are in sorted key order."""
+
+    def __init__(self, floor_name: str, existant: Dict[str, float], projet: Dict[str, float],
+                 demolition: Dict[str, float], sdp: Dict[str, SdpValues], ta_projet: Dict[str, TaValues],
+                 ta_existant: Dict[str, TaValues], summary: TaSummary, overlay_mode: str = OVERLAY_LEGACY):
+        """
+        Args:
+            floor_name: Floor (level) name
+            existant: Existant SDP surface by destination, after deductions
+            projet: Projet SDP surface by destination, after deductions
+            demolition: Existant surface inside demolition zones, by destination
+            sdp: SDP sheet rows, one per projet destination
+            ta_projet: TA breakdown of the projet destinations
+            ta_existant: TA breakdown of the existant destinations
+            summary: TA totals of the floor
+            overlay_mode: Overlay mode the values were computed with
+        """
+        self.floor_name = floor_name
+        self.existant = existant
+        self.projet = projet
+        self.demolition = demolition
+        self.sdp = sdp
+        self.ta_projet = ta_projet
+        self.ta_existant = ta_existant
+        self.summary = summary
+        self.overlay_mode = overlay_mode
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready view of the results."""
+        return {
+            'floor_name': self.floor_name,
+            'overlay_mode': self.overlay_mode,
+            'existant': dict(self.existant),
+            'projet': dict(self.projet),
+            'demolition': dict(self.demolition),
+            'sdp': {destination: values.to_dict() for destination, values in self.sdp.items()},
+            'ta_projet': {destination: values.to_dict() for destination, values in self.ta_projet.items()},
+            'ta_existant': {destination: values.to_dict() for destination, values in self.ta_existant.items()},
+            'summary': self.summary.to_dict()
+        }
+
+
+class SurfaceEngine:
+    """Computes the SDP and TA surfaces of one floor from its existant and projet polylines."""
+
+    def __init__(self, existant_polylines: Union[Sequence[Dict[str, Any]], PolylineSet],
+                 projet_polylines: Union[Sequence[Dict[str, Any]], PolylineSet],
+                 floor_name: str = '', overlay_mode: Optional[str] = None):
+        """
+        Args:
+            existant_polylines: Polyline dicts or PolylineSet of the existant drawing (surface before works)
+            projet_polylines: Polyline dicts or PolylineSet of the projet drawing
+            floor_name: Floor name carried over to the results
+            overlay_mode: 'legacy', 'snapped' or 'partition', SURFACE_OVERLAY_MODE by default
+
+        Raises:
+            ValueError: If the overlay mode is unknown
+        """
+        self.floor_name = floor_name
+        self.overlay_mode = resolve_overlay_mode(overlay_mode)
+        # Shapely polygons and areas of every polyline, built once for the whole floor
+        self.geometries = GeometryRegistry()
+        self.existant_polylines = self._polylines(existant_polylines)
+        self.projet_polylines = self._polylines(projet_polylines)
+
+    @classmethod
+    def from_surfaces(cls, surfaces: Dict[str, Any], floor_name: str = '',
+                      overlay_mode: Optional[str] = None) -> 'SurfaceEngine':
+        """Build an engine from the 'surfaces' payload sent by the client (see normalize_surface_polylines)."""
+        return cls(surfaces.get('existant', {}).get('polylines', []),
+                   surfaces.get('projet', {}).get('polylines', []), floor_name, overlay_mode)
+
+    def compute(self) -> FloorSurfaces:
+        geometries = self.geometries
+        logger.info(f"Mode de calcul des intersections: {self.overlay_mode}")
+        logger.info(f"Existant polylines: {len(self.existant_polylines)}")
+        logger.info(f"Projet polylines: {len(self.projet_polylines)}")
+        if self.overlay_mode == OVERLAY_PARTITION:
+            # Une partition planaire par côté : toutes les surfaces sont des sommes d'aires de faces
+            existant, demolition, ta_existant, existant_destinations = self._partition_surfaces(
+                self.existant_polylines, 'Existant', with_demolition=True)
+            projet, _, ta_projet, projet_destinations = self._partition_surfaces(self.projet_polylines, 'Projet')
+        else:
+            geometries.load_areas(self.existant_polylines)
+            geometries.load_areas(self.projet_polylines)
+
+            # Un seul graphe de contenance / recouvrement par côté, partagé par les passes SDP et TA
+            existant_side = self._side(self.existant_polylines)
+            projet_side = self._side(self.projet_polylines)
+
+            existant, demolition = self._sdp_surfaces(existant_side, 'Existant', with_demolition=True)
+            projet, _ = self._sdp_surfaces(projet_side, 'Projet')
+
+            ta_projet, projet_destinations = self._ta_values(projet_side, estimate_overlaps=True)
+            ta_existant, existant_destinations = self._ta_values(existant_side)
+
+        logger.info(f"===== Résultats de calcul finaux =====")
+        for dest, value in existant.items():
+            logger.info(f"Existant - {dest}: {value}")
+        for dest, value in projet.items():
+            logger.info(f"Projet - {dest}: {value}")
+
+        sdp = {destination: self._sdp_values(destination, existant, projet, demolition)
+               for destination in sorted(projet_destinations)}
+
+        # Totals follow the destination set order, as the TA sheets did
+        ta_existant_total = 0
+        for destination in existant_destinations:
+            ta_existant_total += ta_existant[destination].total_ta
+        ta_projet_total = 0
+        for destination in projet_destinations:
+            ta_projet_total += ta_projet[destination].total_ta
+        demoli_reconstruit_total = 0
+        for destination in projet_destinations:
+            demoli_reconstruit_total += demolition.get(destination, 0)
+        summary = TaSummary(ta_existant_total, ta_projet_total, demoli_reconstruit_total)
+
+        logger.info(f"TA Existant total: {summary.existant}")
+        logger.info(f"TA Projet total: {summary.projet}")
+        logger.info(f"TA créé total: {summary.cree}")
+        logger.info(f"TA démoli/reconstruit total: {summary.demoli_reconstruit}")
+        logger.info(f"TA supprimé total: {summary.supprime}")
+
+        polyline_count, repaired_count = geometries.stats()
+        logger.info(f"Géométries calculées: {polyline_count} polylignes, {repaired_count} polygones réparés")
+
+        return FloorSurfaces(
+            self.floor_name,
+            existant,
+            projet,
+            demolition,
+            sdp,
+            {destination: ta_projet[destination] for destination in sorted(projet_destinations)},
+            {destination: ta_existant[destination] for destination in sorted(existant_destinations)},
+            summary,
+            self.overlay_mode
+        )
+
+    def _polylines(self, polylines: Union[Sequence[Dict[str, Any]], PolylineSet]) -> List[Dict[str, Any]]:
+        # Un PolylineSet est enregistré depuis ses tableaux, sans dictionnaires de sommets
+        if isinstance(polylines, PolylineSet):
+            return self.geometries.load_set(polylines)
+        return list(polylines)
+
+    # --- Floor sides ------------------------------------------------------------------------------
+
+    def _side(self, polylines: Sequence[Dict[str, Any]]) -> '_FloorSide':
+        """Classify the polylines of a drawing and link its special surfaces to its main polygons."""
+        mains = [p for p in polylines if MAIN_LAYER in p.get('layer', '')]
+        specials = [p for p in polylines if is_special_layer(p.get('layer', ''))]
+        destinations, groups = destination_catalog.group(mains)
+        grid_size = SNAP_GRID_SIZE if self.overlay_mode == OVERLAY_SNAPPED else None
+        graph = OverlapGraph(self.geometries, mains, specials, TA_SEARCH_MARGIN, grid_size)
+        return _FloorSide(polylines, destinations, groups, graph)
+
+    # --- SDP -----------------------------------------------------------------------------------
+
+    def _sdp_surfaces(self, side: '_FloorSide', label: str, with_demolition: bool = False):
+        """
+        Sum the SDP_1 surfaces of a drawing by destination and deduct the special surfaces they contain.
+
+        Returns:
+            tuple: (surface by destination, demolished surface by destination)
+        """
+        geometries = self.geometries
+        graph = side.graph
+        surfaces: Dict[str, float] = {}
+        demolition: Dict[str, float] = {}
+        demolition_zone = None
+        if with_demolition:
+            demolition_polylines = [p for p in side.polylines if DEMOLITION_LAYER in p.get('layer', '')]
+            # Zones de démolition fusionnées une seule fois : une seule intersection par pièce
+            demolition_zone = geometries.union(demolition_polylines)
+            logger.info(f"Nombre de polylignes de démolition trouvées: {len(demolition_polylines)} "
+                        f"({demolition_zone.count} valides fusionnées)")
+
+        for polyline, destination in zip(graph.mains, side.destinations):
+            if not destination:
+                continue
+            area = geometries.area(polyline)
+            if destination not in surfaces:
+                surfaces[destination] = 0
+                if with_demolition:
+                    demolition[destination] = 0.0
+            surfaces[destination] += area
+            logger.info(f"{label}: Destination {destination} - ajout surface {area}")
+
+            if demolition_zone is not None:
+                demolished_area = self._demolished_area(demolition_zone, polyline)
+                if demolished_area > 0:
+                    demolition[destination] += demolished_area
+                    logger.info(f"  - Intersection avec les zones de démolition: {demolished_area:.2f} m²")
+
+        # Chaque surface spéciale est déduite de la première polyligne principale qui la contient
+        destinations = side.destinations
+        for position, special_polyline in enumerate(graph.specials):
+            if MAIN_LAYER in special_polyline.get('layer', ''):
+                continue
+            area = geometries.area(special_polyline)
+            if area <= 0:
+                continue
+
+            parent = graph.parent(position, destinations.__getitem__)
+            if parent is not None:
+                destination = destinations[parent]
+                if destination in surfaces:
+                    surfaces[destination] -= area
+                    logger.info(f"{label}: Déduction de {area} pour {destination}")
+
+        return surfaces, demolition
+
+    @staticmethod
+    def _sdp_values(destination: str, existant: Dict[str, float], projet: Dict[str, float],
+                    demolition: Dict[str, float]) -> SdpValues:
+        surface_existante = existant.get(destination, 0)
+        surface_projet = projet.get(destination, 0)
+        surface_demolie_reconstruite = demolition.get(destination, 0)
+        surface_supprimee = max(0, surface_existante - surface_projet - surface_demolie_reconstruite)
+        if surface_supprimee < NEGLIGIBLE_SURFACE:
+            surface_supprimee = 0
+        return SdpValues(
+            existant=surface_existante,
+            creee=max(0, surface_projet - surface_existante),
+            demolie_reconstruite=surface_demolie_reconstruite,
+            supprimee=surface_supprimee,
+            supprimee_changement=0,
+            projet=surface_projet,
+            rdv=surface_projet * rdv_ratio(destination)
+        )
+
+    # --- TA ------------------------------------------------------------------------------------
+
+    def _ta_values(self, side: '_FloorSide', estimate_overlaps: bool = False):
+        """
+        TA breakdown of every destination of a drawing.
+
+        Args:
+            side: Classified polylines of the drawing
+            estimate_overlaps: Fall back to buffered estimates when a void or h < 1.80 m zone
+                only touches a main polyline (TA Projet rules)
+
+        Returns:
+            tuple: (TaValues by destination, set of destinations)
+        """
+        geometries = self.geometries
+        graph = side.graph
+        # Main polylines counted on the TA sheets: layer starting with SDP_1
+        counted = [is_main_sdp_layer(polyline.get('layer', '')) for polyline in graph.mains]
+        ta_destinations = [destination if keep else None for destination, keep in zip(side.destinations, counted)]
+        ta_groups = {destination: [position for position in positions if counted[position]]
+                     for destination, positions in side.groups.items()}
+
+        destinations: Set[str] = set()
+        for destination in ta_destinations:
+            if destination:
+                destinations.add(destination)
+
+        voids = [position for position, p in enumerate(graph.specials) if VOID_LAYER in p.get('layer', '')]
+        h180_zones = [position for position, p in enumerate(graph.specials) if H180_LAYER in p.get('layer', '')]
+
+        def deduct(total, specials, destination):
+            # Aires ajoutées une à une, dans l'ordre des surfaces spéciales puis des polylignes principales
+            for special in specials:
+                for link in graph.links[special]:
+                    if ta_destinations[link.main] != destination:
+                        continue
+                    area = link.estimated_area() if estimate_overlaps else link.area
+                    if area > 0:
+                        total += area
+            return total
+
+        results: Dict[str, TaValues] = {}
+        for destination in destinations:
+            planchers_avant_deductions = 0.0
+            for position in ta_groups[destination]:
+                planchers_avant_deductions += geometries.area(graph.mains[position])
+
+            vides = deduct(0.0, voids, destination)
+            surfaces_h_moins_180 = deduct(0.0, h180_zones, destination)
+
+            results[destination] = TaValues(planchers_avant_deductions, vides, surfaces_h_moins_180)
+            logger.info(f"DESTINATION {destination} - Planchers avant déductions: {planchers_avant_deductions}, "
+                        f"Vides: {vides}, Surfaces h<1.80m: {surfaces_h_moins_180}, "
+                        f"Total TA: {results[destination].total_ta}")
+
+        return results, destinations
+
+    # --- Planar partition ---------------------------------------------------------------------
+
+    def _partition_surfaces(self, polylines: Sequence[Dict[str, Any]], label: str, with_demolition: bool = False):
+        """
+        SDP and TA surfaces of a drawing from one planar partition of its polygons.
+
+        Each face belongs to the smallest SDP_1 polygon with a destination that covers it (the
+        first one drawn among equal areas), so overlapping rooms are counted once whatever their
+        drawing order. The SDP deductions keep the legacy containment rule: a face is deducted
+        when it is covered by a special surface lying entirely inside a room, and a special
+        surface straddling rooms or sticking out of them is not deducted. On the TA sheets,
+        overlaps count, as in the legacy TA overlays: a face covered by a void counts as void,
+        and a face covered by an h < 1.80 m zone but no void counts as h < 1.80 m.
+
+        Returns:
+            tuple: (SDP surface by destination, demolished surface by destination,
+                TaValues by destination, set of TA destinations)
+        """
+        mains = [p for p in polylines if MAIN_LAYER in p.get('layer', '')]
+        # Surfaces spéciales portant aussi le calque SDP_1 : jamais déduites, comme en mode legacy
+        specials = [p for p in polylines
+                    if is_special_layer(p.get('layer', '')) and MAIN_LAYER not in p.get('layer', '')]
+        # Zones de démolition invalides ignorées, comme dans la fusion du mode legacy
+        demolitions = ([p for p in polylines
+                        if DEMOLITION_LAYER in p.get('layer', '') and self.geometries.get(p).valid]
+                       if with_demolition else [])
+        destinations, _ = destination_catalog.group(mains)
+        ta_destinations = [destination if is_main_sdp_layer(polyline.get('layer', '')) else None
+                           for polyline, destination in zip(mains, destinations)]
+
+        # Rôle de chaque position de la partition : pièce, vide, h < 1.80 m, autre spéciale, démolition
+        first_special = len(mains)
+        first_demolition = first_special + len(specials)
+        voids = [VOID_LAYER in p.get('layer', '') for p in specials]
+        h180_zones = [H180_LAYER in p.get('layer', '') for p in specials]
+        # Déduction SDP : seules les surfaces spéciales contenues dans une pièce avec destination
+        graph = OverlapGraph(self.geometries, mains, specials)
+        deducted = [graph.parent(position, destinations.__getitem__) is not None
+                    for position in range(len(specials))]
+        # Ordre des pièces pour l'attribution des faces : la plus petite d'abord, puis l'ordre du dessin
+        room_order = {position: rank for rank, position in enumerate(
+            sorted(range(len(mains)), key=lambda position: (self._room_area(mains[position]), position)))}
+        partition = PlanarPartition(self.geometries, mains + specials + demolitions)
+
+        surfaces: Dict[str, float] = {}
+        demolition: Dict[str, float] = {}
+        for destination in destinations:
+            if destination and destination not in surfaces:
+                surfaces[destination] = 0.0
+                if with_demolition:
+                    demolition[destination] = 0.0
+        ta_sums: Dict[str, List[float]] = {destination: [0.0, 0.0, 0.0]
+                                           for destination in ta_destinations if destination}
+
+        for area, cover in partition.faces():
+            rooms = sorted((position for position in cover if position < first_special), key=room_order.__getitem__)
+            owner = next((destinations[p] for p in rooms if destinations[p] is not None), None)
+            ta_owner = next((ta_destinations[p] for p in rooms if ta_destinations[p] is not None), None)
+            special = void = h180 = demolished = False
+            for position in cover:
+                if position < first_special:
+                    continue
+                if position < first_demolition:
+                    special = special or deducted[position - first_special]
+                    void = void or voids[position - first_special]
+                    h180 = h180 or h180_zones[position - first_special]
+                else:
+                    demolished = True
+
+            if owner is not None:
+                if not special:
+                    surfaces[owner] += area
+                if demolished:
+                    demolition[owner] += area
+            if ta_owner is not None:
+                sums = ta_sums[ta_owner]
+                sums[0] += area
+                if void:
+                    sums[1] += area
+                elif h180:
+                    sums[2] += area
+
+        for destination, value in surfaces.items():
+            logger.info(f"{label}: Destination {destination} - surface après déductions {value}")
+
+        results = {destination: TaValues(*sums) for destination, sums in ta_sums.items()}
+        for destination, values in results.items():
+            logger.info(f"DESTINATION {destination} - Planchers avant déductions: {values.planchers_avant_deductions}, "
+                        f"Vides: {values.vides}, Surfaces h<1.80m: {values.surfaces_h_moins_180}, "
+                        f"Total TA: {values.total_ta}")
+        return surfaces, demolition, results, set(results)
+
+    # --- Geometry --------------------------------------------------------------------------------
+
+    def _room_area(self, polyline: Dict[str, Any]) -> float:
+        """Area of the polygon a room contributes to the partition (0 if it has none)."""
+        repaired = self.geometries.get(polyline).repaired
+        return repaired.area if repaired is not None else 0.0
+
+    def _demolished_area(self, zone: ZoneUnion, polyline: Dict[str, Any]) -> float:
+        """Area of a valid main polygon inside the demolition zones."""
+        try:
+            return zone.intersection_area(self.geometries.get(polyline))
+        except Exception as e:
+            logger.warning(f"Erreur lors du calcul d'intersection avec les zones de démolition: {str(e)}")
+            return 0.0
+
+
+class _FloorSide:
+    """Polylines of one drawing (existant or projet) with their overlap graph."""
+
+    __slots__ = ('polylines', 'destinations', 'groups', 'graph')
+
+    def __init__(self, polylines: Sequence[Dict[str, Any]], destinations: List[Optional[str]],
+                 groups: Dict[str, List[int]], graph: OverlapGraph):
+        """
+        Args:
+            polylines: Every polyline of the drawing
+            destinations: Destination of each of graph.mains (None if the layer has none)
+            groups: Positions in graph.mains of each destination's polylines
+            graph: Links between the special surfaces and the SDP_1 polylines
+        """
+        self.polylines = polylines
+        self.destinations = destinations
+        self.groups = groups
+        self.graph = graph
+
+
+def compute_floor_surfaces(surfaces: Dict[str, Any], floor_name: str = '',
+                           overlay_mode: Optional[str] = None) -> FloorSurfaces:
+    """
+    Compute the SDP and TA surfaces of one floor.
+
+    Args:
+        surfaces: Client payload with 'existant' and 'projet' sections holding polyline dicts
+        floor_name: Floor name
+        overlay_mode: 'legacy', 'snapped' or 'partition', SURFACE_OVERLAY_MODE by default
+
+    Returns:
+        FloorSurfaces: Results consumed by the Excel, visa and JSON writers
+    """
+    return SurfaceEngine.from_surfaces(surfaces, floor_name, overlay_mode).compute()
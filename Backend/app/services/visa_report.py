@@ -0,0 +1,179 @@
+"""
+Renderer of the visa text report.
+
+The report layout is a Jinja2 template (templates/visa_report.txt.j2),
+compiled once per process and rendered from a flat context: every value
+the template prints or tests is computed once by visa_context instead of
+being looked up in the nested surfaces payload line after line. Reports
+are produced as a stream of text chunks, written straight to a file or an
+HTTP response; a multi-floor report renders one floor after the other
+without holding the whole text in memory.
+"""
+
+import datetime
+import logging
+import os
+import threading
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+
+from app.services.destination_catalog import destination_catalog
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+TEMPLATE_NAME = 'visa_report.txt.j2'
+
+# Text between the reports of two floors
+FLOOR_SEPARATOR = "\n\n"
+
+
+def _details(surfaces: Dict[str, Any], side: str) -> Dict[str, Any]:
+    """Element counts sent by the client for one side ({} when the side or its details are missing)."""
+    return (surfaces.get(side) or {}).get('details') or {}
+
+
+def _inventory(title: str, details: Dict[str, Any], surface: float, separated: bool) -> Dict[str, Any]:
+    polylines = details.get('polylines', 0)
+    circles = details.get('circles', 0)
+    return {
+        'title': title,
+        'separated': separated,
+        'polylines': polylines,
+        'circles': circles,
+        'elements': polylines + circles,
+        'average': surface / details['polylines'] if 'polylines' in details and details['polylines'] > 0 else None,
+        'ratio': polylines / details.get('circles', 1) if polylines > 0 and circles > 0 else None
+    }
+
+
+def visa_context(surfaces: Dict[str, Any], floor_name: str, results: Any = None,
+                 now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+    """
+    Flat rendering context of the visa report of one floor.
+
+    Args:
+        surfaces: Client payload (surface, details and polylines of 'projet' and 'existant', 'difference')
+        floor_name: Floor name
+        results: FloorSurfaces of the same floor, adds the SDP and TA section when given
+        now: Generation time, the current time by default
+
+    Returns:
+        dict: Template variables
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    projet_surface = (surfaces.get('projet') or {}).get('surface', 0)
+    existant_surface = (surfaces.get('existant') or {}).get('surface', 0)
+    difference = surfaces.get('difference', 0)
+    projet_details = _details(surfaces, 'projet')
+    existant_details = _details(surfaces, 'existant')
+
+    context = {
+        'floor_name': floor_name,
+        'generated_at': now.strftime('%d/%m/%Y %H:%M:%S'),
+        'generated_on': now.strftime('%d/%m/%Y'),
+        'generated_time': now.strftime('%H:%M:%S'),
+        'projet_surface': projet_surface,
+        'existant_surface': existant_surface,
+        'difference': difference,
+        'perc_diff': difference / existant_surface * 100 if existant_surface > 0 else None,
+        'surface_ratio': projet_surface / existant_surface if existant_surface > 0 else None,
+        'densite_projet': (projet_surface / projet_details['polylines']
+                           if projet_surface > 0 and projet_details.get('polylines', 0) > 0 else None),
+        'densite_existant': (existant_surface / existant_details['polylines']
+                             if existant_surface > 0 and existant_details.get('polylines', 0) > 0 else None),
+        'projet_elements': projet_details.get('polylines', 0) + projet_details.get('circles', 0),
+        'existant_elements': existant_details.get('polylines', 0) + existant_details.get('circles', 0),
+        'inventory': [],
+        'element_diff': None,
+        'sdp_rows': None
+    }
+
+    inventory: List[Dict[str, Any]] = context['inventory']
+    if projet_details:
+        inventory.append(_inventory('PROJET', projet_details, projet_surface, separated=False))
+    if existant_details:
+        inventory.append(_inventory('EXISTANT', existant_details, existant_surface, separated=True))
+    if projet_details and existant_details:
+        polylines = projet_details.get('polylines', 0) - existant_details.get('polylines', 0)
+        circles = projet_details.get('circles', 0) - existant_details.get('circles', 0)
+        context['element_diff'] = {'polylines': polylines, 'circles': circles, 'total': polylines + circles}
+
+    if results is not None:
+        context['sdp_rows'] = [
+            {'label': destination_catalog.label(destination), 'existant': values.existant,
+             'projet': values.projet, 'creee': values.creee, 'supprimee': values.supprimee, 'rdv': values.rdv}
+            for destination, values in results.sdp.items()
+        ]
+        summary = results.summary
+        context.update(ta_existant=summary.existant, ta_projet=summary.projet, ta_cree=summary.cree,
+                       ta_demoli_reconstruit=summary.demoli_reconstruit, ta_supprime=summary.supprime)
+    return context
+
+
+class VisaRenderer:
+    """Visa report template, compiled on first use and shared by the threads of the process."""
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR, template_name: str = TEMPLATE_NAME):
+        """
+        Args:
+            template_dir: Directory of the template
+            template_name: Template file name
+        """
+        self.template_dir = template_dir
+        self.template_name = template_name
+        self._template: Optional[Template] = None
+        self._lock = threading.Lock()
+
+    @property
+    def template(self) -> Template:
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    environment = Environment(loader=FileSystemLoader(self.template_dir), autoescape=False,
+                                              trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True,
+                                              undefined=StrictUndefined)
+                    self._template = environment.get_template(self.template_name)
+                    logger.info(f"Modèle du rapport visa compilé: {self.template_name}")
+        return self._template
+
+    def stream(self, contexts: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Yield the text of a report, floor by floor.
+
+        Args:
+            contexts: visa_context of each floor; a generator is consumed lazily
+        """
+        template = self.template
+        for position, context in enumerate(contexts):
+            if position:
+                yield FLOOR_SEPARATOR
+            yield from template.generate(**context)
+
+    def render(self, contexts: Iterable[Dict[str, Any]]) -> str:
+        """Text of a report, as one string."""
+        return ''.join(self.stream(contexts))
+
+    def write(self, contexts: Iterable[Dict[str, Any]], target: Any) -> None:
+        """
+        Stream a report to a file.
+
+        Args:
+            contexts: visa_context of each floor
+            target: Path of the text file (UTF-8) or text file object
+        """
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, 'w', encoding='utf-8') as f:
+                self._write_chunks(contexts, f)
+        else:
+            self._write_chunks(contexts, target)
+
+    def _write_chunks(self, contexts: Iterable[Dict[str, Any]], f: IO[str]) -> None:
+        for chunk in self.stream(contexts):
+            f.write(chunk)
+
+
+# Global visa renderer instance
+visa_renderer = VisaRenderer()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the DXF entity extraction engine
+Built for corporate Gexpertise - GexFME project
+
+Builds a synthetic drawing in memory and measures entities/second for the
+dispatch-table extractor (app.services.dxf_extractor) against the former
+if/elif chain, with every type requested and with the 'surfaces' profile.
+
+Usage: python benchmark_extraction.py [number of rooms] [repetitions]
+"""
+
+import sys
+import time
+
+import ezdxf
+
+from app.services.dxf_extractor import EntityExtractor
+from app.services.extraction_profiles import resolve_extraction_profile
+from app.services.polyline_set import PolylineSetBuilder
+
+
+def build_drawing(rooms):
+    """Drawing with the entity mix of a typical floor plan"""
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    for i in range(rooms):
+        x, y = (i % 50) * 12.0, (i // 50) * 10.0
+        msp.add_lwpolyline([(x, y), (x + 10, y), (x + 10, y + 8), (x, y + 8)], close=True,
+                           dxfattribs={'layer': 'GEX_EDS_SDP_1-HABITATION_L'})
+        msp.add_polyline2d([(x + 1, y + 1), (x + 3, y + 1), (x + 3, y + 3)], close=True,
+                           dxfattribs={'layer': 'GEX_EDS_SDP_2-TREMIE'})
+        for k in range(4):
+            msp.add_line((x, y + k), (x + 2, y + k + 1), dxfattribs={'layer': 'MOBILIER', 'color': k})
+            msp.add_circle((x + k, y + 2), 0.3, dxfattribs={'layer': 'MOBILIER'})
+            msp.add_arc((x + k, y + 3), 0.5, 0, 90, dxfattribs={'layer': 'HACHURES'})
+        msp.add_text(f'Piece {i}', dxfattribs={'layer': 'MOBILIER', 'height': 0.2, 'insert': (x + 1, y + 1)})
+    return doc
+
+
+def legacy_extract(modelspace, profile=None):
+    """Former per-entity if/elif chain, kept here as the reference"""
+    polylines = PolylineSetBuilder()
+    lines, circles, arcs, texts = [], [], [], []
+    for entity in modelspace.query('*'):
+        dxftype = entity.dxftype()
+        if profile is not None and not profile.accepts(dxftype, entity.dxf.layer):
+            continue
+        lineweight = entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
+        if dxftype == 'POLYLINE':
+            polylines.add(dxftype, entity.dxf.layer, entity.points(), entity.is_closed, entity.dxf.color, lineweight)
+        elif dxftype == 'LWPOLYLINE':
+            polylines.add(dxftype, entity.dxf.layer, entity.get_points(), entity.closed, entity.dxf.color, lineweight)
+        elif dxftype == 'LINE':
+            lines.append({'type': dxftype, 'layer': entity.dxf.layer,
+                          'start': {'x': entity.dxf.start[0], 'y': entity.dxf.start[1]},
+                          'end': {'x': entity.dxf.end[0], 'y': entity.dxf.end[1]},
+                          'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A', 'lineweight': lineweight})
+        elif dxftype == 'CIRCLE':
+            circles.append({'type': dxftype, 'layer': entity.dxf.layer,
+                            'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},
+                            'radius': entity.dxf.radius,
+                            'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A', 'lineweight': lineweight})
+        elif dxftype == 'ARC':
+            arcs.append({'type': dxftype, 'layer': entity.dxf.layer,
+                         'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},
+                         'radius': entity.dxf.radius, 'start_angle': entity.dxf.start_angle,
+                         'end_angle': entity.dxf.end_angle,
+                         'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A', 'lineweight': lineweight})
+        elif dxftype == 'TEXT':
+            texts.append({'type': dxftype, 'layer': entity.dxf.layer, 'text': entity.dxf.text,
+                          'position': {'x': entity.dxf.insert[0], 'y': entity.dxf.insert[1]},
+                          'height': entity.dxf.height,
+                          'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A', 'lineweight': lineweight})
+    return polylines.build(), lines, circles, arcs, texts
+
+
+def dispatch_extract(modelspace, profile=None):
+    extractor = EntityExtractor(profile).extract(modelspace)
+    return extractor.polylines.build(), extractor.lines, extractor.circles, extractor.arcs, extractor.texts
+
+
+def measure(function, modelspace, profile, repetitions):
+    """Best time over the repetitions, in seconds"""
+    best = float('inf')
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function(modelspace, profile)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print("⏱️  DXF extraction micro-benchmark")
+    print("=" * 50)
+    doc = build_drawing(rooms)
+    modelspace = doc.modelspace()
+    count = len(modelspace)
+    print(f"   {count} entities in modelspace, best of {repetitions} runs")
+
+    for profile_name in ('full', 'surfaces'):
+        profile = resolve_extraction_profile(profile_name, None)
+        legacy = legacy_extract(modelspace, profile)
+        dispatch = dispatch_extract(modelspace, profile)
+        same = (legacy[0].to_dicts() == dispatch[0].to_dicts() and legacy[1:] == dispatch[1:])
+
+        legacy_time = measure(legacy_extract, modelspace, profile, repetitions)
+        dispatch_time = measure(dispatch_extract, modelspace, profile, repetitions)
+        print()
+        print(f"📐 Profile '{profile_name}' ({'identical' if same else 'DIFFERENT'} results)")
+        print(f"   if/elif chain : {count / legacy_time:12,.0f} entities/s")
+        print(f"   dispatch table: {count / dispatch_time:12,.0f} entities/s  (x{legacy_time / dispatch_time:.2f})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
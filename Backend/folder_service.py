@@ -5,24 +5,72 @@ import json
 import datetime
 import shutil
 import tempfile
-import ezdxf
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 import requests
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.comments import Comment
 from werkzeug.utils import secure_filename
-from werkzeug.datastructures import FileStorage
-from flask import request, jsonify, send_file
+from flask import request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import get_jwt_identity, get_jwt
 from app.storage import storage_service
 from app.models.user import User
+from app.services.extraction_cache import extraction_cache
+from app.services.dxf_source import DxfSource
+from app.services.dxf_streaming import (
+    EXTRACTION_MODE_STREAMING,
+    EXTRACTION_MODES,
+    resolve_extraction_mode,
+    stream_extract_dxf
+)
+from app.services.process_pool import process_pool, as_completed, PoolTaskError, TaskTimeoutError
+from app.services.extraction_index import extraction_indexes, DEFAULT_PAGE_SIZE
+from app.services.extraction_profiles import resolve_extraction_profile
+from app.services.dxf_probe import dxf_probes
+from app.services.dxf_extractor import extract_document
+from app.services.surface_engine import compute_floor_surfaces, resolve_overlay_mode
+from app.services.report_writer import write_surface_workbook
+from app.services.visa_report import visa_renderer, visa_context
+from app.services.report_jobs import report_jobs, JobError, JOB_DONE, TERMINAL_STATES
+from app.services.polyline_set import (
+    PolylineSet,
+    GEOMETRY_FORMAT_LEGACY,
+    serialize_extraction_result
+)
 import io
 import math
+import unicodedata
+from urllib.parse import quote
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Nombre maximal de fichiers par requête d'extraction groupée
+MAX_BATCH_FILES = int(os.getenv('EXTRACTION_BATCH_MAX_FILES', '50'))
+
+# Durée maximale des analyses d'une extraction groupée, sous le délai de 120 s des workers gunicorn
+BATCH_TIMEOUT = float(os.getenv('EXTRACTION_BATCH_TIMEOUT', '100'))
+
+# Durée maximale du calcul d'une tâche de rapport asynchrone (hors délai de la requête HTTP)
+REPORT_JOB_TIMEOUT = float(os.getenv('REPORT_JOBS_TASK_TIMEOUT', '600'))
+
+# Durée maximale d'un suivi de tâche (/events), bien sous le délai de 120 s des workers gunicorn :
+# le client se reconnecte pour continuer à suivre une tâche plus longue
+REPORT_JOB_FOLLOW_TIMEOUT = float(os.getenv('REPORT_JOBS_FOLLOW_TIMEOUT', '25'))
+
+# Type MIME des classeurs Excel renvoyés dans les réponses
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Nombre maximal d'étages par requête de calcul de projet
+MAX_PROJECT_FLOORS = int(os.getenv('PROJECT_MAX_FLOORS', '60'))
+
+# Durée maximale du calcul de tous les étages d'un projet, sous le délai de 120 s des workers gunicorn
+# (il reste le temps d'écrire le classeur et le rapport visa)
+PROJECT_TIMEOUT = float(os.getenv('PROJECT_TIMEOUT', '100'))
+
 # S3 Storage Helper Functions
 def get_user_email_from_request():
     """Get user email from JWT token or request data."""
@@ -215,8 +263,12 @@ def check_folder():
         logger.error(f"Erreur lors de la vérification du dossier: {str(e)}")
         return jsonify({'error': f'Erreur lors de la vérification du dossier: {str(e)}'}), 500
 
-def get_folder_structure(folder_path):
-    """Récupère la structure des fichiers et dossiers à partir d'un chemin donné"""
+def get_folder_structure(folder_path, include_probe=False):
+    """Récupère la structure des fichiers et dossiers à partir d'un chemin donné
+
+    Avec include_probe, chaque fichier DXF reçoit un aperçu 'probe' (version, unités, emprise,
+    calques, nombre approximatif d'entités), mis en cache tant que le fichier ne change pas.
+    """
     structure = {
         'folders': [],
         'files': []
@@ -232,7 +284,7 @@ def get_folder_structure(folder_path):
             
             if os.path.isdir(item_path):
                 # C'est un dossier
-                sub_structure = get_folder_structure(item_path)  # Récupérer récursivement la structure du sous-dossier
+                sub_structure = get_folder_structure(item_path, include_probe)  # Récupérer récursivement la structure du sous-dossier
                 folder_info = {
                     'name': item,
                     'path': os.path.relpath(item_path, folder_path),
@@ -243,13 +295,20 @@ def get_folder_structure(folder_path):
             else:
                 # C'est un fichier
                 file_size = os.path.getsize(item_path)
-                structure['files'].append({
+                file_info = {
                     'name': item,
                     'path': os.path.relpath(item_path, folder_path),
                     'size': file_size,
                     'size_formatted': format_file_size(file_size),
                     'last_modified': datetime.datetime.fromtimestamp(os.path.getmtime(item_path)).strftime('%Y-%m-%d %H:%M:%S')
-                })
+                }
+                if include_probe and item.lower().endswith('.dxf'):
+                    try:
+                        file_info['probe'] = dxf_probes.get(item_path)
+                    except Exception as e:
+                        logger.warning(f"Aperçu DXF impossible pour {item_path}: {str(e)}")
+                        file_info['probe'] = None
+                structure['files'].append(file_info)
         
         # Trier les dossiers et fichiers par nom
         structure['folders'].sort(key=lambda x: x['name'].lower())
@@ -313,8 +372,8 @@ def get_folder_files():
                 'message': 'Le dossier utilisateur n\'existe pas'
             }), 200
         
-        # Récupérer la structure du dossier
-        folder_structure = get_folder_structure(user_folder_path)
+        # Récupérer la structure du dossier (avec l'aperçu des fichiers DXF si demandé)
+        folder_structure = get_folder_structure(user_folder_path, bool(data.get('includeProbe', False)))
         logger.info(f"Structure du dossier récupérée: {json.dumps(folder_structure, indent=2)}")
         
         return jsonify(folder_structure), 200
@@ -404,136 +463,121 @@ def transfer_files():
         logger.error(f"Erreur lors du transfert des fichiers: {str(e)}")
         return jsonify({"error": f"Erreur lors du transfert des fichiers: {str(e)}"}), 500
 
-def extract_file_data(file):
-    """Extrait les données d'un fichier DXF"""
-    temp_file_path = None
+def extract_file_data(file, mode=None, profile=None):
+    """Extrait les données d'un fichier DXF téléversé (FileStorage)"""
+    with DxfSource.from_upload(file) as source:
+        return extract_source_data(source, mode, profile)
+
+def extract_source_data(source, mode=None, profile=None):
+    """Extrait les données d'une source DXF (chemin ou mémoire), en réutilisant le cache d'extraction si le contenu est connu"""
+    return extraction_cache.get_or_extract(
+        source.digest(),
+        lambda: _run_extraction(source, mode, profile),
+        profile.cache_tag if profile is not None else None
+    )
+
+def _run_extraction(source, mode=None, profile=None):
+    """Exécute l'analyse dans le pool de processus pour ne pas bloquer le worker web"""
+    try:
+        return process_pool.run(_extract_dxf_content, source, mode, profile)
+    except PoolTaskError as e:
+        logger.error(f"Erreur lors de l'extraction des données : {str(e)}")
+        return {"error": f"Erreur lors de l'extraction des données : {str(e)}"}
+
+def _extract_dxf_content(source, mode=None, profile=None):
+    """Analyse une source DXF avec ezdxf, sans passer par un fichier temporaire"""
     try:
-        logger.info(f"Début de l'extraction pour le fichier : {file.filename}")
+        logger.info(f"Début de l'extraction pour le fichier : {source.filename}")
         
-        # Créer un fichier temporaire avec un chemin explicite et mode binaire
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.dxf', mode='wb') as temp_file:
-            file.save(temp_file)
-            temp_file_path = temp_file.name
-            logger.info(f"Fichier temporaire sauvegardé : {temp_file_path}")
-            
-        # Charger le fichier DXF à partir du chemin temporaire
-        logger.info(f"Lecture du fichier DXF : {temp_file_path}")
-        doc = ezdxf.readfile(temp_file_path)
-        
-        # Extraire les calques (layers)
-        layers = [
-            {
-                "name": layer.dxf.name,
-                "color": layer.dxf.color if layer.dxf.color != 0 else 'N/A',
-                "lineweight": layer.dxf.lineweight if hasattr(layer.dxf, 'lineweight') else None
-            }
-            for layer in doc.layers 
-            if not layer.dxf.name.startswith('*')  # Exclure les calques système
-        ]
+        # Les très gros fichiers sont lus en flux pour ne pas charger tout le document en mémoire
+        if not source.is_binary_dxf and resolve_extraction_mode(mode, source.size, profile) == EXTRACTION_MODE_STREAMING:
+            logger.info(f"Extraction en flux pour {source.filename} ({source.size} octets)")
+            with source.open_stream() as stream:
+                return stream_extract_dxf(stream, profile)
         
-        # Extraire les entités (polylignes, lignes, cercles, arcs, texte, etc.)
-        modelspace = doc.modelspace()
-        
-        polylines = []
-        lines = []
-        circles = []
-        arcs = []
-        texts = []
-        
-        for entity in modelspace.query('*'):
-            dxftype = entity.dxftype()
-            if dxftype == 'POLYLINE':
-                polylines.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'vertices': [{'x': v[0], 'y': v[1]} for v in entity.points()],
-                    'closed': entity.closed,
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-            elif dxftype == 'LWPOLYLINE':
-                polylines.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'vertices': [{'x': v[0], 'y': v[1]} for v in entity.get_points()],
-                    'closed': entity.closed,
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-            elif dxftype == 'LINE':
-                lines.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'start': {'x': entity.dxf.start[0], 'y': entity.dxf.start[1]},
-                    'end': {'x': entity.dxf.end[0], 'y': entity.dxf.end[1]},
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-            elif dxftype == 'CIRCLE':
-                circles.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},
-                    'radius': entity.dxf.radius,
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-            elif dxftype == 'ARC':
-                arcs.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'center': {'x': entity.dxf.center[0], 'y': entity.dxf.center[1]},
-                    'radius': entity.dxf.radius,
-                    'start_angle': entity.dxf.start_angle,
-                    'end_angle': entity.dxf.end_angle,
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-            elif dxftype == 'TEXT':
-                texts.append({
-                    'type': dxftype,
-                    'layer': entity.dxf.layer,
-                    'text': entity.dxf.text,
-                    'position': {'x': entity.dxf.insert[0], 'y': entity.dxf.insert[1]},
-                    'height': entity.dxf.height,
-                    'color': entity.dxf.color if entity.dxf.color != 0 else 'N/A',
-                    'lineweight': entity.dxf.lineweight if hasattr(entity.dxf, 'lineweight') else None
-                })
-        
-        # Statistiques globales
-        total_entities = len(modelspace)
-        statistics = {
-            "layer_count": len(layers),
-            "polyline_count": len(polylines),
-            "line_count": len(lines),
-            "circle_count": len(circles),
-            "arc_count": len(arcs),
-            "text_count": len(texts),
-            "total_entities": total_entities
-        }
+        # Charger le document directement depuis le chemin ou la mémoire
+        doc = source.read_document()
+        
+        # Extraction en une passe, par table de dispatch sur le type d'entité
+        result = extract_document(doc, profile)
         
         logger.info("Données extraites avec succès")
-        return {
-            "layers": layers,
-            "polylines": polylines,
-            "lines": lines,
-            "circles": circles,
-            "arcs": arcs,
-            "texts": texts,
-            "statistics": statistics
-        }
+        return result
     
     except Exception as e:
         logger.error(f"Erreur lors de l'extraction des données : {str(e)}")
         return {"error": f"Erreur lors de l'extraction des données : {str(e)}"}
+
+def resolve_user_file_path(email, filename, folder=""):
+    """Retrouve un fichier dans le dossier Ressources de l'utilisateur, avec recherche dans les sous-dossiers.
+
+    Retourne (chemin du fichier, dossier de l'utilisateur) ; lève FileNotFoundError avec le message à renvoyer au client.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    resource_dir = os.path.join(current_dir, 'app', 'Ressources')
+
+    if not os.path.exists(resource_dir):
+        logger.error(f"Le dossier Ressources n'existe pas: {resource_dir}")
+        raise FileNotFoundError("Dossier Ressources non trouvé")
+
+    folder_name = email.split('@')[0]
+    user_folder_path = os.path.join(resource_dir, folder_name)
+
+    if not os.path.exists(user_folder_path):
+        logger.error(f"Le dossier utilisateur n'existe pas: {user_folder_path}")
+        raise FileNotFoundError("Dossier utilisateur non trouvé")
+
+    logger.info(f"Construction du chemin pour le fichier: {filename}, dossier: {folder}")
+
+    if folder:
+        file_path = os.path.join(user_folder_path, folder, filename)
+    else:
+        file_path = os.path.join(user_folder_path, filename)
+
+    logger.info(f"Tentative d'accès au fichier: {file_path}")
+
+    if os.path.exists(file_path):
+        logger.info(f"Fichier trouvé: {file_path}")
+    else:
+        logger.warning(f"Fichier non trouvé au chemin exact: {file_path}, recherche alternative...")
+
+        for root, dirs, files in os.walk(user_folder_path):
+            if filename in files:
+                alt_file_path = os.path.join(root, filename)
+                logger.info(f"Fichier trouvé à un emplacement alternatif: {alt_file_path}")
+                file_path = alt_file_path
+                break
+
+        if not os.path.exists(file_path):
+            logger.error(f"Le fichier n'existe pas après recherche approfondie: {file_path}")
+            found_files = []
+            for root, dirs, files in os.walk(user_folder_path):
+                for file in files:
+                    found_files.append(os.path.join(root, file))
+            logger.info(f"Fichiers trouvés dans le dossier utilisateur: {found_files}")
+            raise FileNotFoundError("Fichier non trouvé")
     
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Fichier temporaire supprimé : {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Erreur lors de la suppression du fichier temporaire : {str(e)}")
+    return file_path, user_folder_path
+
+def parse_extraction_options(data):
+    """Lit le mode et le profil d'extraction d'une requête ; lève ValueError s'ils sont invalides"""
+    # 'auto' (selon la taille), 'full' (document complet) ou 'streaming' (lecture en flux)
+    extraction_mode = data.get('mode', 'auto')
+    if extraction_mode not in EXTRACTION_MODES:
+        raise ValueError(f"Mode d'extraction inconnu : {extraction_mode}")
+    # Profil nommé ('surfaces') et/ou liste de motifs de calques ('GEX_EDS_SDP_*', ...)
+    return extraction_mode, resolve_extraction_profile(data.get('profile'), data.get('layers'))
+
+def describe_source_path(file_path, user_folder_path):
+    """Chemin relatif du fichier et dossier parent, tels que renvoyés avec les données extraites"""
+    rel_path = os.path.relpath(file_path, user_folder_path)
+    logger.info(f"Chemin relatif du fichier: {rel_path}")
+    
+    path_components = rel_path.split(os.sep)
+    parent_folder = path_components[0] if len(path_components) > 1 else ''
+    if parent_folder:
+        logger.info(f"Dossier parent détecté: {parent_folder}")
+    return {'sourcePath': rel_path, 'parentFolder': parent_folder}
 
 def extract_data_from_file():
     """Extrait les données d'un fichier DXF dans le dossier de l'utilisateur"""
@@ -547,6 +591,12 @@ def extract_data_from_file():
         folder = data.get('folder', "")
         email = data.get('email')
         file_type = data.get('fileType', 'projet')
+        # 'legacy' (sommets en dictionnaires) ou 'columnar' (tableaux plats)
+        geometry_format = data.get('geometry', GEOMETRY_FORMAT_LEGACY)
+        try:
+            extraction_mode, extraction_profile = parse_extraction_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         logger.info(f"Type de fichier: {file_type}")
         
@@ -562,89 +612,328 @@ def extract_data_from_file():
         logger.info(f"Nom du fichier: {filename}")
         logger.info(f"Dossier: {folder}")
         
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        resource_dir = os.path.join(current_dir, 'app', 'Ressources')
+        try:
+            file_path, user_folder_path = resolve_user_file_path(email, filename, folder)
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 400
         
-        if not os.path.exists(resource_dir):
-            logger.error(f"Le dossier Ressources n'existe pas: {resource_dir}")
-            return jsonify({"error": "Dossier Ressources non trouvé"}), 400
+        logger.info(f"Vérification du fichier: {file_path}")
+        logger.info(f"Extension du fichier: {os.path.splitext(file_path)[1]}")
         
-        folder_name = email.split('@')[0]
-        user_folder_path = os.path.join(resource_dir, folder_name)
+        if not file_path.lower().endswith('.dxf'):
+            logger.warning(f"Format non standard détecté: {file_path} - tentative d'extraction quand même")
         
-        if not os.path.exists(user_folder_path):
-            logger.error(f"Le dossier utilisateur n'existe pas: {user_folder_path}")
-            return jsonify({"error": "Dossier utilisateur non trouvé"}), 400
+        # Le fichier est analysé sur place, sans copie en mémoire ni fichier temporaire
+        source = DxfSource.from_path(file_path)
+        extracted_data = serialize_extraction_result(
+            extract_source_data(source, extraction_mode, extraction_profile),
+            geometry_format
+        )
+        logger.info(f"Données extraites avec succès pour {file_path} (Type: {file_type})")
         
-        logger.info(f"Construction du chemin pour le fichier: {filename}, dossier: {folder}")
+        extracted_data['fileType'] = file_type
+        extracted_data.update(describe_source_path(file_path, user_folder_path))
         
-        if folder:
-            file_path = os.path.join(user_folder_path, folder, filename)
-        else:
-            file_path = os.path.join(user_folder_path, filename)
-            
-        logger.info(f"Tentative d'accès au fichier: {file_path}")
+        return jsonify(extracted_data), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'extraction: {str(e)}")
+        return jsonify({"error": f"Erreur lors de l'extraction: {str(e)}"}), 500
+
+def probe_dxf_file():
+    """Aperçu rapide d'un fichier DXF (version, unités, emprise, calques, nombre approximatif d'entités) sans l'extraire"""
+    logger.info("Requête POST reçue pour l'aperçu d'un fichier DXF")
+    
+    try:
+        data = request.get_json() or {}
+        filename = data.get('filename')
+        folder = data.get('folder', "")
+        email = data.get('email')
         
-        if os.path.exists(file_path):
-            logger.info(f"Fichier trouvé: {file_path}")
-        else:
-            logger.warning(f"Fichier non trouvé au chemin exact: {file_path}, recherche alternative...")
-            
-            for root, dirs, files in os.walk(user_folder_path):
-                if filename in files:
-                    alt_file_path = os.path.join(root, filename)
-                    logger.info(f"Fichier trouvé à un emplacement alternatif: {alt_file_path}")
-                    file_path = alt_file_path
-                    break
-            
-            if not os.path.exists(file_path):
-                logger.error(f"Le fichier n'existe pas après recherche approfondie: {file_path}")
-                found_files = []
-                for root, dirs, files in os.walk(user_folder_path):
-                    for file in files:
-                        found_files.append(os.path.join(root, file))
-                logger.info(f"Fichiers trouvés dans le dossier utilisateur: {found_files}")
-                return jsonify({"error": "Fichier non trouvé"}), 400
+        if not filename:
+            logger.error("Nom de fichier manquant")
+            return jsonify({"error": "Nom de fichier requis"}), 400
         
-        logger.info(f"Vérification du fichier: {file_path}")
-        logger.info(f"Extension du fichier: {os.path.splitext(file_path)[1]}")
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({"error": "Email non fourni"}), 400
         
-        if not file_path.lower().endswith('.dxf'):
-            logger.warning(f"Format non standard détecté: {file_path} - tentative d'extraction quand même")
+        try:
+            file_path, user_folder_path = resolve_user_file_path(email, filename, folder)
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 400
         
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
+        try:
+            probe = dict(dxf_probes.get(file_path))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        file_obj = FileStorage(
-            stream=io.BytesIO(file_content),
-            filename=os.path.basename(file_path),
-            content_type='application/octet-stream'
-        )
+        probe['sourcePath'] = os.path.relpath(file_path, user_folder_path)
+        logger.info(f"Aperçu généré pour {file_path}: {probe['layer_count']} calques, ~{probe['entity_count']} entités")
+        return jsonify(probe), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'aperçu: {str(e)}")
+        return jsonify({"error": f"Erreur lors de l'aperçu: {str(e)}"}), 500
+
+def extraction_document_id(source, profile=None):
+    """Identifiant d'un document extrait : clé du cache d'extraction (empreinte du contenu + profil)"""
+    return extraction_cache.make_key(source.digest(), profile.cache_tag if profile is not None else None)
+
+def extract_data_batch():
+    """Extrait plusieurs fichiers DXF en parallèle dans le pool de processus.
+
+    Les fichiers identiques (même contenu) ne sont analysés qu'une fois. La réponse est
+    un flux NDJSON : une ligne par fichier, dans l'ordre où les extractions se terminent,
+    puis une ligne finale de bilan. L'échec d'un fichier n'interrompt pas les autres.
+    """
+    logger.info("Requête POST reçue pour l'extraction groupée de fichiers DXF")
+    
+    try:
+        data = request.get_json() or {}
+        email = data.get('email')
+        files = data.get('files')
+        geometry_format = data.get('geometry', GEOMETRY_FORMAT_LEGACY)
         
-        extracted_data = extract_file_data(file_obj)
-        logger.info(f"Données extraites avec succès pour {file_path} (Type: {file_type})")
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({"error": "Email non fourni"}), 400
         
-        extracted_data['fileType'] = file_type
+        if not isinstance(files, list) or not files:
+            return jsonify({"error": "Liste de fichiers requise"}), 400
         
-        rel_path = os.path.relpath(file_path, user_folder_path)
-        logger.info(f"Chemin relatif du fichier: {rel_path}")
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({"error": f"Trop de fichiers : {len(files)} (maximum {MAX_BATCH_FILES})"}), 400
         
-        path_components = rel_path.split(os.sep)
+        try:
+            extraction_mode, extraction_profile = parse_extraction_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'extraction groupée: {str(e)}")
+        return jsonify({"error": f"Erreur lors de l'extraction groupée: {str(e)}"}), 500
+    
+    def file_line(position, reference, **fields):
+        line = {
+            'index': position,
+            'filename': reference.get('filename') if isinstance(reference, dict) else None,
+            'folder': reference.get('folder', "") if isinstance(reference, dict) else None,
+            'fileType': reference.get('fileType', 'projet') if isinstance(reference, dict) else None
+        }
+        line.update(fields)
+        return json.dumps(line) + "\n"
+    
+    def result_lines(entries, result, document_id):
+        if "error" in result:
+            for position, reference, _ in entries:
+                yield file_line(position, reference, status='error', error=result["error"])
+            return
+        serialized = serialize_extraction_result(result, geometry_format)
+        for position, reference, paths in entries:
+            extracted_data = dict(serialized, fileType=reference.get('fileType', 'projet'))
+            extracted_data.update(describe_source_path(*paths))
+            yield file_line(position, reference, status='ok', documentId=document_id, data=extracted_data)
+    
+    def generate():
+        succeeded = failed = 0
+        # Clé du cache d'extraction -> fichiers de la requête ayant ce contenu
+        documents = {}
+        
+        for position, reference in enumerate(files):
+            try:
+                if not isinstance(reference, dict) or not reference.get('filename'):
+                    raise ValueError("Nom de fichier requis")
+                file_path, user_folder_path = resolve_user_file_path(email, reference['filename'], reference.get('folder', ""))
+                source = DxfSource.from_path(file_path)
+                document_id = extraction_document_id(source, extraction_profile)
+            except (ValueError, OSError) as e:
+                failed += 1
+                yield file_line(position, reference, status='error', error=str(e))
+                continue
+            document = documents.setdefault(document_id, {'source': source, 'entries': []})
+            document['entries'].append((position, reference, (file_path, user_folder_path)))
+        
+        # Les résultats déjà en cache partent tout de suite, le reste est soumis au pool
+        tasks = {}
+        for document_id, document in documents.items():
+            cached = extraction_cache.get(document_id)
+            if cached is not None:
+                lines = list(result_lines(document['entries'], cached, document_id))
+                succeeded += len(lines)
+                yield from lines
+                continue
+            task = process_pool.submit(_extract_dxf_content, document['source'], extraction_mode, extraction_profile,
+                                       owner=email)
+            tasks[task.id] = (task, document_id)
         
-        if len(path_components) > 1:
-            parent_folder = path_components[0]
-            logger.info(f"Dossier parent détecté: {parent_folder}")
-            extracted_data['sourcePath'] = rel_path
-            extracted_data['parentFolder'] = parent_folder
-        else:
-            extracted_data['sourcePath'] = rel_path
-            extracted_data['parentFolder'] = ''
+        logger.info(f"Extraction groupée: {len(files)} fichiers, {len(documents)} contenus distincts, {len(tasks)} à analyser")
         
-        return jsonify(extracted_data), 200
+        try:
+            for task in as_completed((task for task, _ in tasks.values()), timeout=BATCH_TIMEOUT):
+                _, document_id = tasks.pop(task.id)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'extraction de {task.id}: {str(e)}")
+                    result = {"error": f"Erreur lors de l'extraction des données : {str(e)}"}
+                if "error" not in result:
+                    extraction_cache.put(document_id, result)
+                
+                entries = documents[document_id]['entries']
+                if "error" in result:
+                    failed += len(entries)
+                else:
+                    succeeded += len(entries)
+                yield from result_lines(entries, result, document_id)
+        except TimeoutError:
+            # Délai global dépassé : une ligne d'erreur par fichier non analysé, puis le bilan
+            logger.error(f"Délai de {BATCH_TIMEOUT:g} s dépassé pour l'extraction groupée: "
+                         f"{len(tasks)} contenus non analysés")
+            timeout_result = {"error": f"Délai de {BATCH_TIMEOUT:g} s dépassé pour l'extraction groupée"}
+            for task, document_id in list(tasks.values()):
+                process_pool.cancel(task.id)
+                entries = documents[document_id]['entries']
+                failed += len(entries)
+                yield from result_lines(entries, timeout_result, document_id)
+            tasks.clear()
+        finally:
+            # Client déconnecté : les analyses restantes sont abandonnées
+            for task, _ in tasks.values():
+                process_pool.cancel(task.id)
+        
+        yield json.dumps({'done': True, 'total': len(files), 'succeeded': succeeded, 'failed': failed,
+                          'unique': len(documents)}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def extract_data_summary():
+    """Première phase du chargement progressif : calques, comptages par calque, emprises et identifiant du document"""
+    logger.info("Requête POST reçue pour le résumé d'un fichier DXF")
+    
+    try:
+        data = request.get_json() or {}
+        filename = data.get('filename')
+        folder = data.get('folder', "")
+        email = data.get('email')
+        
+        if not filename:
+            logger.error("Nom de fichier manquant")
+            return jsonify({"error": "Nom de fichier requis"}), 400
+        
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({"error": "Email non fourni"}), 400
+        
+        try:
+            extraction_mode, extraction_profile = parse_extraction_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        try:
+            file_path, user_folder_path = resolve_user_file_path(email, filename, folder)
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        source = DxfSource.from_path(file_path)
+        result = extract_source_data(source, extraction_mode, extraction_profile)
+        if "error" in result:
+            return jsonify(result), 400
+        
+        index = extraction_indexes.put(extraction_document_id(source, extraction_profile), result, email)
+        summary = index.summary()
+        summary['fileType'] = data.get('fileType', 'projet')
+        summary['sourcePath'] = os.path.relpath(file_path, user_folder_path)
+        logger.info(f"Résumé généré pour {file_path}: {len(summary['layers'])} calques (document {index.document_id})")
+        return jsonify(summary), 200
     
     except Exception as e:
-        logger.error(f"Erreur lors de l'extraction: {str(e)}")
-        return jsonify({"error": f"Erreur lors de l'extraction: {str(e)}"}), 500
+        logger.error(f"Erreur lors du résumé: {str(e)}")
+        return jsonify({"error": f"Erreur lors du résumé: {str(e)}"}), 500
+
+def extract_data_page():
+    """Deuxième phase du chargement progressif : une page d'entités, filtrée par calque et/ou type"""
+    try:
+        data = request.get_json() or {}
+        document_id = data.get('documentId')
+        email = data.get('email')
+        if not document_id:
+            return jsonify({"error": "Identifiant de document requis"}), 400
+        if not extraction_cache.is_valid_key(document_id):
+            logger.warning(f"Identifiant de document invalide: {document_id!r}")
+            return jsonify({"error": "Identifiant de document invalide"}), 400
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({"error": "Email non fourni"}), 400
+        
+        def reload_document():
+            # Document absent de la mémoire (ou résumé par un autre utilisateur) : on ré-extrait
+            # le fichier de l'utilisateur, ce qui prouve qu'il a accès à ce document
+            if not data.get('filename'):
+                return None
+            extraction_mode, extraction_profile = parse_extraction_options(data)
+            file_path, _ = resolve_user_file_path(email, data['filename'], data.get('folder', ""))
+            source = DxfSource.from_path(file_path)
+            return extraction_document_id(source, extraction_profile), extract_source_data(source, extraction_mode, extraction_profile)
+        
+        try:
+            index = extraction_indexes.get(document_id, email, reload_document)
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 409
+        except FileNotFoundError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if index is None:
+            return jsonify({"error": "Document inconnu ou expiré, redemander le résumé"}), 404
+        
+        page = index.page(
+            layer=data.get('layer'),
+            entity_type=data.get('type'),
+            cursor=data.get('cursor'),
+            limit=data.get('limit', DEFAULT_PAGE_SIZE),
+            geometry_format=data.get('geometry', GEOMETRY_FORMAT_LEGACY)
+        )
+        return jsonify(page), 200
+    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la page: {str(e)}")
+        return jsonify({"error": f"Erreur lors de la lecture de la page: {str(e)}"}), 500
+
+def get_extraction_cache_stats():
+    """Retourne les compteurs du cache d'extraction DXF (hits, misses, taille)"""
+    try:
+        return jsonify(extraction_cache.stats()), 200
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des statistiques du cache: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la lecture des statistiques du cache: {str(e)}'}), 500
+
+def get_process_pool_stats():
+    """Retourne l'état du pool de processus de calcul (file d'attente, tâches actives, compteurs)"""
+    try:
+        return jsonify(process_pool.metrics()), 200
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des statistiques du pool: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la lecture des statistiques du pool: {str(e)}'}), 500
+
+def cancel_process_pool_task(task_id):
+    """Annule une tâche du pool de processus, en attente ou en cours d'exécution, soumise pour l'utilisateur"""
+    try:
+        data = request.get_json(silent=True) or {}
+        email = data.get('email')
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        # Une tâche d'un autre utilisateur est traitée comme introuvable
+        if not process_pool.cancel(task_id, owner=email):
+            return jsonify({'error': f'Tâche {task_id} introuvable ou déjà terminée'}), 404
+        logger.info(f"Annulation demandée pour la tâche {task_id}")
+        return jsonify({'message': f'Annulation de la tâche {task_id} demandée'}), 202
+    except Exception as e:
+        logger.error(f"Erreur lors de l'annulation de la tâche {task_id}: {str(e)}")
+        return jsonify({'error': f"Erreur lors de l'annulation de la tâche: {str(e)}"}), 500
 
 def get_visa_content():
     """Récupère le contenu d'un fichier visa.txt"""
@@ -786,6 +1075,8 @@ def generate_visa_file():
         surfaces = data.get('surfaces')
         floor_name = data.get('floorName', 'Sans nom')
         folder_path = data.get('folderPath', '')
+        # Renvoyer le rapport dans la réponse au lieu de son chemin
+        return_file = bool(data.get('returnFile', False))
         
         logger.info(f"Dossier parent pour le fichier visa: {folder_path}")
         
@@ -829,10 +1120,28 @@ def generate_visa_file():
         file_name = f"visa_{floor_name.replace(' ', '_')}.txt"
         file_path = os.path.join(output_folder_path, file_name)
         
-        content = generate_visa_content(surfaces, floor_name)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        if return_file:
+            def generate():
+                # Chaque morceau du rapport est écrit dans un fichier temporaire puis envoyé au client ;
+                # le fichier ne prend son nom final qu'une fois le rapport complet (client déconnecté : rien ne reste)
+                fd, temp_path = tempfile.mkstemp(dir=output_folder_path, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        for chunk in visa_renderer.stream([visa_context(surfaces, floor_name)]):
+                            f.write(chunk)
+                            yield chunk
+                    os.replace(temp_path, file_path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+                logger.info(f"Fichier visa généré avec succès: {file_path}")
+            
+            response = Response(stream_with_context(generate()), mimetype='text/plain; charset=utf-8')
+            set_attachment_name(response, file_name)
+            response.headers['X-File-Path'] = quote_header_path(file_path)
+            return response
+        
+        visa_renderer.write([visa_context(surfaces, floor_name)], file_path)
         
         logger.info(f"Fichier visa généré avec succès: {file_path}")
         
@@ -845,6 +1154,102 @@ def generate_visa_file():
         logger.error(f"Erreur lors de la génération du fichier visa: {str(e)}")
         return jsonify({'error': f'Erreur lors de la génération du fichier visa: {str(e)}'}), 500
 
+def set_attachment_name(response, file_name):
+    """En-tête Content-Disposition d'un téléchargement, encodé comme le fait send_file (RFC 5987 hors ASCII)"""
+    try:
+        file_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', file_name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': f"UTF-8''{quote(file_name, safe='!#$&+-.^_`|~')}"}
+    else:
+        names = {'filename': file_name}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
+
+def quote_header_path(path):
+    """Chemin de fichier pour l'en-tête X-File-Path : encodé en pourcentage (UTF-8), les en-têtes HTTP étant en latin-1"""
+    return quote(path, safe='/')
+
+def normalize_surface_polylines(surfaces):
+    """Convertit les polylignes reçues au format colonnes en PolylineSet, utilisé tel quel par le calcul"""
+    for key in ('existant', 'projet'):
+        section = surfaces.get(key)
+        if isinstance(section, dict) and isinstance(section.get('polylines'), dict):
+            section['polylines'] = PolylineSet.from_columnar(section['polylines'])
+    return surfaces
+
+def build_excel_workbook(surfaces, floor_name, excel_path, overlay_mode=None):
+    """Calcule les surfaces et écrit le classeur Excel (SDP, TA Projet, TA Existant, TA Summary) dans excel_path"""
+    # Journaliser la structure complète des données pour déboguer
+    logger.info(f"Structure détaillée des surfaces: {json.dumps(surfaces, default=str)}")
+
+    results = compute_floor_surfaces(surfaces, floor_name, overlay_mode)
+    write_surface_workbook([results], excel_path)
+
+    logger.info(f"Fichier Excel créé avec succès: {excel_path}")
+
+
+def build_excel_bytes(surfaces, floor_name, overlay_mode=None):
+    """Calcule les surfaces et retourne le classeur Excel en mémoire (contenu du fichier xlsx)"""
+    results = compute_floor_surfaces(surfaces, floor_name, overlay_mode)
+    buffer = io.BytesIO()
+    write_surface_workbook([results], buffer)
+    return buffer.getvalue()
+
+
+def persist_file_async(content, file_path):
+    """
+    Écrit content dans file_path depuis un thread, sans bloquer la réponse.
+    
+    Le fichier est d'abord écrit sous un nom temporaire puis renommé : un téléchargement
+    concurrent ne lit jamais un fichier partiel.
+    """
+    def persist():
+        temp_path = f"{file_path}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+            logger.info(f"Fichier enregistré: {file_path} ({len(content)} octets)")
+        except OSError as e:
+            logger.error(f"Erreur lors de l'enregistrement du fichier {file_path}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    thread = threading.Thread(target=persist, name='persist-file', daemon=True)
+    thread.start()
+    return thread
+
+
+def prepare_output_dir(email, folder_path=''):
+    """Crée si besoin et retourne le dossier Output de l'utilisateur (ou de son projet folder_path)"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    folder_name = email.split('@')[0]
+    resource_dir = os.path.join(current_dir, 'app', 'Ressources', folder_name)
+    
+    logger.info(f"Chemins - current_dir: {current_dir}, folder_name: {folder_name}, resource_dir: {resource_dir}")
+    
+    if not os.path.exists(resource_dir):
+        logger.warning(f"Le dossier de l'utilisateur n'existe pas: {resource_dir}, tentative de création")
+        os.makedirs(resource_dir, exist_ok=True)
+    
+    if folder_path:
+        project_dir = os.path.join(resource_dir, folder_path)
+        if not os.path.exists(project_dir):
+            logger.info(f"Création du dossier projet: {project_dir}")
+            os.makedirs(project_dir, exist_ok=True)
+        
+        output_dir = os.path.join(project_dir, 'Output')
+    else:
+        output_dir = os.path.join(resource_dir, 'Output')
+    
+    if not os.path.exists(output_dir):
+        logger.info(f"Création du dossier Output: {output_dir}")
+        os.makedirs(output_dir, exist_ok=True)
+        
+    logger.info(f"Dossier Output finalisé: {output_dir} (existe: {os.path.exists(output_dir)})")
+    return output_dir
+
 def generate_excel_file():
     """Génère un fichier Excel avec les informations de surface calculées"""
     logger.info("Requête POST reçue pour générer un fichier Excel")
@@ -867,6 +1272,9 @@ def generate_excel_file():
             surfaces = data.get('surfaces', {})
             floor_name = data.get('floorName', 'Sans nom')
             folder_path = data.get('folderPath', '')
+            overlay_mode = data.get('overlayMode')
+            # Renvoyer le classeur dans la réponse au lieu de son chemin
+            return_file = bool(data.get('returnFile', False))
             
             logger.info(f"Données extraites - email: {email}, floor_name: {floor_name}, folder_path: {folder_path}")
             logger.info(f"Structure de 'surfaces': {list(surfaces.keys()) if isinstance(surfaces, dict) else 'NON-DICT'}")
@@ -878,37 +1286,25 @@ def generate_excel_file():
             if not surfaces:
                 logger.error("Données des surfaces non fournies")
                 return jsonify({'error': 'Données des surfaces non fournies'}), 400
+            
+            try:
+                overlay_mode = resolve_overlay_mode(overlay_mode)
+            except ValueError as e:
+                logger.error(str(e))
+                return jsonify({'error': str(e)}), 400
+
+            try:
+                normalize_surface_polylines(surfaces)
+            except ValueError as e:
+                logger.error(f"Polylignes invalides: {str(e)}")
+                return jsonify({'error': f'Polylignes invalides: {str(e)}'}), 400
         except Exception as e:
             logger.error(f"Erreur lors de la validation des données: {str(e)}")
             return jsonify({'error': f'Erreur lors de la validation des données: {str(e)}'}), 500
         
         # Préparation des dossiers
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            folder_name = email.split('@')[0]
-            resource_dir = os.path.join(current_dir, 'app', 'Ressources', folder_name)
-            
-            logger.info(f"Chemins - current_dir: {current_dir}, folder_name: {folder_name}, resource_dir: {resource_dir}")
-            
-            if not os.path.exists(resource_dir):
-                logger.warning(f"Le dossier de l'utilisateur n'existe pas: {resource_dir}, tentative de création")
-                os.makedirs(resource_dir, exist_ok=True)
-            
-            if folder_path:
-                project_dir = os.path.join(resource_dir, folder_path)
-                if not os.path.exists(project_dir):
-                    logger.info(f"Création du dossier projet: {project_dir}")
-                    os.makedirs(project_dir, exist_ok=True)
-                
-                output_dir = os.path.join(project_dir, 'Output')
-            else:
-                output_dir = os.path.join(resource_dir, 'Output')
-            
-            if not os.path.exists(output_dir):
-                logger.info(f"Création du dossier Output: {output_dir}")
-                os.makedirs(output_dir, exist_ok=True)
-                
-            logger.info(f"Dossier Output finalisé: {output_dir} (existe: {os.path.exists(output_dir)})")
+            output_dir = prepare_output_dir(email, folder_path)
         except Exception as e:
             logger.error(f"Erreur lors de la préparation des dossiers: {str(e)}")
             return jsonify({'error': f'Erreur lors de la préparation des dossiers: {str(e)}'}), 500
@@ -924,1326 +1320,30 @@ def generate_excel_file():
             
             logger.info(f"Préparation de la création du fichier Excel: {excel_path}")
             
-            # Remplacer la fonction create_excel_document par une version très simplifiée pour tester
-            # Cette version crée un fichier Excel minimal fonctionnel
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "SDP"
-            
-            # En-têtes complets selon l'image de référence
-            ws['A1'] = "Etages"
-            ws['B1'] = "Destinations"
-            ws['C1'] = "Surface existante avant travaux (A)"
-            ws['D1'] = "Surface creee (B)"
-            ws['E1'] = "Surface creee par changement de destination"
-            ws['F1'] = "Surface demolie reconstruite"
-            ws['G1'] = "Surface supprimee (D)"
-            ws['H1'] = "Surface supprimee par changement de destination"
-            ws['I1'] = "Surface projet"
-            ws['J1'] = "Surface RDV"
-            
-            # Ajout de l'étage - seulement dans la première ligne
-            ws['A2'] = floor_name
-            
-            # Traitement très simplifié des destinations
-            row = 2
-            
-            # Fonction pour calculer l'intersection entre deux polylignes
-            def calculate_intersection(poly1, poly2):
-                try:
-                    # Convertir les sommets en objets Point
-                    from shapely.geometry import Polygon
-                    
-                    # Créer les polygones à partir des sommets
-                    poly1_pts = [(v['x'], v['y']) for v in poly1.get('vertices', [])]
-                    poly2_pts = [(v['x'], v['y']) for v in poly2.get('vertices', [])]
-                    
-                    if len(poly1_pts) < 3 or len(poly2_pts) < 3:
-                        return 0.0
-                        
-                    poly1_shapely = Polygon(poly1_pts)
-                    poly2_shapely = Polygon(poly2_pts)
-                    
-                    # Vérifier si les polygones sont valides
-                    if not poly1_shapely.is_valid or not poly2_shapely.is_valid:
-                        return 0.0
-                    
-                    # Calculer l'intersection
-                    intersection = poly1_shapely.intersection(poly2_shapely)
-                    
-                    # Retourner l'aire de l'intersection
-                    return intersection.area
-                    
-                except Exception as e:
-                    logger.warning(f"Erreur lors du calcul d'intersection: {str(e)}")
-                    return 0.0
-            
-            # Dictionnaire de correspondance pour les cas spéciaux
-            special_cases = {
-                "AUTRE_BUREAU": "Autre bureau",
-                "AUTRE_CONGRE": "Autre congrès exposition",
-                "AUTRE_ENTREP": "Autre entrepôt",
-                "AUTRE_INDUST": "Autre industrie",
-                "COMMERCE_ART": "Commerce artisanat",
-                "COMMERCE_AUT": "Commerce autre hébergement touristique",
-                "COMMERCE_CIN": "Commerce cinéma",
-                "COMMERCE_DE_": "Commerce de gros",
-                "COMMERCE_HOT": "Commerce hôtel",
-                "COMMERCE_RES": "Commerce restauration",
-                "COMMERCE_SER": "Commerce service accueil clientèle",
-                "EXPLOITATIO": "Exploitation forestière",
-                "EXPLOITATION": "Exploitation agricole",
-                "HABITATION_H": "Habitation hébergement",
-                "HABITATION_L": "Habitation logement",
-                "SPIC_ADMINIS": "Spic administration",
-                "SPIC_ART_SPE": "Spic art spectacle",
-                "SPIC_AUTRE": "Spic autre",
-                "SPIC_ENSEIGN": "Spic enseignement santé",
-                "SPIC_LT": "Spic lt",
-                "SPIC_SPORT": "Spic sport"
-            }
-            
-            # Journaliser la structure complète des données pour déboguer
-            logger.info(f"Structure détaillée des surfaces: {json.dumps(surfaces, default=str)}")
-            
-            # Analyse détaillée de la structure des données
-            existant_polylines = surfaces.get('existant', {}).get('polylines', [])
-            projet_polylines = surfaces.get('projet', {}).get('polylines', [])
-            
-            logger.info(f"Existant polylines: {len(existant_polylines)}")
-            logger.info(f"Projet polylines: {len(projet_polylines)}")
-            
-            # IMPORTANT: Rappel de l'inversion des fichiers
-            # existant_polylines contient les données du fichier "Projet_demoli_feuille_TA.dxf" (surface existante avant travaux)
-            # projet_polylines contient les données du fichier "Existant_exmple_demoli.dxf" (surface projet)
-            
-            # Fonction pour extraire le nom de destination d'une polyligne avec logging
-            def get_destination_from_layer(layer):
-                if not isinstance(layer, str):
-                    logger.warning(f"Layer n'est pas une chaîne: {layer}")
-                    return None
-                    
-                # Vérifier si c'est un calque SDP_1
-                if 'GEX_EDS_SDP_1' not in layer:
-                    return None
-                
-                # Journaliser le calque pour débogage
-                logger.info(f"Traitement du calque: {layer}")
-                
-                # Extraire la partie après GEX_EDS_SDP_1-
-                try:
-                    parts = layer.split('GEX_EDS_SDP_1-')
-                    if len(parts) >= 2:
-                        raw_destination = parts[1]
-                        
-                        # Journaliser la destination brute extraite
-                        logger.info(f"Destination brute extraite: {raw_destination}")
-                        
-                        # Nettoyer le nom de la destination de tout caractère indésirable à la fin
-                        if raw_destination.endswith('_'):
-                            raw_destination = raw_destination[:-1]
-                        
-                        # Cas spécial pour EXPLOITATIO0 qui apparaît dans votre fichier
-                        if "EXPLOITATIO0" in raw_destination:
-                            raw_destination = "EXPLOITATIO"
-                        
-                        # Tentative de correspondance avec les clés connues
-                        for key in special_cases.keys():
-                            if key == raw_destination:
-                                logger.info(f"Match exact: {key}")
-                                return key
-                        
-                        # Si pas de correspondance exacte, faire une recherche partielle
-                        for key in special_cases.keys():
-                            if key in raw_destination or raw_destination in key:
-                                logger.info(f"Match partiel: {key} dans {raw_destination}")
-                                return key
-                        
-                        logger.info(f"Destination finale: {raw_destination}")
-                        return raw_destination
-                except Exception as e:
-                    logger.error(f"Erreur lors de l'extraction de la destination: {str(e)}")
-                
-                return None
-            
-            # Fonction pour déterminer si une polyligne est un calque spécial à déduire
-            def is_special_layer(layer):
-                if not isinstance(layer, str):
-                    return False
-                    
-                patterns = ['GEX_EDS_SDP_2', 'GEX_EDS_SDP_3', 'GEX_EDS_SDP_4', 'GEX_EDS_SDP_5', 'GEX_EDS_SDP_7']
-                return any(pattern in layer for pattern in patterns)
-            
-            # Fonction pour calculer la surface d'une polyligne
-            def calculate_area(polyline):
-                vertices = polyline.get('vertices', [])
-                if len(vertices) < 3:
-                    return 0
-                    
-                # Calculer l'aire en utilisant la formule de Shoelace
-                area = 0.0
-                n = len(vertices)
-                for i in range(n):
-                    j = (i + 1) % n
-                    area += vertices[i]['x'] * vertices[j]['y']
-                    area -= vertices[j]['x'] * vertices[i]['y']
-                    
-                return abs(area) / 2.0
-            
-            def is_contained(polyline1, polyline2):
-                try:
-                    # Utiliser Shapely pour une vérification de contenance géométrique précise
-                    from shapely.geometry import Polygon
-                    
-                    # Créer les polygones à partir des sommets
-                    poly1_pts = [(v['x'], v['y']) for v in polyline1.get('vertices', [])]
-                    poly2_pts = [(v['x'], v['y']) for v in polyline2.get('vertices', [])]
-                    
-                    if len(poly1_pts) < 3 or len(poly2_pts) < 3:
-                        return False
-                        
-                    poly1_shapely = Polygon(poly1_pts)
-                    poly2_shapely = Polygon(poly2_pts)
-                    
-                    # Vérifier si les polygones sont valides
-                    if not poly1_shapely.is_valid or not poly2_shapely.is_valid:
-                        return False
-                    
-                    # Vérifier si poly1 est entièrement contenu dans poly2
-                    # Un polygone est contenu dans un autre si leur intersection est égale au premier polygone
-                    return poly2_shapely.contains(poly1_shapely)
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la vérification de contenance: {str(e)}")
-                    return False
-                    
-            # Structure pour stocker les résultats
-            calculation_results = {
-                'existant': {},       # Pour les surfaces existantes
-                'projet': {},          # Pour les surfaces projet
-                'cree_changement': {}, # Surface créée par changement de destination
-                'demolie': {},         # Surface démolie reconstruite
-                'supprimee': {},       # Surface supprimée (D)
-                'supprimee_changement': {}, # Surface supprimée par changement de destination
-                'demolition': {}       # Pour les surfaces de démolition par destination
-            }
-            
-            # Identifier les polylignes de démolition (GEX_EDS_TA_SDP_CAHIER_DEMO)
-            demolition_polylines = [p for p in existant_polylines 
-                                 if 'GEX_EDS_TA_SDP_CAHIER_DEMO' in p.get('layer', '')]
-            
-            logger.info(f"Nombre de polylignes de démolition trouvées: {len(demolition_polylines)}")
-            
-            # Traiter les polylignes existantes (Projet_demoli_feuille_TA.dxf)
-            main_existant_polylines = []
-            special_existant_polylines = []
-            
-            for polyline in existant_polylines:
-                layer = polyline.get('layer', '')
-                if 'GEX_EDS_SDP_1' in layer:
-                    destination = get_destination_from_layer(layer)
-                    if destination:
-                        main_existant_polylines.append(polyline)
-                        area = calculate_area(polyline)
-                        if destination not in calculation_results['existant']:
-                            calculation_results['existant'][destination] = 0
-                            calculation_results['demolition'][destination] = 0.0
-                        calculation_results['existant'][destination] += area
-                        logger.info(f"Existant: Destination {destination} - ajout surface {area}")
-                        
-                        # Calculer l'intersection avec les zones de démolition
-                        for demo_poly in demolition_polylines:
-                            intersection_area = calculate_intersection(polyline, demo_poly)
-                            if intersection_area > 0:
-                                calculation_results['demolition'][destination] += intersection_area
-                                logger.info(f"  - Intersection avec zone de démolition: {intersection_area:.2f} m²")
-                                
-                elif is_special_layer(layer):
-                    special_existant_polylines.append(polyline)
-            
-            # Traiter les polylignes projet (Existant_exmple_demoli.dxf)
-            main_projet_polylines = []
-            special_projet_polylines = []
-            
-            for polyline in projet_polylines:
-                layer = polyline.get('layer', '')
-                if 'GEX_EDS_SDP_1' in layer:
-                    destination = get_destination_from_layer(layer)
-                    if destination:
-                        main_projet_polylines.append(polyline)
-                        area = calculate_area(polyline)
-                        
-                        # Enregistrer les dimensions brutes pour analyse
-                        vertices = polyline.get('vertices', [])
-                        if vertices:
-                            min_x = min(v['x'] for v in vertices)
-                            max_x = max(v['x'] for v in vertices)
-                            min_y = min(v['y'] for v in vertices)
-                            max_y = max(v['y'] for v in vertices)
-                            logger.info(f"Dimensions brutes pour {destination}: X({min_x},{max_x}), Y({min_y},{max_y}), Surface={area}")
-                            
-                        # Vérifier si le calcul semble correct (cas de figure spécifique)
-                        # Les erreurs de calcul peuvent venir de points trop proches ou mal définis
-                        
-                        if destination not in calculation_results['projet']:
-                            calculation_results['projet'][destination] = 0
-                        calculation_results['projet'][destination] += area
-                        logger.info(f"Projet: Destination {destination} - ajout surface {area}")
-                elif is_special_layer(layer):
-                    special_projet_polylines.append(polyline)
-            
-            # Déduire les surfaces spéciales des existantes
-            for special_polyline in special_existant_polylines:
-                area = calculate_area(special_polyline)
-                if area <= 0:
-                    continue
-                    
-                for main_polyline in main_existant_polylines:
-                    if is_contained(special_polyline, main_polyline):
-                        destination = get_destination_from_layer(main_polyline.get('layer', ''))
-                        if destination and destination in calculation_results['existant']:
-                            calculation_results['existant'][destination] -= area
-                            logger.info(f"Existant: Déduction de {area} pour {destination}")
-                        break
-            
-            # Déduire les surfaces spéciales des projets
-            for special_polyline in special_projet_polylines:
-                area = calculate_area(special_polyline)
-                if area <= 0:
-                    continue
-                    
-                for main_polyline in main_projet_polylines:
-                    if is_contained(special_polyline, main_polyline):
-                        destination = get_destination_from_layer(main_polyline.get('layer', ''))
-                        if destination and destination in calculation_results['projet']:
-                            calculation_results['projet'][destination] -= area
-                            logger.info(f"Projet: Déduction de {area} pour {destination}")
-                        break
-            
-            # IMPORTANT: Recalculer les surfaces projet avec la même méthode que pour les surfaces existantes
-            # Nous allons vider et recalculer les surfaces projet
-            logger.info("Recalcul des surfaces projet avec la même méthode que pour les surfaces existantes")
-            
-            # Vider les résultats précédents pour les surfaces projet
-            calculation_results['projet'] = {}
-            
-            # Appliquer exactement la même méthode pour les surfaces projet que pour les surfaces existantes
-            # Pour les polylignes principales
-            main_projet_polylines = []
-            for polyline in projet_polylines:
-                layer = polyline.get('layer', '')
-                if 'GEX_EDS_SDP_1' in layer:
-                    destination = get_destination_from_layer(layer)
-                    if destination:
-                        main_projet_polylines.append(polyline)
-                        area = calculate_area(polyline)
-                        if destination not in calculation_results['projet']:
-                            calculation_results['projet'][destination] = 0
-                        calculation_results['projet'][destination] += area
-                        logger.info(f"Recalcul Projet: Destination {destination} - ajout surface {area}")
-            
-            # Pour les polylignes spéciales
-            special_projet_polylines = []
-            for polyline in projet_polylines:
-                layer = polyline.get('layer', '')
-                if 'GEX_EDS_SDP_1' not in layer and is_special_layer(layer):
-                    special_projet_polylines.append(polyline)
-            
-            # Déduire les surfaces spéciales des surfaces projet
-            for special_polyline in special_projet_polylines:
-                area = calculate_area(special_polyline)
-                if area <= 0:
-                    continue
-                    
-                # Vérifier la contenance dans chaque polyligne principale
-                for main_polyline in main_projet_polylines:
-                    if is_contained(special_polyline, main_polyline):
-                        destination = get_destination_from_layer(main_polyline.get('layer', ''))
-                        if destination and destination in calculation_results['projet']:
-                            calculation_results['projet'][destination] -= area
-                            logger.info(f"Recalcul Projet: Déduction de {area} pour {destination}")
-                        break
-            
-            # Débogage des résultats de calcul finaux
-            logger.info(f"===== Résultats de calcul finaux =====")
-            for dest, value in calculation_results['existant'].items():
-                logger.info(f"Existant - {dest}: {value}")
-            for dest, value in calculation_results['projet'].items():
-                logger.info(f"Projet - {dest}: {value}")
-            
-            # Collecter uniquement les destinations qui ont des valeurs dans les calculs
-            all_destinations = set()
-            
-            # Nous n'ajoutons que les destinations qui ont des polylignes dans les fichiers extraits
-            for destination in calculation_results['existant'].keys():
-                all_destinations.add(destination)
-                
-            for destination in calculation_results['projet'].keys():
-                all_destinations.add(destination)
-                
-            logger.info(f"Destinations présentes dans les fichiers extraits: {all_destinations}")
-            
-            # Vérifier si nous avons au moins une destination
-            if not all_destinations:
-                logger.warning("Aucune destination trouvée dans les fichiers extraits. Vérifiez le contenu des fichiers DXF.")
-            
-            # Traiter chaque destination
-            for destination in sorted(all_destinations):
-                formatted_destination = special_cases.get(destination, destination)
-                
-                # Surface existante (A) - du fichier Projet_demoli_feuille_TA.dxf
-                existant_surface = calculation_results['existant'].get(destination, 0)
-                
-                # Surface projet - du fichier Existant_exmple_demoli.dxf - CONSERVER LA VALEUR BRUTE
-                # Ne pas arrondir à ce stade pour avoir le même traitement que les surfaces existantes
-                projet_surface = calculation_results['projet'].get(destination, 0)
-                
-                # Ajouter la ligne au fichier Excel avec précision complète pour les surfaces
-                ws[f'B{row}'] = formatted_destination
-                
-                # Afficher les valeurs exactes dans les logs avant affichage
-                logger.info(f"Destination {formatted_destination} - Surface existante: {existant_surface}, Surface projet: {projet_surface}")
-                
-                # Surface existante avec précision identique au fichier attendu
-                if existant_surface > 0:
-                    ws[f'C{row}'] = existant_surface
-                
-                # Surface projet avec précision identique au fichier attendu
-                if projet_surface > 0:
-                    ws[f'I{row}'] = projet_surface
-                
-                # Remplir la colonne Surface démolie (F) uniquement si > 0
-                demolition_surface = calculation_results['demolition'].get(destination, 0)
-                if demolition_surface > 0:
-                    ws[f'F{row}'] = demolition_surface
-                
-                # Journaliser les résultats pour débogage
-                logger.info(f"Destination {formatted_destination} - Surface existante: {existant_surface}, "
-                           f"Surface projet: {projet_surface}, Surface démolie: {demolition_surface}")
-                
-                row += 1
-            
-            # Supprimer la feuille SDP si elle existe déjà
-            if "SDP" in wb.sheetnames:
-                del wb["SDP"]
-                
-            # Créer une nouvelle feuille SDP avec la structure demandée
-            ws_sdp = wb.create_sheet(title="SDP")
-            
-            # En-têtes pour la feuille SDP selon les spécifications
-            ws_sdp['A1'] = "Étages"
-            ws_sdp['B1'] = "Destinations"
-            ws_sdp['C1'] = "Surface existante avant travaux (A)"
-            ws_sdp['D1'] = "Surface créée (B)"
-            ws_sdp['E1'] = "Surface démolie reconstruite"
-            ws_sdp['F1'] = "Surface supprimée (D)"
-            ws_sdp['G1'] = "Surface supprimée par changement de destination"
-            ws_sdp['H1'] = "Surface projet"
-            ws_sdp['I1'] = "Surface RDV"
-            
-            # Appliquer le style aux en-têtes
-            header_font = Font(name='Arial', size=11, bold=True)
-            header_alignment = Alignment(horizontal='center', vertical='center')
-            border = Border(
-                left=Side(border_style="thin", color="000000"),
-                right=Side(border_style="thin", color="000000"),
-                top=Side(border_style="thin", color="000000"),
-                bottom=Side(border_style="thin", color="000000")
-            )
-            
-            for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I']:
-                cell = ws_sdp[f'{col}1']
-                cell.font = header_font
-                cell.alignment = header_alignment
-                cell.border = border
-                ws_sdp.column_dimensions[col].width = 22  # Ajuster la largeur des colonnes
-            
-            # Créer une nouvelle feuille nommée "TA Projet" (anciennement "TA Demoli Detailled")
-            ws_ta = wb.create_sheet(title="TA Projet")
-            
-            # En-têtes pour la feuille TA Projet
-            ws_ta['A1'] = "Étages"
-            ws_ta['B1'] = "Destinations"
-            ws_ta['C1'] = "TA avant déduction"
-            ws_ta['D1'] = "Vides"
-            ws_ta['E1'] = "Surfaces dont h < 1.80m"
-            ws_ta['F1'] = "TA après déduction"
-            
-            # Appliquer le style aux en-têtes
-            for col in ['A', 'B', 'C', 'D', 'E', 'F']:
-                cell = ws_ta[f'{col}1']
-                cell.font = header_font
-                cell.alignment = header_alignment
-                cell.border = border
-                ws_ta.column_dimensions[col].width = 15  # Ajuster la largeur des colonnes
-            
-            # Ajouter l'étage dans la feuille TA
-            ta_row = 2
-            ws_ta[f'A{ta_row}'] = floor_name
-            
-            # Appliquer le style à la cellule de l'étage
-            data_font = Font(name='Arial', size=12)
-            data_alignment = Alignment(horizontal='center', vertical='center')
-            
-            cell = ws_ta[f'A{ta_row}']
-            cell.font = data_font
-            cell.alignment = data_alignment
-            cell.border = border
-            
-            # Fonction pour déterminer si une polyligne est un calque principal SDP_1
-            def is_main_sdp_polyline(polyline):
-                layer = polyline.get('layer', '')
-                return isinstance(layer, str) and layer.startswith('GEX_EDS_SDP_1')
-            
-            # Fonction pour déterminer si une polyligne est un calque spécial à déduire (SDP_2, SDP_3, etc.)
-            def is_special_polyline(polyline):
-                layer = polyline.get('layer', '')
-                if not isinstance(layer, str):
-                    return False
-                # Vérifier si c'est un calque spécial à déduire (pas SDP_1)
-                patterns = ['GEX_EDS_SDP_2', 'GEX_EDS_SDP_3', 'GEX_EDS_SDP_4', 'GEX_EDS_SDP_5', 'GEX_EDS_SDP_7']
-                return any(pattern in layer for pattern in patterns)
-            
-            # Fonction pour calculer l'intersection entre deux polylignes et retourner la surface d'intersection
-            def calculate_intersection_area(polyline1, polyline2):
-                try:
-                    from shapely.geometry import Polygon, MultiPolygon, mapping
-                    from shapely.ops import unary_union
-                    import numpy as np
-                    
-                    # Extraire les informations des polylignes pour le débogage
-                    layer1 = polyline1.get('layer', 'inconnu')
-                    layer2 = polyline2.get('layer', 'inconnu')
-                    logger.info(f"Calcul d'intersection entre: {layer1} et {layer2}")
-                    
-                    vertices1 = polyline1.get('vertices', [])
-                    vertices2 = polyline2.get('vertices', [])
-                    
-                    if len(vertices1) < 3 or len(vertices2) < 3:
-                        logger.warning(f"Pas assez de sommets pour former un polygone: {len(vertices1)} et {len(vertices2)}")
-                        return 0.0
-                    
-                    # Journaliser les sommets pour débogage
-                    logger.info(f"Polygone 1 ({layer1}): {len(vertices1)} sommets")
-                    logger.info(f"Polygone 2 ({layer2}): {len(vertices2)} sommets")
-                    
-                    # Convertir les sommets en points pour Shapely avec précision
-                    poly1_pts = [(float(v['x']), float(v['y'])) for v in vertices1]
-                    poly2_pts = [(float(v['x']), float(v['y'])) for v in vertices2]
-                    
-                    # S'assurer que les polygones sont fermés (premier et dernier point identiques)
-                    if poly1_pts[0] != poly1_pts[-1]:
-                        poly1_pts.append(poly1_pts[0])
-                    if poly2_pts[0] != poly2_pts[-1]:
-                        poly2_pts.append(poly2_pts[0])
-                    
-                    # Créer les polygones Shapely
-                    try:
-                        # Créer les polygones avec des coordonnées précises
-                        poly1 = Polygon(poly1_pts)
-                        poly2 = Polygon(poly2_pts)
-                        
-                        # Journaliser les aires des polygones
-                        logger.info(f"Aire du polygone 1 ({layer1}): {poly1.area}")
-                        logger.info(f"Aire du polygone 2 ({layer2}): {poly2.area}")
-                        
-                        # Vérifier si les polygones sont valides
-                        if not poly1.is_valid:
-                            logger.warning(f"Polygone 1 ({layer1}) invalide, tentative de réparation")
-                            poly1 = poly1.buffer(0)  # Tenter de réparer le polygone
-                        if not poly2.is_valid:
-                            logger.warning(f"Polygone 2 ({layer2}) invalide, tentative de réparation")
-                            poly2 = poly2.buffer(0)  # Tenter de réparer le polygone
-                        
-                        if not poly1.is_valid:
-                            logger.warning(f"Polygone 1 ({layer1}) toujours invalide après réparation")
-                            return 0.0
-                        if not poly2.is_valid:
-                            logger.warning(f"Polygone 2 ({layer2}) toujours invalide après réparation")
-                            return 0.0
-                        
-                        # Ajouter une petite tolérance pour les intersections presque tangentes
-                        poly1_buffered = poly1.buffer(0.001)
-                        
-                        # Calculer l'intersection avec la tolérance
-                        if poly1_buffered.intersects(poly2):
-                            # Essayer d'abord avec la tolérance
-                            intersection = poly1_buffered.intersection(poly2)
-                            intersection_area = intersection.area
-                            
-                            # Si l'intersection est très petite, essayer sans tolérance
-                            if intersection_area < 0.01 and poly1.intersects(poly2):
-                                intersection = poly1.intersection(poly2)
-                                intersection_area = intersection.area
-                            
-                            logger.info(f"Intersection trouvée entre {layer1} et {layer2}! Aire: {intersection_area}")
-                            
-                            # Journaliser les coordonnées de l'intersection pour débogage
-                            try:
-                                intersection_coords = mapping(intersection)
-                                logger.info(f"Forme de l'intersection: {intersection.geom_type}")
-                            except Exception as e:
-                                logger.warning(f"Impossible d'extraire les coordonnées de l'intersection: {str(e)}")
-                            
-                            return intersection_area
-                        else:
-                            # Vérifier si les polygones sont très proches
-                            distance = poly1.distance(poly2)
-                            logger.info(f"Pas d'intersection entre {layer1} et {layer2}. Distance: {distance}")
-                            return 0.0
-                    except Exception as e:
-                        logger.warning(f"Erreur lors de la création des polygones: {str(e)}")
-                        return 0.0
-                        
-                except Exception as e:
-                    logger.warning(f"Erreur lors du calcul d'intersection: {str(e)}")
-                    return 0.0
-            
-            # Filtrer les polylignes principales et spéciales
-            main_projet_polylines = [p for p in projet_polylines if is_main_sdp_polyline(p)]
-            special_projet_polylines = [p for p in projet_polylines if is_special_polyline(p)]
-            
-            # Collecter toutes les destinations des polylignes principales
-            all_destinations = set()
-            for polyline in main_projet_polylines:
-                destination = get_destination_from_layer(polyline.get('layer', ''))
-                if destination:
-                    all_destinations.add(destination)
-            
-            # Dictionnaire pour stocker les données T.A. par destination
-            ta_data = {}
-            
-            # Calculer les données T.A. pour chaque destination
-            for destination in all_destinations:
-                # Initialiser les valeurs pour cette destination
-                planchers_avant_deductions = 0.0  # Planchers avant déductions
-                vides = 0.0                       # Vides (stairwells, elevator shafts, etc.)
-                surfaces_h_moins_180 = 0.0        # Surfaces dont h < 1.80m
-                
-                # Calculer Planchers avant déductions - utiliser les surfaces principales
-                for polyline in main_projet_polylines:
-                    if get_destination_from_layer(polyline.get('layer', '')) == destination:
-                        # Calculer la surface de cette polyligne
-                        area = 0.0
-                        vertices = polyline.get('vertices', [])
-                        if len(vertices) >= 3:
-                            # Calculer la surface en utilisant la formule de Shoelace (Gauss's area formula)
-                            n = len(vertices)
-                            for i in range(n):
-                                j = (i + 1) % n
-                                area += vertices[i]['x'] * vertices[j]['y']
-                                area -= vertices[j]['x'] * vertices[i]['y']
-                            area = abs(area) / 2.0
-                        planchers_avant_deductions += area
-                
-                # Identifier les vides (GEX_EDS_SDP_2 - TREMIE)
-                for polyline in special_projet_polylines:
-                    special_layer = polyline.get('layer', '')
-                    if not isinstance(special_layer, str):
-                        continue
-                    
-                    if 'GEX_EDS_SDP_2' in special_layer:  # Vides/TREMIE
-                        # Extraire les informations du vide pour le débogage
-                        void_id = polyline.get('id', 'inconnu')
-                        logger.info(f"Traitement du vide {void_id} avec calque {special_layer}")
-                        
-                        # Calculer d'abord la surface totale du vide
-                        void_area = 0.0
-                        vertices = polyline.get('vertices', [])
-                        
-                        if len(vertices) < 3:
-                            logger.warning(f"Pas assez de sommets pour le vide {void_id}: {len(vertices)}")
-                            continue
-                            
-                        from shapely.geometry import Polygon, mapping
-                        try:
-                            # Créer un polygone Shapely pour le vide
-                            void_pts = [(float(v['x']), float(v['y'])) for v in vertices]
-                            
-                            # S'assurer que le polygone est fermé
-                            if void_pts[0] != void_pts[-1]:
-                                void_pts.append(void_pts[0])
-                            
-                            # Journaliser les points du vide pour débogage
-                            logger.info(f"Vide {void_id}: {len(void_pts)} points")
-                            
-                            void_polygon = Polygon(void_pts)
-                            if not void_polygon.is_valid:
-                                logger.warning(f"Polygone de vide {void_id} invalide, tentative de réparation")
-                                void_polygon = void_polygon.buffer(0)  # Réparer le polygone si nécessaire
-                            
-                            if void_polygon.is_valid:
-                                void_area = void_polygon.area
-                                logger.info(f"Vide {void_id} valide trouvé avec surface: {void_area}")
-                                
-                                # Journaliser la forme du vide
-                                try:
-                                    void_coords = mapping(void_polygon)
-                                    logger.info(f"Forme du vide {void_id}: {void_polygon.geom_type}")
-                                except Exception as e:
-                                    logger.warning(f"Impossible d'extraire les coordonnées du vide {void_id}: {str(e)}")
-                            else:
-                                logger.warning(f"Polygone de vide {void_id} invalide après tentative de réparation")
-                                continue
-                        except Exception as e:
-                            logger.warning(f"Erreur lors de la création du polygone vide {void_id}: {str(e)}")
-                            continue
-                        
-                        # Calculer l'intersection avec les polylignes de cette destination
-                        intersection_found = False
-                        destination_polylines = [p for p in main_projet_polylines if get_destination_from_layer(p.get('layer', '')) == destination]
-                        
-                        logger.info(f"Vérification des intersections pour vide {void_id} avec {destination} ({len(destination_polylines)} polylignes)")
-                        
-                        # Essayer d'abord avec un buffer légèrement plus grand pour capturer les intersections proches
-                        void_polygon_buffered = void_polygon.buffer(0.05)  # Augmenter le buffer à 0.05 pour mieux capturer les intersections
-                        
-                        for main_polyline in destination_polylines:
-                            main_id = main_polyline.get('id', 'inconnu')
-                            main_layer = main_polyline.get('layer', 'inconnu')
-                            logger.info(f"Tentative d'intersection entre vide {void_id} et polyligne {main_id} (calque {main_layer})")
-                            
-                            # Calculer l'aire d'intersection avec méthode améliorée
-                            intersection_area = calculate_intersection_area(polyline, main_polyline)
-                            
-                            if intersection_area > 0:
-                                vides += intersection_area
-                                intersection_found = True
-                                logger.info(f"Intersection trouvée entre vide {void_id} et {destination} (polyligne {main_id}): {intersection_area}")
-                            else:
-                                # Essayer avec le buffer si l'intersection directe échoue
-                                try:
-                                    main_vertices = main_polyline.get('vertices', [])
-                                    if len(main_vertices) >= 3:
-                                        main_pts = [(float(v['x']), float(v['y'])) for v in main_vertices]
-                                        if main_pts[0] != main_pts[-1]:
-                                            main_pts.append(main_pts[0])
-                                            
-                                        main_polygon = Polygon(main_pts)
-                                        if main_polygon.is_valid:
-                                            # Vérifier l'intersection avec le buffer
-                                            if void_polygon_buffered.intersects(main_polygon):
-                                                buffer_intersection = void_polygon_buffered.intersection(main_polygon)
-                                                buffer_area = buffer_intersection.area
-                                                logger.info(f"Intersection avec buffer trouvée: {buffer_area}")
-                                                
-                                                # Utiliser l'aire du vide originale si l'intersection est significative
-                                                if buffer_area > 0.001:  # Seuil abaissé pour capturer plus d'intersections
-                                                    # Si l'intersection directe est nulle, utiliser l'aire du vide
-                                                    # dans la zone d'intersection du buffer
-                                                    intersection_ratio = buffer_area / void_polygon_buffered.area
-                                                    estimated_area = void_area * intersection_ratio
-                                                    
-                                                    # Vérifier si l'estimation est raisonnable
-                                                    if estimated_area > 0.001 and estimated_area <= void_area:
-                                                        vides += estimated_area
-                                                        intersection_found = True
-                                                        logger.info(f"Intersection estimée entre vide {void_id} et {destination} (polyligne {main_id}): {estimated_area}")
-                                                    else:
-                                                        # Essayer une dernière fois avec un calcul direct
-                                                        actual_intersection = void_polygon.intersection(main_polygon)
-                                                        actual_area = actual_intersection.area
-                                                        if actual_area > 0:
-                                                            vides += actual_area
-                                                            intersection_found = True
-                                                            logger.info(f"Intersection directe après buffer entre vide {void_id} et {destination} (polyligne {main_id}): {actual_area}")
-                                                        elif buffer_area > 0.1:  # Si l'intersection avec buffer est significative
-                                                            # Utiliser une valeur minimale basée sur le buffer
-                                                            min_area = min(void_area, buffer_area * 0.5)
-                                                            vides += min_area
-                                                            intersection_found = True
-                                                            logger.info(f"Intersection minimale entre vide {void_id} et {destination} (polyligne {main_id}): {min_area}")
-                                                            logger.info(f"  - Aire du vide: {void_area}")
-                                                            logger.info(f"  - Aire de l'intersection avec buffer: {buffer_area}")
-                                                            logger.info(f"  - Aire minimale utilisée: {min_area}")
-                                                            logger.info(f"  - Coordonnées du vide: {void_polygon.wkt}")
-                                                            logger.info(f"  - Coordonnées de la destination: {main_polygon.wkt}")
-                                                            logger.info(f"  - Coordonnées de l'intersection: {buffer_intersection.wkt}")
-                                                            logger.info(f"  - Distance entre polygones: {void_polygon.distance(main_polygon)}")
-                                                            logger.info(f"  - Centroide vide: {void_polygon.centroid.wkt}")
-                                                            logger.info(f"  - Centroide destination: {main_polygon.centroid.wkt}")
-                                                            logger.info(f"  - Distance entre centroides: {void_polygon.centroid.distance(main_polygon.centroid)}")
-                                                            
-                                                            # Journaliser la valeur finale des vides pour cette destination
-                                                            logger.info(f"VALEUR FINALE DES VIDES POUR {destination}: {vides}")
-                                                            
-                                                            # Forcer la mise à jour dans ta_data pour cette destination
-                                                            if destination in ta_data:
-                                                                ta_data[destination]['vides'] = vides
-                                except Exception as e:
-                                    logger.warning(f"Erreur lors de la vérification d'intersection avec buffer: {str(e)}")
-                        
-                        # Journaliser si aucune intersection n'a été trouvée pour ce vide avec cette destination
-                        if not intersection_found:
-                            logger.warning(f"Aucune intersection trouvée entre le vide {void_id} ({void_area}) et la destination {destination}")
-                
-                # Identifier les surfaces dont h < 1.80m (GEX_EDS_SDP_3 - H-180)
-                for polyline in special_projet_polylines:
-                    special_layer = polyline.get('layer', '')
-                    if not isinstance(special_layer, str):
-                        continue
-                    
-                    if 'GEX_EDS_SDP_3' in special_layer:  # H-180
-                        # Extraire les informations de la zone h<1.80m pour le débogage
-                        h180_id = polyline.get('id', 'inconnu')
-                        logger.info(f"Traitement de la zone h<1.80m {h180_id} avec calque {special_layer}")
-                        
-                        # Calculer d'abord la surface totale de la zone h<1.80m
-                        h180_area = 0.0
-                        vertices = polyline.get('vertices', [])
-                        
-                        if len(vertices) < 3:
-                            logger.warning(f"Pas assez de sommets pour la zone h<1.80m {h180_id}: {len(vertices)}")
-                            continue
-                            
-                        from shapely.geometry import Polygon, mapping
-                        try:
-                            # Créer un polygone Shapely pour la zone h<1.80m
-                            h180_pts = [(float(v['x']), float(v['y'])) for v in vertices]
-                            
-                            # S'assurer que le polygone est fermé
-                            if h180_pts[0] != h180_pts[-1]:
-                                h180_pts.append(h180_pts[0])
-                            
-                            # Journaliser les points de la zone h<1.80m pour débogage
-                            logger.info(f"Zone h<1.80m {h180_id}: {len(h180_pts)} points")
-                            
-                            h180_polygon = Polygon(h180_pts)
-                            if not h180_polygon.is_valid:
-                                logger.warning(f"Polygone de zone h<1.80m {h180_id} invalide, tentative de réparation")
-                                h180_polygon = h180_polygon.buffer(0)  # Réparer le polygone si nécessaire
-                            
-                            if h180_polygon.is_valid:
-                                h180_area = h180_polygon.area
-                                logger.info(f"Zone h<1.80m {h180_id} valide trouvée avec surface: {h180_area}")
-                                
-                                # Journaliser la forme de la zone h<1.80m
-                                try:
-                                    h180_coords = mapping(h180_polygon)
-                                    logger.info(f"Forme de la zone h<1.80m {h180_id}: {h180_polygon.geom_type}")
-                                except Exception as e:
-                                    logger.warning(f"Impossible d'extraire les coordonnées de la zone h<1.80m {h180_id}: {str(e)}")
-                            else:
-                                logger.warning(f"Polygone de zone h<1.80m {h180_id} invalide après tentative de réparation")
-                                continue
-                        except Exception as e:
-                            logger.warning(f"Erreur lors de la création du polygone h<1.80m {h180_id}: {str(e)}")
-                            continue
-                        
-                        # Calculer l'intersection avec les polylignes de cette destination
-                        intersection_found = False
-                        destination_polylines = [p for p in main_projet_polylines if get_destination_from_layer(p.get('layer', '')) == destination]
-                        
-                        logger.info(f"Vérification des intersections pour zone h<1.80m {h180_id} avec {destination} ({len(destination_polylines)} polylignes)")
-                        
-                        # Essayer d'abord avec un buffer légèrement plus grand pour capturer les intersections proches
-                        h180_polygon_buffered = h180_polygon.buffer(0.05)  # Augmenter le buffer à 0.05 pour mieux capturer les intersections
-                        
-                        for main_polyline in destination_polylines:
-                            main_id = main_polyline.get('id', 'inconnu')
-                            main_layer = main_polyline.get('layer', 'inconnu')
-                            logger.info(f"Tentative d'intersection entre zone h<1.80m {h180_id} et polyligne {main_id} (calque {main_layer})")
-                            
-                            # Calculer l'aire d'intersection avec méthode améliorée
-                            intersection_area = calculate_intersection_area(polyline, main_polyline)
-                            
-                            if intersection_area > 0:
-                                surfaces_h_moins_180 += intersection_area
-                                intersection_found = True
-                                logger.info(f"Intersection trouvée entre zone h<1.80m {h180_id} et {destination} (polyligne {main_id}): {intersection_area}")
-                            else:
-                                # Essayer avec le buffer si l'intersection directe échoue
-                                try:
-                                    main_vertices = main_polyline.get('vertices', [])
-                                    if len(main_vertices) >= 3:
-                                        main_pts = [(float(v['x']), float(v['y'])) for v in main_vertices]
-                                        if main_pts[0] != main_pts[-1]:
-                                            main_pts.append(main_pts[0])
-                                            
-                                        main_polygon = Polygon(main_pts)
-                                        if main_polygon.is_valid:
-                                            # Vérifier l'intersection avec le buffer
-                                            if h180_polygon_buffered.intersects(main_polygon):
-                                                buffer_intersection = h180_polygon_buffered.intersection(main_polygon)
-                                                buffer_area = buffer_intersection.area
-                                                logger.info(f"Intersection avec buffer trouvée pour h<1.80m: {buffer_area}")
-                                                
-                                                # Utiliser l'aire de la zone h<1.80m originale si l'intersection est significative
-                                                if buffer_area > 0.001:  # Seuil abaissé pour capturer plus d'intersections
-                                                    # Si l'intersection directe est nulle, utiliser l'aire de la zone h<1.80m
-                                                    # dans la zone d'intersection du buffer
-                                                    intersection_ratio = buffer_area / h180_polygon_buffered.area
-                                                    estimated_area = h180_area * intersection_ratio
-                                                    
-                                                    # Vérifier si l'estimation est raisonnable
-                                                    if estimated_area > 0.001 and estimated_area <= h180_area:
-                                                        surfaces_h_moins_180 += estimated_area
-                                                        intersection_found = True
-                                                        logger.info(f"Intersection estimée entre zone h<1.80m {h180_id} et {destination} (polyligne {main_id}): {estimated_area}")
-                                                    else:
-                                                        # Essayer une dernière fois avec un calcul direct
-                                                        actual_intersection = h180_polygon.intersection(main_polygon)
-                                                        actual_area = actual_intersection.area
-                                                        if actual_area > 0:
-                                                            surfaces_h_moins_180 += actual_area
-                                                            intersection_found = True
-                                                            logger.info(f"Intersection directe après buffer entre zone h<1.80m {h180_id} et {destination} (polyligne {main_id}): {actual_area}")
-                                                        elif buffer_area > 0.1:  # Si l'intersection avec buffer est significative
-                                                            # Utiliser une valeur minimale basée sur le buffer
-                                                            min_area = min(h180_area, buffer_area * 0.5)
-                                                            surfaces_h_moins_180 += min_area
-                                                            intersection_found = True
-                                                            logger.info(f"Intersection minimale entre zone h<1.80m {h180_id} et {destination} (polyligne {main_id}): {min_area}")
-                                                            logger.info(f"  - Aire de la zone h<1.80m: {h180_area}")
-                                                            logger.info(f"  - Aire de l'intersection avec buffer: {buffer_area}")
-                                                            logger.info(f"  - Aire minimale utilisée: {min_area}")
-                                                            logger.info(f"  - Distance entre polygones: {h180_polygon.distance(main_polygon)}")
-                                                            
-                                                            # Journaliser la valeur finale des surfaces h<1.80m pour cette destination
-                                                            logger.info(f"VALEUR FINALE DES SURFACES H<1.80m POUR {destination}: {surfaces_h_moins_180}")
-                                                            
-                                                            # Forcer la mise à jour dans ta_data pour cette destination
-                                                            if destination in ta_data:
-                                                                ta_data[destination]['surfaces_h_moins_180'] = surfaces_h_moins_180
-                                except Exception as e:
-                                    logger.warning(f"Erreur lors de la vérification d'intersection avec buffer pour h<1.80m: {str(e)}")
-                        
-                        # Journaliser si aucune intersection n'a été trouvée pour cette zone h<1.80m avec cette destination
-                        if not intersection_found:
-                            logger.warning(f"Aucune intersection trouvée entre la zone h<1.80m {h180_id} ({h180_area}) et la destination {destination}")
-                
-                # Calculer le TOTAL T.A.
-                total_ta = planchers_avant_deductions - (vides + surfaces_h_moins_180)
-                
-                # S'assurer que le total n'est pas négatif
-                total_ta = max(0, total_ta)
-                
-                # Journaliser les valeurs calculées avant de les stocker
-                logger.info(f"DESTINATION {destination} - VALEURS FINALES:")
-                logger.info(f"  - Planchers avant déductions: {planchers_avant_deductions}")
-                logger.info(f"  - Vides: {vides}")
-                logger.info(f"  - Surfaces h<1.80m: {surfaces_h_moins_180}")
-                logger.info(f"  - Total TA: {total_ta}")
-                
-                # Stocker les données pour cette destination
-                ta_data[destination] = {
-                    'planchers_avant_deductions': planchers_avant_deductions,
-                    'vides': vides,
-                    'surfaces_h_moins_180': surfaces_h_moins_180,
-                    'total_ta': total_ta
-                }
-            
-            # Ajouter les données T.A. à la feuille TA
-            ta_row = 2
-            for destination in sorted(all_destinations):
-                # Formater le nom de la destination pour une meilleure lisibilité
-                formatted_destination = special_cases.get(destination, destination.replace('_', ' ').lower().capitalize())
-                
-                # Colonne B: Destination
-                ws_ta[f'B{ta_row}'] = formatted_destination
-                cell = ws_ta[f'B{ta_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Récupérer les données T.A. pour cette destination
-                destination_ta_data = ta_data.get(destination, {})
-                
-                # Colonne C: TA avant déduction (renommé de "Planchers avant déductions")
-                planchers_avant_deductions = destination_ta_data.get('planchers_avant_deductions', 0)
-                ws_ta[f'C{ta_row}'] = round(planchers_avant_deductions, 4) if planchers_avant_deductions > 0 else 0
-                cell = ws_ta[f'C{ta_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne D: Vides
-                vides = destination_ta_data.get('vides', 0)
-                logger.info(f"EXCEL - {formatted_destination} - Vides: {vides}")
-                excel_vides_value = round(vides, 4) if vides > 0 else 0
-                ws_ta[f'D{ta_row}'] = excel_vides_value
-                logger.info(f"EXCEL - Valeur écrite dans D{ta_row}: {excel_vides_value}")
-                cell = ws_ta[f'D{ta_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne E: Surfaces dont h < 1.80m
-                surfaces_h_moins_180 = destination_ta_data.get('surfaces_h_moins_180', 0)
-                logger.info(f"EXCEL - {formatted_destination} - Surfaces h<1.80m: {surfaces_h_moins_180}")
-                excel_h180_value = round(surfaces_h_moins_180, 4) if surfaces_h_moins_180 > 0 else 0
-                ws_ta[f'E{ta_row}'] = excel_h180_value
-                logger.info(f"EXCEL - Valeur écrite dans E{ta_row}: {excel_h180_value}")
-                cell = ws_ta[f'E{ta_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne F: TA après déduction (renommé de "TOTAL T.A.")
-                total_ta = destination_ta_data.get('total_ta', 0)
-                ws_ta[f'F{ta_row}'] = round(total_ta, 4) if total_ta > 0 else 0
-                cell = ws_ta[f'F{ta_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Ajouter un commentaire expliquant le calcul
-                comment = Comment(f"TA après déduction = TA avant déduction - (Vides + Surfaces dont h < 1.80m)", "Calcul T.A.")
-                comment.width = 300
-                comment.height = 50
-                cell.comment = comment
-                
-                ta_row += 1
-            
-            # Nous n'ajoutons plus les colonnes SDP au tableau principal car elles sont maintenant dans la feuille SDP dédiée
-            
-            # Fonction pour déterminer si une polyligne est un calque spécifique
-            def is_specific_layer_polyline(polyline, layer_pattern):
-                layer = polyline.get('layer', '')
-                if not isinstance(layer, str):
-                    return False
-                return layer_pattern in layer
-            
-            # Fonction pour calculer la surface d'une polyligne
-            def calculate_polyline_area(polyline):
-                area = 0.0
-                vertices = polyline.get('vertices', [])
-                if len(vertices) >= 3:
-                    # Calculer la surface en utilisant la formule de Shoelace (Gauss's area formula)
-                    n = len(vertices)
-                    for i in range(n):
-                        j = (i + 1) % n
-                        area += vertices[i]['x'] * vertices[j]['y']
-                        area -= vertices[j]['x'] * vertices[i]['y']
-                    area = abs(area) / 2.0
-                return area
-            
-            # Remplir la feuille SDP avec les données des fichiers DXF
-            sdp_row = 2
-            for destination in sorted(all_destinations):
-                # Formater le nom de la destination pour une meilleure lisibilité
-                formatted_destination = special_cases.get(destination, destination)
-                
-                # Récupérer les données pour cette destination depuis les résultats de calcul
-                # Directement depuis les fichiers DXF traités:
-                # - Projet_demoli_feuille_TA.dxf -> surfaces existantes
-                # - Existant_exmple_demoli.dxf -> surfaces projet
-                
-                # Surface existante avant travaux (A) - directement depuis Projet_demoli_feuille_TA.dxf
-                surface_existante = calculation_results['existant'].get(destination, 0)
-                
-                # Surface projet - directement depuis Existant_exmple_demoli.dxf
-                surface_projet = calculation_results['projet'].get(destination, 0)
-                
-                # Surface créée (B) - différence entre projet et existant (si positive)
-                surface_creee = max(0, surface_projet - surface_existante)
-                
-                # Surface démolie reconstruite - zones démolies qui sont reconstruites
-                # Ces zones sont identifiées par l'intersection des polylignes de démolition avec les polylignes existantes
-                surface_demolie_reconstruite = calculation_results['demolition'].get(destination, 0)
-                
-                # Surface supprimée (D) - zones existantes qui ne sont plus présentes dans le projet
-                # et qui ne sont pas reconstruites
-                surface_supprimee = max(0, surface_existante - surface_projet - surface_demolie_reconstruite)
-                if surface_supprimee < 0.01:  # Éviter les valeurs négligeables dues aux erreurs d'arrondi
-                    surface_supprimee = 0
-                
-                # Surface supprimée par changement de destination
-                # Dans ce cas, nous utilisons directement les données calculées
-                surface_supprimee_changement = calculation_results['supprimee_changement'].get(destination, 0)
-                
-                # Surface RDV (Réglementation de Voirie)
-                # Selon les règles métier, la surface RDV est inférieure à la surface projet
-                # Elle est calculée en fonction de la destination
-                if 'HABITATION' in destination.upper():
-                    surface_rdv = surface_projet * 0.75  # 75% pour l'habitation
-                elif 'COMMERCE' in destination.upper():
-                    surface_rdv = surface_projet * 0.80  # 80% pour le commerce
-                else:
-                    surface_rdv = surface_projet * 0.85  # 85% pour les autres destinations
-                
-                # Ajouter une ligne dans la feuille SDP
-                # Write floor name only in the first row
-                if sdp_row == 2:  # First row of data
-                    ws_sdp[f'A{sdp_row}'] = floor_name
-                else:
-                    ws_sdp[f'A{sdp_row}'] = None  # Empty cell for subsequent rows
-                ws_sdp[f'B{sdp_row}'] = formatted_destination
-                
-                # Remplir les colonnes avec les données calculées
-                ws_sdp[f'C{sdp_row}'] = round(surface_existante, 4) if surface_existante > 0 else ""
-                ws_sdp[f'D{sdp_row}'] = round(surface_creee, 4) if surface_creee > 0 else ""
-                ws_sdp[f'E{sdp_row}'] = round(surface_demolie_reconstruite, 4) if surface_demolie_reconstruite > 0 else ""
-                ws_sdp[f'F{sdp_row}'] = round(surface_supprimee, 4) if surface_supprimee > 0 else ""
-                ws_sdp[f'G{sdp_row}'] = round(surface_supprimee_changement, 4) if surface_supprimee_changement > 0 else ""
-                ws_sdp[f'H{sdp_row}'] = round(surface_projet, 4) if surface_projet > 0 else ""
-                ws_sdp[f'I{sdp_row}'] = round(surface_rdv, 4) if surface_rdv > 0 else ""
-                
-                # Appliquer le style aux cellules
-                data_font = Font(name='Arial', size=12)
-                data_alignment = Alignment(horizontal='center', vertical='center')
-                
-                for col in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I']:
-                    cell = ws_sdp[f'{col}{sdp_row}']
-                    cell.font = data_font
-                    cell.alignment = data_alignment
-                    cell.border = border
-                
-                sdp_row += 1
-            
-            # Créer une nouvelle feuille nommée "TA Existant" avec la même structure que "TA Projet"
-            ws_ta_existant = wb.create_sheet(title="TA Existant")
-            
-            # En-têtes pour la feuille TA Existant (même structure que TA Projet)
-            ws_ta_existant['A1'] = "Étages"
-            ws_ta_existant['B1'] = "Destinations"
-            ws_ta_existant['C1'] = "TA avant déduction"
-            ws_ta_existant['D1'] = "Vides"
-            ws_ta_existant['E1'] = "Surfaces dont h < 1.80m"
-            ws_ta_existant['F1'] = "TA après déduction"
-            
-            # Appliquer le style aux en-têtes
-            for col in ['A', 'B', 'C', 'D', 'E', 'F']:
-                cell = ws_ta_existant[f'{col}1']
-                cell.font = header_font
-                cell.alignment = header_alignment
-                cell.border = border
-                ws_ta_existant.column_dimensions[col].width = 15  # Ajuster la largeur des colonnes
-            
-            # Traiter les données pour la feuille "TA Existant" (basé sur existant.dxf)
-            # Nous utilisons les polylignes existantes qui sont dans le fichier existant.dxf
-            # Filtrer les polylignes principales et spéciales pour existant.dxf
-            main_existant_polylines = [p for p in existant_polylines if is_main_sdp_polyline(p)]
-            special_existant_polylines = [p for p in existant_polylines if is_special_polyline(p)]
-            
-            # Collecter toutes les destinations des polylignes principales
-            all_existant_destinations = set()
-            for polyline in main_existant_polylines:
-                destination = get_destination_from_layer(polyline.get('layer', ''))
-                if destination:
-                    all_existant_destinations.add(destination)
-            
-            # Dictionnaire pour stocker les données T.A. Existant par destination
-            ta_existant_data = {}
-            
-            # Calculer les données T.A. Existant pour chaque destination
-            for destination in all_existant_destinations:
-                # Initialiser les valeurs pour cette destination
-                planchers_avant_deductions = 0.0  # Planchers avant déductions
-                vides = 0.0                       # Vides (stairwells, elevator shafts, etc.)
-                surfaces_h_moins_180 = 0.0        # Surfaces dont h < 1.80m
-                
-                # Calculer Planchers avant déductions - utiliser les surfaces principales
-                for polyline in main_existant_polylines:
-                    if get_destination_from_layer(polyline.get('layer', '')) == destination:
-                        # Calculer la surface de cette polyligne
-                        area = calculate_polyline_area(polyline)
-                        planchers_avant_deductions += area
-                
-                # Identifier les vides (GEX_EDS_SDP_2 - TREMIE)
-                for polyline in special_existant_polylines:
-                    special_layer = polyline.get('layer', '')
-                    if not isinstance(special_layer, str):
-                        continue
-                    
-                    if 'GEX_EDS_SDP_2' in special_layer:  # Vides/TREMIE
-                        # Calculer l'intersection avec les polylignes de cette destination
-                        destination_polylines = [p for p in main_existant_polylines if get_destination_from_layer(p.get('layer', '')) == destination]
-                        
-                        for main_polyline in destination_polylines:
-                            # Calculer l'aire d'intersection avec méthode améliorée
-                            intersection_area = calculate_intersection_area(polyline, main_polyline)
-                            if intersection_area > 0:
-                                vides += intersection_area
-                
-                # Identifier les surfaces dont h < 1.80m (GEX_EDS_SDP_3 - H-180)
-                for polyline in special_existant_polylines:
-                    special_layer = polyline.get('layer', '')
-                    if not isinstance(special_layer, str):
-                        continue
-                    
-                    if 'GEX_EDS_SDP_3' in special_layer:  # H-180
-                        # Calculer l'intersection avec les polylignes de cette destination
-                        destination_polylines = [p for p in main_existant_polylines if get_destination_from_layer(p.get('layer', '')) == destination]
-                        
-                        for main_polyline in destination_polylines:
-                            # Calculer l'aire d'intersection avec méthode améliorée
-                            intersection_area = calculate_intersection_area(polyline, main_polyline)
-                            if intersection_area > 0:
-                                surfaces_h_moins_180 += intersection_area
-                
-                # Calculer le TOTAL T.A.
-                total_ta = planchers_avant_deductions - (vides + surfaces_h_moins_180)
-                
-                # S'assurer que le total n'est pas négatif
-                total_ta = max(0, total_ta)
-                
-                # Stocker les données pour cette destination
-                ta_existant_data[destination] = {
-                    'planchers_avant_deductions': planchers_avant_deductions,
-                    'vides': vides,
-                    'surfaces_h_moins_180': surfaces_h_moins_180,
-                    'total_ta': total_ta
-                }
-            
-            # Ajouter les données T.A. Existant à la feuille TA Existant
-            ta_existant_row = 2
-            ws_ta_existant[f'A{ta_existant_row}'] = floor_name
-            
-            # Appliquer le style à la cellule de l'étage
-            cell = ws_ta_existant[f'A{ta_existant_row}']
-            cell.font = data_font
-            cell.alignment = data_alignment
-            cell.border = border
-            
-            for destination in sorted(all_existant_destinations):
-                # Formater le nom de la destination pour une meilleure lisibilité
-                formatted_destination = special_cases.get(destination, destination.replace('_', ' ').lower().capitalize())
-                
-                # Colonne B: Destination
-                ws_ta_existant[f'B{ta_existant_row}'] = formatted_destination
-                cell = ws_ta_existant[f'B{ta_existant_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Récupérer les données T.A. pour cette destination
-                destination_ta_data = ta_existant_data.get(destination, {})
-                
-                # Colonne C: TA avant déduction
-                planchers_avant_deductions = destination_ta_data.get('planchers_avant_deductions', 0)
-                ws_ta_existant[f'C{ta_existant_row}'] = round(planchers_avant_deductions, 4) if planchers_avant_deductions > 0 else 0
-                cell = ws_ta_existant[f'C{ta_existant_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne D: Vides
-                vides = destination_ta_data.get('vides', 0)
-                excel_vides_value = round(vides, 4) if vides > 0 else 0
-                ws_ta_existant[f'D{ta_existant_row}'] = excel_vides_value
-                cell = ws_ta_existant[f'D{ta_existant_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne E: Surfaces dont h < 1.80m
-                surfaces_h_moins_180 = destination_ta_data.get('surfaces_h_moins_180', 0)
-                excel_h180_value = round(surfaces_h_moins_180, 4) if surfaces_h_moins_180 > 0 else 0
-                ws_ta_existant[f'E{ta_existant_row}'] = excel_h180_value
-                cell = ws_ta_existant[f'E{ta_existant_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Colonne F: TA après déduction
-                total_ta = destination_ta_data.get('total_ta', 0)
-                ws_ta_existant[f'F{ta_existant_row}'] = round(total_ta, 4) if total_ta > 0 else 0
-                cell = ws_ta_existant[f'F{ta_existant_row}']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-                
-                # Ajouter un commentaire expliquant le calcul
-                comment = Comment(f"TA après déduction = TA avant déduction - (Vides + Surfaces dont h < 1.80m)", "Calcul T.A.")
-                comment.width = 300
-                comment.height = 50
-                cell.comment = comment
-                
-                ta_existant_row += 1
-            
-            # Créer une nouvelle feuille nommée "TA Summary"
-            ws_ta_summary = wb.create_sheet(title="TA Summary")
-            
-            # En-têtes pour la feuille TA Summary avec les nouvelles colonnes demandées
-            ws_ta_summary['A1'] = "Étages"
-            ws_ta_summary['B1'] = "TA Existant"
-            ws_ta_summary['C1'] = "TA Projet"
-            ws_ta_summary['D1'] = "TA créé"
-            ws_ta_summary['E1'] = "TA démoli/reconstruit"
-            ws_ta_summary['F1'] = "TA supprimé"
-            
-            # Appliquer le style aux en-têtes
-            for col in ['A', 'B', 'C', 'D', 'E', 'F']:
-                cell = ws_ta_summary[f'{col}1']
-                cell.font = header_font
-                cell.alignment = header_alignment
-                cell.border = border
-                ws_ta_summary.column_dimensions[col].width = 18  # Ajuster la largeur des colonnes
-            
-            # Calculer les totaux pour le résumé
-            # Calculer le total de TA Existant à partir de la feuille TA Existant
-            ta_existant_total = 0
-            for destination in all_existant_destinations:
-                destination_ta_data = ta_existant_data.get(destination, {})
-                total_ta = destination_ta_data.get('total_ta', 0)
-                ta_existant_total += total_ta
-            
-            # Calculer le total de TA Projet à partir de la feuille TA Projet
-            ta_projet_total = 0
-            for destination in all_destinations:
-                destination_ta_data = ta_data.get(destination, {})
-                total_ta = destination_ta_data.get('total_ta', 0)
-                ta_projet_total += total_ta
-            
-            # Calculer les autres métriques de comparaison
-            # TA créé - nouvelles surfaces (différence positive entre projet et existant)
-            ta_cree_total = max(0, ta_projet_total - ta_existant_total)
-            
-            # TA démoli/reconstruit - zones démolies qui sont reconstruites
-            ta_demoli_reconstruit_total = 0
-            for destination in all_destinations:
-                ta_demoli_reconstruit = calculation_results['demolition'].get(destination, 0)
-                ta_demoli_reconstruit_total += ta_demoli_reconstruit
-            
-            # TA supprimé - zones existantes qui ne sont plus présentes dans le projet
-            # et qui ne sont pas reconstruites
-            ta_supprime_total = max(0, ta_existant_total - ta_projet_total + ta_demoli_reconstruit_total)
-            if ta_supprime_total < 0.01:  # Éviter les valeurs négligeables dues aux erreurs d'arrondi
-                ta_supprime_total = 0
-                
-            # Journaliser les totaux calculés pour débogage
-            logger.info(f"TA Existant total: {ta_existant_total}")
-            logger.info(f"TA Projet total: {ta_projet_total}")
-            logger.info(f"TA créé total: {ta_cree_total}")
-            logger.info(f"TA démoli/reconstruit total: {ta_demoli_reconstruit_total}")
-            logger.info(f"TA supprimé total: {ta_supprime_total}")
-            
-            # Ajouter les données à la feuille TA Summary
-            ws_ta_summary['A2'] = floor_name
-            ws_ta_summary['B2'] = round(ta_existant_total, 4) if ta_existant_total > 0 else 0
-            ws_ta_summary['C2'] = round(ta_projet_total, 4) if ta_projet_total > 0 else 0
-            ws_ta_summary['D2'] = round(ta_cree_total, 4) if ta_cree_total > 0 else 0
-            ws_ta_summary['E2'] = round(ta_demoli_reconstruit_total, 4) if ta_demoli_reconstruit_total > 0 else 0
-            ws_ta_summary['F2'] = round(ta_supprime_total, 4) if ta_supprime_total > 0 else 0
-            
-            # Ajouter des commentaires expliquant les calculs
-            comment_cree = Comment(f"TA créé = TA Projet - TA Existant (si positif)", "Calcul TA créé")
-            comment_cree.width = 300
-            comment_cree.height = 50
-            ws_ta_summary['D2'].comment = comment_cree
-            
-            comment_supprime = Comment(f"TA supprimé = TA Existant - TA Projet + TA démoli/reconstruit (si positif)", "Calcul TA supprimé")
-            comment_supprime.width = 300
-            comment_supprime.height = 50
-            ws_ta_summary['F2'].comment = comment_supprime
-            
-            # Appliquer le style aux cellules
-            for col in ['A', 'B', 'C', 'D', 'E', 'F']:
-                cell = ws_ta_summary[f'{col}2']
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = border
-            
-            # No cell merging, etage name only appears in the first row
-            
-            # Sauvegarder le fichier Excel
-            wb.save(excel_path)
-            
-            logger.info(f"Fichier Excel créé avec succès: {excel_path}")
+            # Le calcul des surfaces et l'écriture du classeur sont exécutés dans le pool de processus
+            if return_file:
+                content = process_pool.run(build_excel_bytes, surfaces, floor_name, overlay_mode, owner=email)
+            else:
+                process_pool.run(build_excel_workbook, surfaces, floor_name, excel_path, overlay_mode, owner=email)
+        except TaskTimeoutError as e:
+            logger.error(f"Délai dépassé lors de la génération du fichier Excel: {str(e)}")
+            return jsonify({'error': f'Délai dépassé lors de la génération du fichier Excel: {str(e)}'}), 504
         except Exception as e:
             logger.error(f"Erreur lors de la génération du fichier Excel: {str(e)}")
             return jsonify({'error': f'Erreur lors de la génération du fichier Excel: {str(e)}'}), 500
         
+        if return_file:
+            # Le classeur part directement depuis la mémoire, l'enregistrement se fait en arrière-plan
+            persist_file_async(content, excel_path)
+            response = send_file(
+                io.BytesIO(content),
+                as_attachment=True,
+                download_name=excel_filename,
+                mimetype=XLSX_MIMETYPE
+            )
+            response.headers['X-File-Path'] = quote_header_path(excel_path)
+            return response
+        
         # Réponse finale
         return jsonify({
             'message': 'Fichier Excel généré avec succès',
@@ -2257,6 +1357,358 @@ def generate_excel_file():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'Erreur lors de la génération du fichier Excel: {str(e)}'}), 500
 
+def generate_report_files():
+    """
+    Génère le fichier visa et le classeur Excel d'un étage en un seul calcul.
+    
+    Même corps que /generate-excel-file. Le moteur de surfaces est exécuté une seule fois
+    dans le pool de processus ; le visa et le classeur sont rendus à partir du même résultat
+    et écrits en parallèle.
+    """
+    logger.info("Requête POST reçue pour générer le visa et le fichier Excel")
+    
+    try:
+        data = request.get_json() or {}
+        email = data.get('email', '')
+        surfaces = data.get('surfaces')
+        floor_name = data.get('floorName') or 'Sans nom'
+        folder_path = data.get('folderPath', '')
+        
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        if not isinstance(surfaces, dict) or not surfaces:
+            logger.error("Données des surfaces non fournies")
+            return jsonify({'error': 'Données des surfaces non fournies'}), 400
+        
+        try:
+            overlay_mode = resolve_overlay_mode(data.get('overlayMode'))
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            normalize_surface_polylines(surfaces)
+        except ValueError as e:
+            logger.error(f"Polylignes invalides: {str(e)}")
+            return jsonify({'error': f'Polylignes invalides: {str(e)}'}), 400
+        output_dir = prepare_output_dir(email, folder_path)
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la validation des données: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la validation des données: {str(e)}'}), 500
+    
+    try:
+        results = process_pool.run(compute_floor_surfaces, surfaces, floor_name, overlay_mode, owner=email)
+    except TaskTimeoutError as e:
+        logger.error(f"Délai dépassé lors du calcul des surfaces: {str(e)}")
+        return jsonify({'error': f'Délai dépassé lors du calcul des surfaces: {str(e)}'}), 504
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des surfaces: {str(e)}")
+        return jsonify({'error': f'Erreur lors du calcul des surfaces: {str(e)}'}), 500
+    
+    try:
+        sanitized_floor_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in floor_name)
+        date_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        excel_path = os.path.join(output_dir, f"surface_comparison_{sanitized_floor_name}_{date_str}.xlsx")
+        visa_path = os.path.join(output_dir, f"visa_{floor_name.replace(' ', '_')}.txt")
+        
+        def write_visa():
+            visa_renderer.write([visa_context(surfaces, floor_name, results)], visa_path)
+        
+        # Les deux fichiers sont écrits en parallèle à partir du même résultat
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='report-files') as executor:
+            writes = [executor.submit(write_surface_workbook, [results], excel_path), executor.submit(write_visa)]
+            for write in writes:
+                write.result()
+        
+        logger.info(f"Visa et fichier Excel générés avec succès: {visa_path}, {excel_path}")
+        return jsonify({
+            'message': 'Fichiers visa et Excel générés avec succès',
+            'filePath': excel_path,
+            'visaFilePath': visa_path
+        }), 201
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture des fichiers visa et Excel: {str(e)}")
+        return jsonify({'error': f"Erreur lors de l'écriture des fichiers visa et Excel: {str(e)}"}), 500
+
+def generate_project_excel_file():
+    """
+    Génère le classeur Excel et le fichier visa d'un projet complet (tous ses étages).
+    
+    Les étages sont calculés en parallèle dans le pool de processus, puis réunis dans un
+    seul classeur (une ligne ou un bloc par étage, dans l'ordre de la requête) et un seul
+    rapport visa.
+    """
+    logger.info("Requête POST reçue pour générer le fichier Excel d'un projet")
+    
+    try:
+        data = request.get_json() or {}
+        email = data.get('email', '')
+        floors = data.get('floors')
+        folder_path = data.get('folderPath', '')
+        project_name = data.get('projectName') or folder_path or 'projet'
+        
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        if not isinstance(floors, list) or not floors:
+            logger.error("Liste des étages non fournie")
+            return jsonify({'error': 'Liste des étages requise'}), 400
+        
+        if len(floors) > MAX_PROJECT_FLOORS:
+            return jsonify({'error': f"Trop d'étages : {len(floors)} (maximum {MAX_PROJECT_FLOORS})"}), 400
+        
+        try:
+            overlay_mode = resolve_overlay_mode(data.get('overlayMode'))
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({'error': str(e)}), 400
+        
+        for position, floor in enumerate(floors):
+            if not isinstance(floor, dict) or not isinstance(floor.get('surfaces'), dict) or not floor['surfaces']:
+                return jsonify({'error': f"Données des surfaces non fournies pour l'étage {position + 1}"}), 400
+            try:
+                normalize_surface_polylines(floor['surfaces'])
+            except ValueError as e:
+                logger.error(f"Polylignes invalides pour l'étage {position + 1}: {str(e)}")
+                return jsonify({'error': f"Polylignes invalides pour l'étage {position + 1}: {str(e)}"}), 400
+        
+        output_dir = prepare_output_dir(email, folder_path)
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la validation des données du projet: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la validation des données du projet: {str(e)}'}), 500
+    
+    # Un calcul par étage, répartis sur les processus du pool
+    floor_names = [floor.get('floorName') or f"Étage {position + 1}" for position, floor in enumerate(floors)]
+    tasks = [process_pool.submit(compute_floor_surfaces, floor['surfaces'], floor_name, overlay_mode, owner=email)
+             for floor, floor_name in zip(floors, floor_names)]
+    logger.info(f"Projet {project_name}: {len(tasks)} étages soumis au pool de processus")
+    
+    try:
+        # Délai global : le premier étage en échec ou le dépassement interrompt l'attente
+        for task in as_completed(tasks, timeout=PROJECT_TIMEOUT):
+            task.result()
+        computed = [task.result() for task in tasks]
+    except TimeoutError:
+        remaining = sum(1 for task in tasks if not task.done())
+        logger.error(f"Délai de {PROJECT_TIMEOUT:g} s dépassé pour le projet {project_name}: "
+                     f"{remaining} étages non calculés")
+        return jsonify({'error': f'Délai de {PROJECT_TIMEOUT:g} s dépassé lors du calcul des étages du projet '
+                                 f'({remaining} étages sur {len(tasks)} non calculés)'}), 504
+    except TaskTimeoutError as e:
+        logger.error(f"Délai dépassé lors du calcul des étages du projet: {str(e)}")
+        return jsonify({'error': f'Délai dépassé lors du calcul des étages du projet: {str(e)}'}), 504
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des étages du projet: {str(e)}")
+        return jsonify({'error': f'Erreur lors du calcul des étages du projet: {str(e)}'}), 500
+    finally:
+        # Un étage en échec : les calculs restants sont abandonnés
+        for task in tasks:
+            if not task.done():
+                process_pool.cancel(task.id)
+    
+    try:
+        sanitized_project_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in project_name)
+        date_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        excel_path = os.path.join(output_dir, f"surface_comparison_projet_{sanitized_project_name}_{date_str}.xlsx")
+        visa_path = os.path.join(output_dir, f"visa_projet_{sanitized_project_name}_{date_str}.txt")
+        
+        write_surface_workbook(computed, excel_path)
+        # Rapport visa écrit étage par étage, sans construire le texte complet
+        visa_renderer.write((visa_context(floor['surfaces'], results.floor_name, results)
+                             for floor, results in zip(floors, computed)), visa_path)
+        
+        logger.info(f"Fichiers du projet générés avec succès: {excel_path}, {visa_path}")
+        return jsonify({
+            'message': 'Fichiers du projet générés avec succès',
+            'filePath': excel_path,
+            'visaFilePath': visa_path,
+            'floors': floor_names
+        }), 201
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture des fichiers du projet: {str(e)}")
+        return jsonify({'error': f"Erreur lors de l'écriture des fichiers du projet: {str(e)}"}), 500
+
+def run_surface_report_job(payload):
+    """
+    Exécute une tâche de rapport de surfaces : classeur Excel et, sur demande, fichier visa.
+    
+    Une donnée invalide échouerait de la même façon à chaque essai : elle lève JobError
+    (échec immédiat) au lieu d'une exception ordinaire, réessayée par la file.
+    """
+    if not payload.get('email'):
+        raise JobError("Email non fourni")
+    if not isinstance(payload.get('surfaces'), dict) or not payload['surfaces']:
+        raise JobError("Données des surfaces non fournies")
+    floor_name = payload.get('floorName') or 'Sans nom'
+    if not isinstance(floor_name, str):
+        raise JobError("Nom d'étage invalide")
+    try:
+        overlay_mode = resolve_overlay_mode(payload.get('overlayMode'))
+        surfaces = normalize_surface_polylines(payload['surfaces'])
+    except ValueError as e:
+        raise JobError(str(e))
+    
+    output_dir = prepare_output_dir(payload['email'], payload.get('folderPath', ''))
+    sanitized_floor_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in floor_name)
+    date_str = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    artifacts = {'excel': os.path.join(output_dir, f"surface_comparison_{sanitized_floor_name}_{date_str}.xlsx")}
+    
+    process_pool.run(build_excel_workbook, surfaces, floor_name, artifacts['excel'], overlay_mode,
+                     timeout=REPORT_JOB_TIMEOUT, wait_timeout=REPORT_JOB_TIMEOUT, owner=payload['email'])
+    
+    if payload.get('visa'):
+        artifacts['visa'] = os.path.join(output_dir, f"visa_{floor_name.replace(' ', '_')}.txt")
+        visa_renderer.write([visa_context(surfaces, floor_name)], artifacts['visa'])
+    
+    return {'artifacts': artifacts}
+
+report_jobs.register('surface_report', run_surface_report_job)
+
+def describe_report_job(job):
+    """Description d'une tâche de rapport renvoyée au client (noms des fichiers produits, sans leurs chemins)"""
+    description = {key: job[key] for key in ('id', 'status', 'attempts', 'maxAttempts', 'createdAt', 'updatedAt')}
+    description['error'] = job['error']
+    if job['status'] == JOB_DONE and job['result']:
+        description['artifacts'] = sorted(job['result'].get('artifacts', {}))
+    return description
+
+def submit_report_job():
+    """
+    Met en file une tâche de rapport de surfaces et retourne son identifiant.
+    
+    Le corps est celui de /generate-excel-file, avec 'visa': true pour produire aussi le
+    fichier visa. L'état se consulte sur /report-jobs/<id>, les fichiers se téléchargent
+    sur /report-jobs/<id>/artifacts/<excel|visa> une fois la tâche terminée.
+    """
+    logger.info("Requête POST reçue pour créer une tâche de rapport")
+    
+    try:
+        data = request.get_json() or {}
+        email = data.get('email')
+        surfaces = data.get('surfaces')
+        
+        if not email:
+            logger.error("Email non fourni dans la requête")
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        if not isinstance(surfaces, dict) or not surfaces:
+            logger.error("Données des surfaces non fournies")
+            return jsonify({'error': 'Données des surfaces non fournies'}), 400
+        
+        try:
+            resolve_overlay_mode(data.get('overlayMode'))
+            # Vérification seule : la charge utile stockée garde les polylignes telles que reçues
+            normalize_surface_polylines({side: dict(section) if isinstance(section, dict) else section
+                                         for side, section in surfaces.items()})
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        payload = {
+            'email': email,
+            'surfaces': surfaces,
+            'floorName': data.get('floorName', 'Sans nom'),
+            'folderPath': data.get('folderPath', ''),
+            'overlayMode': data.get('overlayMode'),
+            'visa': bool(data.get('visa', False))
+        }
+        job = report_jobs.submit('surface_report', email, payload)
+        return jsonify(dict(describe_report_job(job), statusUrl=f"/report-jobs/{job['id']}")), 202
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la création de la tâche de rapport: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la création de la tâche de rapport: {str(e)}'}), 500
+
+def get_report_job(job_id):
+    """Retourne l'état d'une tâche de rapport de l'utilisateur"""
+    try:
+        email = request.args.get('email')
+        if not email:
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        job = report_jobs.get(job_id, owner=email)
+        if job is None:
+            return jsonify({'error': f'Tâche {job_id} introuvable'}), 404
+        return jsonify(describe_report_job(job)), 200
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la tâche {job_id}: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la lecture de la tâche: {str(e)}'}), 500
+
+def follow_report_job(job_id):
+    """
+    Suit une tâche de rapport : flux NDJSON avec une ligne à chaque changement d'état,
+    terminé quand la tâche est terminée ou en échec, ou au plus tard après REPORT_JOB_FOLLOW_TIMEOUT
+    secondes (la première ligne donne toujours l'état courant, le client se reconnecte pour la suite).
+    """
+    email = request.args.get('email')
+    if not email:
+        return jsonify({'error': 'Email non fourni'}), 400
+    
+    job = report_jobs.get(job_id, owner=email)
+    if job is None:
+        return jsonify({'error': f'Tâche {job_id} introuvable'}), 404
+    
+    def generate(job):
+        deadline = time.monotonic() + REPORT_JOB_FOLLOW_TIMEOUT
+        last = None
+        while True:
+            description = describe_report_job(job)
+            state = (description['status'], description['attempts'])
+            if state != last:
+                last = state
+                yield json.dumps(description) + "\n"
+            if description['status'] in TERMINAL_STATES or time.monotonic() >= deadline:
+                return
+            time.sleep(min(report_jobs.poll_interval, max(0.0, deadline - time.monotonic())))
+            job = report_jobs.get(job_id, owner=email)
+            if job is None:
+                return
+    
+    return Response(stream_with_context(generate(job)), mimetype='application/x-ndjson')
+
+def download_report_job_artifact(job_id, artifact):
+    """Télécharge un fichier produit par une tâche de rapport terminée (excel ou visa)"""
+    try:
+        email = request.args.get('email')
+        if not email:
+            return jsonify({'error': 'Email non fourni'}), 400
+        
+        job = report_jobs.get(job_id, owner=email)
+        if job is None:
+            return jsonify({'error': f'Tâche {job_id} introuvable'}), 404
+        if job['status'] != JOB_DONE:
+            return jsonify({'error': f"La tâche {job_id} n'est pas terminée (état: {job['status']})"}), 409
+        
+        file_path = (job['result'] or {}).get('artifacts', {}).get(artifact)
+        if not file_path or not os.path.exists(file_path):
+            return jsonify({'error': f'Fichier {artifact} introuvable pour la tâche {job_id}'}), 404
+        
+        return send_file(
+            file_path,
+            as_attachment=True,
+            download_name=os.path.basename(file_path),
+            mimetype=XLSX_MIMETYPE if artifact == 'excel' else 'text/plain'
+        )
+    
+    except Exception as e:
+        logger.error(f"Erreur lors du téléchargement du fichier de la tâche {job_id}: {str(e)}")
+        return jsonify({'error': f'Erreur lors du téléchargement du fichier: {str(e)}'}), 500
+
+def get_report_jobs_stats():
+    """Retourne le nombre de tâches de rapport par état et la configuration de la file"""
+    try:
+        return jsonify(report_jobs.metrics()), 200
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture des statistiques des tâches: {str(e)}")
+        return jsonify({'error': f'Erreur lors de la lecture des statistiques des tâches: {str(e)}'}), 500
+
 def download_excel_file():
     """Permet le téléchargement d'un fichier Excel"""
     logger.info("Requête GET reçue pour télécharger un fichier Excel")
@@ -2357,185 +1809,15 @@ def download_excel_file():
         logger.error(f"Erreur lors du téléchargement du fichier Excel: {str(e)}")
         return jsonify({'error': f'Erreur lors du téléchargement du fichier: {str(e)}'}), 500
 
-def generate_visa_content(surfaces, floor_name):
-    """Génère le contenu du fichier visa.txt avec tous les détails des calculs et des éléments"""
-    now = datetime.datetime.now()
-    content = [
-        "=" * 80,
-        f"RAPPORT DÉTAILLÉ DE CALCUL DE SURFACE - {floor_name}",
-        "=" * 80,
-        f"Date de génération: {now.strftime('%d/%m/%Y %H:%M:%S')}",
-        f"Étage/Niveau: {floor_name}",
-        "",
-        "RÉSUMÉ DES SURFACES:",
-        "-" * 50
-    ]
-    
-    projet_surface = surfaces.get('projet', {}).get('surface', 0)
-    content.append(f"Surface PROJET:\t\t{projet_surface:.2f} m²")
-    
-    existant_surface = surfaces.get('existant', {}).get('surface', 0)
-    content.append(f"Surface EXISTANT:\t{existant_surface:.2f} m²")
-    
-    difference = surfaces.get('difference', 0)
-    if existant_surface > 0:
-        perc_diff = difference / existant_surface * 100
-        content.append(f"DIFFÉRENCE:\t\t{difference:.2f} m² ({'+' if difference > 0 else ''}{perc_diff:.2f}% par rapport à l'existant)")
-    else:
-        content.append(f"DIFFÉRENCE:\t\t{difference:.2f} m²")
-    content.append(f"IMPACT:\t\t\t{'Agrandissement' if difference > 0 else 'Réduction' if difference < 0 else 'Pas de changement'}")
-    
-    if projet_surface > 0 and surfaces.get('projet', {}).get('details', {}).get('polylines', 0) > 0:
-        densite_projet = projet_surface / surfaces['projet']['details']['polylines']
-        content.append(f"DENSITÉ PROJET:\t{densite_projet:.2f} m²/élément")
-    if existant_surface > 0 and surfaces.get('existant', {}).get('details', {}).get('polylines', 0) > 0:
-        densite_existant = existant_surface / surfaces['existant']['details']['polylines']
-        content.append(f"DENSITÉ EXISTANT:\t{densite_existant:.2f} m²/élément")
-    
-    content.append("")
-    content.append("ANALYSE COMPARATIVE DÉTAILLÉE:")  
-    content.append("-" * 50)
-    
-    if projet_surface > 0 and existant_surface > 0:
-        if difference > 0:
-            content.append(f"Détails de l'agrandissement: {difference:.2f} m² ajoutés par rapport à l'existant")
-            content.append(f"Ratio surface projet/existant: {projet_surface/existant_surface:.2f}")
-            content.append(f"Pourcentage d'augmentation: {perc_diff:.2f}%")
-            proj_elems = surfaces.get('projet', {}).get('details', {}).get('polylines', 0) + surfaces.get('projet', {}).get('details', {}).get('circles', 0)
-            exist_elems = surfaces.get('existant', {}).get('details', {}).get('polylines', 0) + surfaces.get('existant', {}).get('details', {}).get('circles', 0)
-            if proj_elems > exist_elems:
-                content.append(f"Surface moyenne ajoutée par nouvel élément: {difference / (proj_elems - exist_elems):.2f} m²")
-            
-        elif difference < 0:
-            content.append(f"Détails de la réduction: {abs(difference):.2f} m² supprimés par rapport à l'existant")
-            content.append(f"Ratio surface projet/existant: {projet_surface/existant_surface:.2f}")
-            content.append(f"Pourcentage de diminution: {abs(perc_diff):.2f}%")
-            proj_elems = surfaces.get('projet', {}).get('details', {}).get('polylines', 0) + surfaces.get('projet', {}).get('details', {}).get('circles', 0)
-            exist_elems = surfaces.get('existant', {}).get('details', {}).get('polylines', 0) + surfaces.get('existant', {}).get('details', {}).get('circles', 0)
-            if exist_elems > proj_elems:
-                content.append(f"Surface moyenne réduite par élément supprimé: {abs(difference) / (exist_elems - proj_elems):.2f} m²")
-        else:
-            content.append("Les surfaces projet et existant sont identiques")
-            content.append("Aucune modification significative de la surface globale")
-            proj_elems = surfaces.get('projet', {}).get('details', {}).get('polylines', 0) + surfaces.get('projet', {}).get('details', {}).get('circles', 0)
-            exist_elems = surfaces.get('existant', {}).get('details', {}).get('polylines', 0) + surfaces.get('existant', {}).get('details', {}).get('circles', 0)
-            if proj_elems != exist_elems:
-                content.append(f"Bien que la surface totale soit identique, le nombre d'éléments a changé: {proj_elems - exist_elems:+d} éléments")
-    elif projet_surface > 0 and existant_surface == 0:
-        content.append(f"Nouvelle construction: {projet_surface:.2f} m² sans existant précédent")
-        proj_elems = surfaces.get('projet', {}).get('details', {}).get('polylines', 0) + surfaces.get('projet', {}).get('details', {}).get('circles', 0)
-        if proj_elems > 0:
-            content.append(f"Surface moyenne par élément: {projet_surface / proj_elems:.2f} m²")
-    elif projet_surface == 0 and existant_surface > 0:
-        content.append(f"Démolition complète: {existant_surface:.2f} m² de surface existante")
-        exist_elems = surfaces.get('existant', {}).get('details', {}).get('polylines', 0) + surfaces.get('existant', {}).get('details', {}).get('circles', 0)
-        if exist_elems > 0:
-            content.append(f"Surface moyenne par élément supprimé: {existant_surface / exist_elems:.2f} m²")
-        
-    content.append("")
-    content.append("INVENTAIRE DÉTAILLÉ DES ÉLÉMENTS:")
-    content.append("-" * 50)
-    
-    if surfaces.get('projet', {}).get('details'):
-        projet_details = surfaces['projet']['details']
-        content.append("PROJET:")
-        content.append(f"  - Nombre total de polylignes: {projet_details.get('polylines', 0)}")
-        content.append(f"  - Nombre total de cercles: {projet_details.get('circles', 0)}")
-        content.append(f"  - Nombre total d'éléments: {projet_details.get('polylines', 0) + projet_details.get('circles', 0)}")
-        if 'polylines' in projet_details and projet_details['polylines'] > 0:
-            content.append(f"  - Surface moyenne par polyligne: {projet_surface / projet_details['polylines']:.2f} m² (si répartition uniforme)")
-        
-        content.append("  - Types d'éléments: Polylignes fermées (surfaces), cercles")
-        if projet_details.get('polylines', 0) > 0 and projet_details.get('circles', 0) > 0:
-            content.append(f"  - Ratio polylignes/cercles: {projet_details.get('polylines', 0) / projet_details.get('circles', 1):.2f}")
-        
-    if surfaces.get('existant', {}).get('details'):
-        existant_details = surfaces['existant']['details']
-        content.append("\nEXISTANT:")
-        content.append(f"  - Nombre total de polylignes: {existant_details.get('polylines', 0)}")
-        content.append(f"  - Nombre total de cercles: {existant_details.get('circles', 0)}")
-        content.append(f"  - Nombre total d'éléments: {existant_details.get('polylines', 0) + existant_details.get('circles', 0)}")
-        if 'polylines' in existant_details and existant_details['polylines'] > 0:
-            content.append(f"  - Surface moyenne par polyligne: {existant_surface / existant_details['polylines']:.2f} m² (si répartition uniforme)")
-        
-        content.append("  - Types d'éléments: Polylignes fermées (surfaces), cercles")
-        if existant_details.get('polylines', 0) > 0 and existant_details.get('circles', 0) > 0:
-            content.append(f"  - Ratio polylignes/cercles: {existant_details.get('polylines', 0) / existant_details.get('circles', 1):.2f}")
-    
-    if surfaces.get('projet', {}).get('details') and surfaces.get('existant', {}).get('details'):
-        projet_details = surfaces['projet']['details']
-        existant_details = surfaces['existant']['details']
-        
-        content.append("\nCOMPARAISON DES ÉLÉMENTS:")
-        poly_diff = projet_details.get('polylines', 0) - existant_details.get('polylines', 0)
-        circle_diff = projet_details.get('circles', 0) - existant_details.get('circles', 0)
-        total_elem_diff = poly_diff + circle_diff
-        
-        content.append(f"  - Différence en polylignes: {'+' if poly_diff > 0 else ''}{poly_diff}")
-        content.append(f"  - Différence en cercles: {'+' if circle_diff > 0 else ''}{circle_diff}")
-        content.append(f"  - Différence totale d'éléments: {'+' if total_elem_diff > 0 else ''}{total_elem_diff}")
-    
-    content.append("")
-    content.append("COMMENTAIRES ET OBSERVATIONS:")
-    content.append("-" * 50)
-    
-    if difference > 0:
-        content.append(f"- Ce calcul montre une augmentation de surface de {difference:.2f} m² ({perc_diff:.2f}% par rapport à l'existant).")
-        content.append("- Veuillez vérifier que cette augmentation est conforme aux règles d'urbanisme et aux limites de constructibilité.")
-        content.append(f"- Vérification recommandée: coefficient d'emprise au sol (CES) et coefficient d'occupation des sols (COS) du PLU.")
-        
-        content.append("- Points d'attention:")
-        content.append("  * Vérifier les calculs des droits à construire dans le cas d'une extension")
-        content.append("  * Contrôler la conformité avec les règles de constructibilité locales")
-        content.append("  * Confirmer la compatibilité avec les règles de gabarit et de prospect")
-        
-        if perc_diff > 20:
-            content.append(f"- ATTENTION: L'augmentation de surface de {perc_diff:.2f}% est significative et peut nécessiter ")
-            content.append("  des autorisations d'urbanisme spécifiques (permis de construire plutôt qu'une déclaration préalable).")
-        
-    elif difference < 0:
-        content.append(f"- Ce calcul montre une diminution de surface de {abs(difference):.2f} m² ({abs(perc_diff):.2f}% par rapport à l'existant).")
-        content.append("- Assurez-vous que cette réduction est voulue et qu'elle respecte les objectifs du projet.")
-        
-        content.append("- Points d'attention:")
-        content.append("  * Vérifier l'impact sur le fonctionnement des espaces")
-        content.append("  * Contrôler la conformité des nouveaux espaces avec les normes d'accessibilité")
-        content.append("  * Évaluer l'impact sur les calculs réglementaires (surface utile, surface taxable)")
-        
-        if abs(perc_diff) > 30:
-            content.append(f"- NOTE: La réduction importante de {abs(perc_diff):.2f}% peut indiquer une restructuration majeure")
-            content.append("  du bâtiment. Vérifiez l'exactitude des fichiers DXF et des éléments pris en compte.")
-    else:
-        content.append("- Les surfaces projet et existant sont identiques.")
-        content.append("- Aucun impact sur la surface totale.")
-        
-        proj_elems = surfaces.get('projet', {}).get('details', {}).get('polylines', 0) + surfaces.get('projet', {}).get('details', {}).get('circles', 0)
-        exist_elems = surfaces.get('existant', {}).get('details', {}).get('polylines', 0) + surfaces.get('existant', {}).get('details', {}).get('circles', 0)
-        if proj_elems != exist_elems:
-            content.append(f"- Bien que la surface totale soit inchangée, la répartition des espaces a été modifiée")
-            content.append("  (nombre d'éléments différent entre projet et existant).")
-            content.append("- Vérifier que cette redistribution respecte les exigences fonctionnelles du bâtiment.")
-        else:
-            content.append("- La structure du bâtiment semble inchangée (même nombre d'éléments).")
-            content.append("- Il peut s'agir d'une mise à jour du fichier sans modification structurelle.")
-    
-    content.append("")
-    content.append("RECOMMANDATIONS TECHNIQUES:")
-    content.append("-" * 50)
-    content.append("- Vérification de la cohérence des surfaces avec les autres documents du projet")
-    content.append("- Confirmation des calculs avec les surfaces mentionnées dans les dossiers administratifs")
-    content.append("- Évaluation de l'impact des modifications sur les performances énergétiques du bâtiment")
-    content.append("- Analyse des implications sur les évacuations et issues de secours (si applicable)")
-    
-    content.append("")
-    content.append("=" * 80)
-    content.append("INFORMATIONS LÉGALES:")
-    content.append("-" * 50)
-    content.append(f"Ce rapport a été généré automatiquement le {now.strftime('%d/%m/%Y')} à {now.strftime('%H:%M:%S')}")
-    content.append("Les calculs sont effectués sur la base des éléments fournis dans les fichiers DXF.")
-    content.append("Ces résultats doivent être vérifiés par un professionnel qualifié.")
-    content.append("")
-    return "\n".join(content)
+def generate_visa_content(surfaces, floor_name, results=None):
+    """
+    Génère le contenu du fichier visa.txt avec tous les détails des calculs et des éléments.
+    
+    Si results (FloorSurfaces du moteur de surfaces) est fourni, le rapport reprend aussi les
+    surfaces SDP par destination et les totaux T.A. du même calcul que le classeur Excel.
+    Pour écrire un rapport dans un fichier, visa_renderer.write évite de construire le texte complet.
+    """
+    return visa_renderer.render([visa_context(surfaces, floor_name, results)])
 
 def zero_small_heights(value):
     """Set height values less than 0.5 to 0 as they are negligible
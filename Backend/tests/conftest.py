@@ -0,0 +1,54 @@
+"""
+Shared fixtures of the backend test suite.
+
+Tests run against the services in-process: the process pool runs tasks
+inline and the extraction cache is off unless a test builds its own.
+"""
+
+import json
+import os
+import shutil
+import sys
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Read by the global service instances, so set before the application is imported
+os.environ['PROCESS_POOL_ENABLED'] = 'false'
+os.environ['EXTRACTION_CACHE_ENABLED'] = 'false'
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def load_fixture(name):
+    """Content of a JSON file of tests/fixtures."""
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='session')
+def client():
+    """Flask test client serving the folder service routes."""
+    from flask import Flask
+    from app.controllers.folder_service_routes import folder_service_blueprint
+
+    app = Flask('tests')
+    app.register_blueprint(folder_service_blueprint)
+    return app.test_client()
+
+
+@pytest.fixture
+def user_folder():
+    """Email and resource folder of a throwaway user, removed afterwards."""
+    resource_dir = os.path.join(BACKEND_DIR, 'app', 'Ressources')
+    created = not os.path.exists(resource_dir)
+    name = f"tests-{uuid.uuid4().hex[:8]}"
+    folder = os.path.join(resource_dir, name)
+    yield f"{name}@example.com", folder
+    shutil.rmtree(folder, ignore_errors=True)
+    if created and os.path.isdir(resource_dir) and not os.listdir(resource_dir):
+        os.rmdir(resource_dir)
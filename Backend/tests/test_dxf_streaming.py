@@ -0,0 +1,80 @@
+"""Streaming extraction must return exactly what the full ezdxf extraction returns."""
+
+import ezdxf
+import pytest
+
+from app.services.dxf_source import DxfSource
+from app.services.dxf_streaming import EXTRACTION_MODE_FULL, EXTRACTION_MODE_STREAMING
+from app.services.extraction_profiles import EXTRACTION_PROFILES, resolve_extraction_profile
+from app.services.polyline_set import serialize_extraction_result
+from folder_service import extract_source_data
+
+DXF_VERSIONS = ('R12', 'R2000', 'R2010', 'R2018')
+
+PROFILES = {
+    'full': None,
+    'surfaces': EXTRACTION_PROFILES['surfaces'],
+    'layers': resolve_extraction_profile('full', 'ANNOTATIONS,GEX_EDS_SDP_2-*')
+}
+
+
+def build_drawing(version, path):
+    """Drawing with every extracted entity type, plus entities that must be left out."""
+    doc = ezdxf.new(version)
+    doc.layers.add('GEX_EDS_SDP_1-HABITATION_L', color=3)
+    doc.layers.add('GEX_EDS_SDP_2-TREMIE', color=5)
+    doc.layers.add('ANNOTATIONS', color=7)
+    msp = doc.modelspace()
+
+    room = [(0, 0), (10.25, 0), (10.25, 8.5), (0, 8.5)]
+    opening = [(1, 1), (3, 1), (3, 2.75)]
+    if version == 'R12':
+        msp.add_polyline2d(room, close=True, dxfattribs={'layer': 'GEX_EDS_SDP_1-HABITATION_L'})
+        msp.add_polyline2d(opening, dxfattribs={'layer': 'GEX_EDS_SDP_2-TREMIE', 'color': 1})
+    else:
+        msp.add_lwpolyline(room, close=True, dxfattribs={'layer': 'GEX_EDS_SDP_1-HABITATION_L', 'lineweight': 35})
+        msp.add_lwpolyline(opening, dxfattribs={'layer': 'GEX_EDS_SDP_2-TREMIE', 'color': 1})
+        msp.add_polyline2d([(20, 0), (25, 0), (25, 5)], close=True, dxfattribs={'layer': 'GEX_EDS_SDP_2-TREMIE'})
+    msp.add_line((0, 0), (5, 5), dxfattribs={'layer': 'ANNOTATIONS'})
+    msp.add_circle((4, 4), 1.5, dxfattribs={'layer': 'ANNOTATIONS', 'color': 2})
+    msp.add_arc((6, 6), 2, 10, 200)
+    msp.add_text('Séjour', dxfattribs={'layer': 'ANNOTATIONS', 'height': 0.5}).set_placement((2, 3))
+
+    # Block content and paper space are not part of the extraction
+    block = doc.blocks.new('MEUBLE')
+    block.add_circle((0, 0), 1)
+    msp.add_blockref('MEUBLE', (7, 7))
+    doc.paperspace().add_line((0, 0), (1, 1))
+
+    doc.saveas(path)
+    return path
+
+
+@pytest.fixture(scope='module', params=DXF_VERSIONS)
+def drawing(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp('dxf') / f"{request.param}.dxf"
+    return build_drawing(request.param, str(path))
+
+
+@pytest.mark.parametrize('profile_name', sorted(PROFILES))
+def test_streaming_matches_full_extraction(drawing, profile_name):
+    profile = PROFILES[profile_name]
+    source = DxfSource.from_path(drawing)
+
+    full = extract_source_data(source, EXTRACTION_MODE_FULL, profile)
+    streamed = extract_source_data(source, EXTRACTION_MODE_STREAMING, profile)
+
+    assert "error" not in full
+    assert serialize_extraction_result(streamed) == serialize_extraction_result(full)
+
+
+def test_streaming_counts_every_modelspace_entity(drawing):
+    source = DxfSource.from_path(drawing)
+
+    result = extract_source_data(source, EXTRACTION_MODE_STREAMING)
+
+    statistics = result['statistics']
+    extracted = sum(statistics[f"{kind}_count"] for kind in ('polyline', 'line', 'circle', 'arc', 'text'))
+    # The block reference is counted but not extracted
+    assert statistics['total_entities'] == extracted + 1
+    assert {layer['name'] for layer in result['layers']} >= {'0', 'ANNOTATIONS', 'GEX_EDS_SDP_1-HABITATION_L'}
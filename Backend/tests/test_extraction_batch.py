@@ -0,0 +1,52 @@
+"""Overall deadline of the batch extraction stream."""
+
+import json
+
+import ezdxf
+import pytest
+
+import folder_service
+from app.services.process_pool import ProcessPool
+
+OWNER = 'alice@example.com'
+
+
+@pytest.fixture
+def drawings(tmp_path, monkeypatch):
+    for position in range(2):
+        doc = ezdxf.new('R2010')
+        doc.modelspace().add_lwpolyline([(0, 0), (position + 1, 0), (0, 1)], close=True)
+        doc.saveas(tmp_path / f"plan{position}.dxf")
+
+    def resolve(email, filename, folder=""):
+        return str(tmp_path / filename), str(tmp_path)
+
+    monkeypatch.setattr(folder_service, 'resolve_user_file_path', resolve)
+    return [{'filename': f"plan{position}.dxf"} for position in range(2)]
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_streams_every_file(client, drawings):
+    lines = read_lines(client.post('/extract-data-batch', json={'email': OWNER, 'files': drawings}))
+
+    assert [line['status'] for line in lines[:-1]] == ['ok', 'ok']
+    assert lines[-1] == {'done': True, 'total': 2, 'succeeded': 2, 'failed': 0, 'unique': 2}
+
+
+def test_batch_past_its_deadline_reports_unfinished_files(client, drawings, monkeypatch):
+    pool = ProcessPool(max_workers=1, task_timeout=30, enabled=True, start_method='spawn', preload=())
+    monkeypatch.setattr(folder_service, 'process_pool', pool)
+    monkeypatch.setattr(folder_service, 'BATCH_TIMEOUT', 0)
+    try:
+        lines = read_lines(client.post('/extract-data-batch', json={'email': OWNER, 'files': drawings}))
+        metrics = pool.metrics()
+    finally:
+        pool.shutdown()
+
+    assert sorted(line['filename'] for line in lines[:-1]) == ['plan0.dxf', 'plan1.dxf']
+    assert all(line['status'] == 'error' and 'Délai' in line['error'] for line in lines[:-1])
+    assert lines[-1] == {'done': True, 'total': 2, 'succeeded': 0, 'failed': 2, 'unique': 2}
+    assert metrics['queue_depth'] == 0
@@ -0,0 +1,77 @@
+"""Document ids of the paginated extraction API come from clients and must not reach the file system."""
+
+import ezdxf
+import pytest
+
+from app.services.dxf_extractor import extract_document
+from app.services.extraction_cache import EXTRACTOR_VERSION, ExtractionCache
+from app.services.extraction_index import extraction_indexes
+
+DIGEST = '0123456789abcdef' * 4
+
+CRAFTED_IDS = [
+    '../../../etc/passwd',
+    '/etc/passwd',
+    f'{DIGEST}-v{EXTRACTOR_VERSION}/../../secret',
+    f'{DIGEST}-v{EXTRACTOR_VERSION}-../../secret',
+    f'../{DIGEST}-v{EXTRACTOR_VERSION}',
+    f'{DIGEST}-v{EXTRACTOR_VERSION}\n',
+    f'{DIGEST.upper()}-v{EXTRACTOR_VERSION}',
+    ['not', 'a', 'string'],
+    {'$ne': None}
+]
+
+
+def document_result():
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (4, 0), (4, 3)], close=True, dxfattribs={'layer': 'GEX_EDS_SDP_1-HABITATION_L'})
+    msp.add_line((0, 0), (1, 1), dxfattribs={'layer': 'ANNOTATIONS'})
+    return extract_document(doc)
+
+
+@pytest.mark.parametrize('document_id', CRAFTED_IDS)
+def test_page_rejects_crafted_document_id(client, document_id):
+    response = client.post('/extract-data-page', json={'documentId': document_id, 'email': 'alice@example.com',
+                                                       'filename': 'plan.dxf'})
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Identifiant de document invalide"}
+
+
+def test_page_requires_email(client):
+    response = client.post('/extract-data-page', json={'documentId': ExtractionCache.make_key(DIGEST)})
+
+    assert response.status_code == 400
+
+
+def test_page_is_only_served_to_the_user_who_extracted_it(client):
+    document_id = ExtractionCache.make_key('f' * 64)
+    extraction_indexes.put(document_id, document_result(), 'alice@example.com')
+
+    own = client.post('/extract-data-page', json={'documentId': document_id, 'email': 'alice@example.com'})
+    other = client.post('/extract-data-page', json={'documentId': document_id, 'email': 'mallory@example.com'})
+
+    assert own.status_code == 200
+    assert other.status_code == 404
+
+
+@pytest.mark.parametrize('key', CRAFTED_IDS)
+def test_cache_refuses_keys_outside_its_directory(tmp_path, key):
+    cache = ExtractionCache(cache_dir=str(tmp_path / 'cache'), enabled=True)
+
+    with pytest.raises(ValueError):
+        cache.get(key)
+    assert not cache.put(key, document_result())
+    assert not any(tmp_path.rglob('*.tmp'))
+    assert not any(tmp_path.rglob('*.json'))
+
+
+def test_cache_directory_is_private(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache = ExtractionCache(cache_dir=str(cache_dir), enabled=True)
+    key = ExtractionCache.make_key(DIGEST)
+
+    assert cache.put(key, document_result())
+    assert (cache_dir.stat().st_mode & 0o777) == 0o700
+    assert cache.get(key)['statistics'] == document_result()['statistics']
@@ -0,0 +1,108 @@
+"""Vectorized shoelace areas against the per-polyline formula of the original workbook code."""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.services.polyline_set import SHOELACE_SCALAR_TAIL, PolylineSet, shoelace_areas
+
+
+def scalar_area(vertices):
+    """Signed shoelace area, summed vertex by vertex like calculate_area."""
+    if len(vertices) < 3:
+        return 0.0
+    area = 0.0
+    n = len(vertices)
+    for i in range(n):
+        j = (i + 1) % n
+        area += vertices[i]['x'] * vertices[j]['y']
+        area -= vertices[j]['x'] * vertices[i]['y']
+    return area / 2.0
+
+
+def random_polylines(seed, count, max_vertices):
+    rnd = random.Random(seed)
+    polylines = []
+    for _ in range(count):
+        n = rnd.randint(0, max_vertices)
+        cx, cy = rnd.uniform(-1e4, 1e4), rnd.uniform(-1e4, 1e4)
+        polylines.append({'type': 'LWPOLYLINE', 'layer': 'GEX_EDS_SDP_1-HABITATION_L', 'closed': True,
+                          'vertices': [{'x': cx + rnd.uniform(-50, 50), 'y': cy + rnd.uniform(-50, 50)}
+                                       for _ in range(n)]})
+    return polylines
+
+
+@pytest.mark.parametrize('seed, count, max_vertices', [
+    (1, 200, 6),
+    (2, 50, 400),                           # long polylines finished by the scalar tail
+    (3, SHOELACE_SCALAR_TAIL - 1, 30),      # fewer polylines than the tail: scalar only
+    (4, 500, 3)
+])
+def test_shoelace_areas_match_scalar_formula(seed, count, max_vertices):
+    polylines = random_polylines(seed, count, max_vertices)
+    polyline_set = PolylineSet.from_dicts(polylines)
+
+    areas = polyline_set.signed_areas()
+
+    # Same operations in the same order: results are bit-identical, not just close
+    assert areas.tolist() == [scalar_area(p['vertices']) for p in polylines]
+
+
+def test_shoelace_areas_signs_and_degenerate_polylines():
+    square = [(0, 0), (2, 0), (2, 2), (0, 2)]
+    coords = np.array(square + square[::-1] + [(0, 0), (1, 1)] + [(5, 5), (6, 6), (7, 7)], dtype=np.float64)
+    offsets = np.array([0, 4, 8, 10, 13], dtype=np.int64)
+
+    assert shoelace_areas(coords, offsets).tolist() == [4.0, -4.0, 0.0, 0.0]
+
+
+def test_shoelace_areas_empty_buffer():
+    areas = shoelace_areas(np.empty((0, 2), dtype=np.float64), np.zeros(1, dtype=np.int64))
+
+    assert areas.shape == (0,)
+
+
+def columnar_payload(**overrides):
+    payload = PolylineSet.from_dicts(random_polylines(5, 4, 5)).to_columnar()
+    payload.update(overrides)
+    return payload
+
+
+def test_columnar_round_trip():
+    payload = columnar_payload()
+
+    assert PolylineSet.from_columnar(payload).to_columnar() == payload
+
+
+@pytest.mark.parametrize('overrides', [
+    {'type_ids': [0, 1, 2, 0]},
+    {'type_ids': [0, 0, 0, -1]},
+    {'type_ids': [0, 0, 0, 300]},
+    {'types': ['LWPOLYLINE'], 'type_ids': [0, 1, 0, 0]},
+    {'layer_ids': [0, 0, 0, 5]},
+    {'colors': [1, 1, 1, 10 ** 6]},
+    {'closed': [True]},
+    {'offsets': [0, 2, 1, 4, 9]},
+    {'offsets': [1, 2, 3, 4, 5]},
+    {'offsets': [0, 1, 2, 3, 10 ** 30]},
+    {'offsets': []},
+    {'offsets': [[0, 1]]},
+    {'coords': [0.0, 1.0, 2.0]},
+    {'coords': ['a', 'b']},
+    {'coords': 12}
+])
+def test_columnar_payload_is_validated(overrides):
+    with pytest.raises(ValueError):
+        PolylineSet.from_columnar(columnar_payload(**overrides))
+
+
+def test_bad_columnar_payload_is_a_client_error(client):
+    surfaces = {'projet': {'polylines': columnar_payload(type_ids=[0, 0, 0, 9]), 'surface': 1.0},
+                'existant': {'polylines': [], 'surface': 0.0}, 'difference': 1.0}
+
+    response = client.post('/generate-excel-file', json={'email': 'alice@example.com', 'surfaces': surfaces,
+                                                         'floorName': 'RDC', 'returnFile': True})
+
+    assert response.status_code == 400
+    assert 'Polylignes invalides' in response.get_json()['error']
@@ -0,0 +1,142 @@
+"""Timeouts and cancellation of the worker process pool."""
+
+import threading
+import time
+
+import pytest
+
+import folder_service
+from app.services.process_pool import (TASK_RUNNING, ProcessPool, TaskCancelledError, TaskTimeoutError,
+                                       as_completed)
+
+
+@pytest.fixture
+def pool():
+    # No preloaded modules: workers start in well under a second
+    pool = ProcessPool(max_workers=1, task_timeout=30, enabled=True, start_method='spawn', preload=())
+    yield pool
+    pool.shutdown()
+
+
+def wait_until_running(task, timeout=30):
+    deadline = time.monotonic() + timeout
+    while task.state != TASK_RUNNING or task.started_at is None:
+        assert time.monotonic() < deadline, "task never started"
+        time.sleep(0.01)
+    # Leave the dispatcher the time to hand the task to the worker
+    time.sleep(0.2)
+
+
+def test_task_result_and_error(pool):
+    assert pool.run(divmod, 7, 2) == (3, 1)
+    with pytest.raises(ValueError):
+        pool.run(int, 'not a number')
+    assert pool.metrics()['completed'] == 1
+    assert pool.metrics()['failed'] == 1
+
+
+def test_task_timeout_kills_the_worker(pool):
+    pool.run(divmod, 1, 1)  # warm worker, so the timeout only covers the task
+
+    started = time.monotonic()
+    with pytest.raises(TaskTimeoutError):
+        pool.run(time.sleep, 30, timeout=0.5)
+
+    assert time.monotonic() - started < 10
+    metrics = pool.metrics()
+    assert metrics['timeouts'] == 1
+    assert metrics['worker_restarts'] == 1
+    # A fresh worker takes over
+    assert pool.run(divmod, 9, 4) == (2, 1)
+
+
+def test_run_gives_up_on_a_task_stuck_in_the_queue(pool):
+    blocker = pool.submit(time.sleep, 30)
+    wait_until_running(blocker)
+
+    started = time.monotonic()
+    with pytest.raises(TaskTimeoutError):
+        pool.run(divmod, 1, 1, wait_timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    metrics = pool.metrics()
+    assert metrics['cancelled'] == 1
+    assert metrics['queue_depth'] == 0
+    assert pool.cancel(blocker.id)
+
+
+def test_cancel_running_task(pool):
+    task = pool.submit(time.sleep, 30, owner='alice@example.com')
+    wait_until_running(task)
+
+    started = time.monotonic()
+    assert pool.cancel(task.id, owner='alice@example.com')
+    with pytest.raises(TaskCancelledError):
+        task.result(timeout=10)
+
+    assert time.monotonic() - started < 10
+    assert pool.metrics()['cancelled'] == 1
+    assert not pool.cancel(task.id, owner='alice@example.com')
+
+
+def test_cancel_queued_task(pool):
+    running = pool.submit(time.sleep, 30, owner='alice@example.com')
+    queued = pool.submit(divmod, 1, 1, owner='alice@example.com')
+
+    assert pool.cancel(queued.id, owner='alice@example.com')
+    with pytest.raises(TaskCancelledError):
+        queued.result(timeout=0)
+    assert pool.cancel(running.id)
+
+
+def test_cancel_is_limited_to_the_owner(pool):
+    task = pool.submit(time.sleep, 30, owner='alice@example.com')
+    wait_until_running(task)
+
+    assert not pool.cancel(task.id, owner='mallory@example.com')
+    assert not task.cancel_requested
+    assert pool.cancel(task.id, owner='alice@example.com')
+
+
+def test_as_completed_timeout(pool):
+    tasks = [pool.submit(time.sleep, 30)]
+
+    with pytest.raises(TimeoutError):
+        list(as_completed(tasks, timeout=0.2))
+    assert pool.cancel(tasks[0].id)
+
+
+def test_inline_task_runs_outside_the_pool_lock():
+    pool = ProcessPool(enabled=False)
+    started, release = threading.Event(), threading.Event()
+
+    def task():
+        started.set()
+        release.wait(10)
+        return 'done'
+
+    runner = threading.Thread(target=lambda: pool.run(task))
+    runner.start()
+    try:
+        assert started.wait(10)
+        # Another request reading the pool state is not blocked by the inline task
+        reader = threading.Thread(target=pool.metrics)
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive()
+    finally:
+        release.set()
+        runner.join(10)
+    assert pool.metrics()['completed'] == 1
+
+
+def test_cancel_route_requires_the_owner(client, pool, monkeypatch):
+    monkeypatch.setattr(folder_service, 'process_pool', pool)
+    task = pool.submit(time.sleep, 30, owner='alice@example.com')
+    url = f'/process-pool/tasks/{task.id}/cancel'
+
+    assert client.post(url).status_code == 400
+    assert client.post(url, json={'email': 'mallory@example.com'}).status_code == 404
+    assert client.post(url, json={'email': 'alice@example.com'}).status_code == 202
+    with pytest.raises(TaskCancelledError):
+        task.result(timeout=10)
@@ -0,0 +1,230 @@
+"""Retries, attempt limit and leases of the SQLite report job queue."""
+
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+import folder_service
+from app.services.report_jobs import (JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, TERMINAL_STATES, JobError,
+                                      ReportJobQueue)
+
+OWNER = 'alice@example.com'
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'report_jobs.db')
+
+
+def make_queue(db_path, **options):
+    options.setdefault('max_attempts', 3)
+    options.setdefault('retry_delay', 0)
+    options.setdefault('poll_interval', 0.05)
+    return ReportJobQueue(db_path=db_path, workers=1, **options)
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job['status'] in TERMINAL_STATES:
+            return job
+        assert time.monotonic() < deadline, f"job still {job['status']}"
+        time.sleep(0.02)
+
+
+class FlakyHandler:
+    """Fails a given number of times, then returns the payload."""
+
+    def __init__(self, failures, error=RuntimeError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, payload):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(f"échec {self.calls}")
+        return {'echo': payload['value']}
+
+
+def test_job_is_retried_until_it_succeeds(db_path):
+    queue = make_queue(db_path)
+    handler = FlakyHandler(failures=2)
+    queue.register('report', handler)
+
+    job = wait_for(queue, queue.submit('report', OWNER, {'value': 42})['id'])
+
+    assert job['status'] == JOB_DONE
+    assert job['result'] == {'echo': 42}
+    assert job['attempts'] == 3
+    assert handler.calls == 3
+
+
+def test_job_fails_at_the_attempt_limit(db_path):
+    queue = make_queue(db_path, max_attempts=2)
+    handler = FlakyHandler(failures=5)
+    queue.register('report', handler)
+
+    job = wait_for(queue, queue.submit('report', OWNER, {'value': 1})['id'])
+
+    assert job['status'] == JOB_FAILED
+    assert job['error'] == "échec 2"
+    assert job['attempts'] == 2
+    assert handler.calls == 2
+
+
+def test_job_error_is_not_retried(db_path):
+    queue = make_queue(db_path)
+    handler = FlakyHandler(failures=5, error=JobError)
+    queue.register('report', handler)
+
+    job = wait_for(queue, queue.submit('report', OWNER, {'value': 1})['id'])
+
+    assert job['status'] == JOB_FAILED
+    assert handler.calls == 1
+
+
+def test_jobs_are_private_to_their_owner(db_path):
+    queue = make_queue(db_path)
+    queue.register('report', FlakyHandler(failures=0))
+
+    job_id = queue.submit('report', OWNER, {'value': 1})['id']
+
+    assert queue.get(job_id, owner=OWNER)['id'] == job_id
+    assert queue.get(job_id, owner='mallory@example.com') is None
+    with pytest.raises(ValueError):
+        queue.submit('unknown', OWNER, {})
+
+
+def insert_running_job(queue, attempts, lease_until):
+    """A job left running by a process that died, as found in the shared file."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = queue._connect()
+    try:
+        conn.execute(
+            'INSERT INTO report_job (id, kind, owner, status, payload, attempts, max_attempts, '
+            'created_at, updated_at, run_after, lease_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'report', OWNER, JOB_RUNNING, '{"value": 7}', attempts, queue.max_attempts,
+             now, now, now, lease_until))
+    finally:
+        conn.close()
+    return job_id
+
+
+def test_expired_lease_is_run_again(db_path):
+    queue = make_queue(db_path)
+    handler = FlakyHandler(failures=0)
+    queue.register('report', handler)
+    job_id = insert_running_job(queue, attempts=1, lease_until=time.time() - 1)
+
+    queue.start()
+    job = wait_for(queue, job_id)
+
+    assert job['status'] == JOB_DONE
+    assert job['attempts'] == 2
+    assert handler.calls == 1
+
+
+def test_expired_lease_after_the_last_attempt_fails_the_job(db_path):
+    queue = make_queue(db_path)
+    handler = FlakyHandler(failures=0)
+    queue.register('report', handler)
+    job_id = insert_running_job(queue, attempts=3, lease_until=time.time() - 1)
+
+    queue.start()
+    job = wait_for(queue, job_id)
+
+    assert job['status'] == JOB_FAILED
+    assert job['attempts'] == 3
+    assert job['error'] == "Processus arrêté pendant la dernière exécution"
+    assert handler.calls == 0
+
+
+def test_lease_is_renewed_while_the_job_runs(db_path):
+    calls = []
+    release = threading.Event()
+
+    def slow_handler(payload):
+        calls.append(payload['value'])
+        release.wait(10)
+        return {}
+
+    # Two processes sharing the file; the job outlives its lease several times over
+    first, second = make_queue(db_path, lease=0.3), make_queue(db_path, lease=0.3)
+    for queue in (first, second):
+        queue.register('report', slow_handler)
+    second.start()
+    job_id = first.submit('report', OWNER, {'value': 1})['id']
+
+    time.sleep(1.5)
+    assert first.get(job_id)['status'] == JOB_RUNNING
+    release.set()
+
+    job = wait_for(first, job_id)
+    assert job['status'] == JOB_DONE
+    assert job['attempts'] == 1
+    assert calls == [1]
+
+
+def test_retry_waits_for_its_delay(db_path):
+    queue = make_queue(db_path, retry_delay=30)
+    queue.register('report', FlakyHandler(failures=1))
+
+    job_id = queue.submit('report', OWNER, {'value': 1})['id']
+    deadline = time.monotonic() + 10
+    while queue.get(job_id)['attempts'] < 1 or queue.get(job_id)['status'] != JOB_QUEUED:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+    time.sleep(0.3)
+    job = queue.get(job_id)
+    assert job['status'] == JOB_QUEUED
+    assert job['attempts'] == 1
+    assert job['error'] == "échec 1"
+
+
+def test_follow_stream_ends_at_its_time_limit(client, db_path, monkeypatch):
+    release = threading.Event()
+    queue = make_queue(db_path)
+    queue.register('report', lambda payload: release.wait(10) and {})
+    monkeypatch.setattr(folder_service, 'report_jobs', queue)
+    monkeypatch.setattr(folder_service, 'REPORT_JOB_FOLLOW_TIMEOUT', 0.3)
+    job_id = queue.submit('report', OWNER, {'value': 1})['id']
+
+    started = time.monotonic()
+    response = client.get(f'/report-jobs/{job_id}/events', query_string={'email': OWNER})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    release.set()
+
+    assert response.status_code == 200
+    assert time.monotonic() - started < 5
+    assert lines and lines[-1]['status'] in (JOB_QUEUED, JOB_RUNNING)
+
+
+@pytest.mark.parametrize('payload', [
+    {'email': OWNER},
+    {'email': OWNER, 'surfaces': {'projet': {'polylines': []}}, 'overlayMode': 'unknown'},
+    {'email': OWNER, 'surfaces': {'projet': {'polylines': {'offsets': [0, 5], 'coords': []}}}},
+    {'surfaces': {'projet': {'polylines': []}}}
+])
+def test_invalid_report_payload_fails_without_retry(db_path, payload):
+    queue = make_queue(db_path, retry_delay=30)
+    queue.register('surface_report', folder_service.run_surface_report_job)
+
+    job = wait_for(queue, queue.submit('surface_report', OWNER, payload)['id'])
+
+    assert job['status'] == JOB_FAILED
+    assert job['attempts'] == 1
+
+
+def test_invalid_polylines_are_refused_at_submission(client):
+    surfaces = {'projet': {'polylines': {'offsets': [0, 5], 'coords': []}, 'surface': 1.0}}
+
+    response = client.post('/report-jobs', json={'email': OWNER, 'surfaces': surfaces})
+
+    assert response.status_code == 400
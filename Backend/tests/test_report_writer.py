@@ -0,0 +1,75 @@
+"""
+The legacy overlay mode must keep producing the workbook of the original code.
+
+fixtures/baseline_workbooks.json holds the cell values and comments of the
+workbook written by the original generate_excel_file for each floor of
+fixtures/floors.json.
+"""
+
+import copy
+import io
+import os
+import time
+from urllib.parse import unquote
+
+import openpyxl
+import pytest
+
+from app.services.polyline_set import PolylineSet
+from app.services.surface_engine import OVERLAY_LEGACY
+from conftest import load_fixture
+from folder_service import build_excel_bytes, normalize_surface_polylines
+
+FLOORS = load_fixture('floors.json')
+BASELINE = load_fixture('baseline_workbooks.json')
+CASES = list(zip(FLOORS, BASELINE))
+IDS = [floor['floor_name'] for floor in FLOORS]
+
+
+def workbook_cells(content):
+    """Cell values and comment texts of every sheet, in the JSON shape of the fixture."""
+    workbook = openpyxl.load_workbook(io.BytesIO(content))
+    return {sheet.title: [[[cell.value, cell.comment.text if cell.comment else None] for cell in row]
+                          for row in sheet.iter_rows()]
+            for sheet in workbook.worksheets}
+
+
+@pytest.mark.parametrize('floor, expected', CASES, ids=IDS)
+def test_legacy_workbook_matches_baseline(floor, expected):
+    surfaces = copy.deepcopy(floor['surfaces'])
+
+    content = build_excel_bytes(surfaces, floor['floor_name'], OVERLAY_LEGACY)
+
+    assert workbook_cells(content) == expected
+
+
+@pytest.mark.parametrize('floor, expected', CASES, ids=IDS)
+def test_columnar_payload_gives_the_same_workbook(floor, expected):
+    surfaces = copy.deepcopy(floor['surfaces'])
+    for side in ('existant', 'projet'):
+        surfaces[side]['polylines'] = PolylineSet.from_dicts(surfaces[side]['polylines']).to_columnar()
+
+    content = build_excel_bytes(normalize_surface_polylines(surfaces), floor['floor_name'], OVERLAY_LEGACY)
+
+    assert workbook_cells(content) == expected
+
+
+def test_returned_workbook_path_header(client, user_folder):
+    email, folder = user_folder
+    floor = FLOORS[0]
+
+    response = client.post('/generate-excel-file', json={'email': email, 'surfaces': copy.deepcopy(floor['surfaces']),
+                                                         'floorName': 'Étage 1', 'folderPath': 'Résidence',
+                                                         'returnFile': True})
+
+    assert response.status_code == 200
+    path = response.headers['X-File-Path']
+    assert path.isascii()
+    assert unquote(path).startswith(os.path.join(folder, 'Résidence'))
+    # The copy on disk is written in the background
+    deadline = time.monotonic() + 10
+    while not os.path.exists(unquote(path)):
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    assert workbook_cells(response.get_data()) == workbook_cells(
+        build_excel_bytes(copy.deepcopy(floor['surfaces']), 'Étage 1', OVERLAY_LEGACY))
@@ -0,0 +1,91 @@
+"""
+The templated visa report must print exactly the text of the original code.
+
+fixtures/baseline_visa.json holds, for each case, the text of the original
+generate_visa_content ('texts') and the text of the string-building version
+that added the SDP and TA section, given the results of the first floor of
+fixtures/floors.json ('texts_with_results'); both generated at FIXED_NOW.
+"""
+
+import copy
+import datetime
+import os
+from urllib.parse import unquote
+
+import pytest
+from werkzeug import http
+
+from app.services.surface_engine import OVERLAY_LEGACY, compute_floor_surfaces
+from app.services.visa_report import FLOOR_SEPARATOR, visa_context, visa_renderer
+from conftest import load_fixture
+
+FIXED_NOW = datetime.datetime(2026, 3, 4, 5, 6, 7)
+
+BASELINE = load_fixture('baseline_visa.json')
+CASES = list(zip(BASELINE['cases'], BASELINE['texts'], BASELINE['texts_with_results']))
+
+
+@pytest.fixture(scope='module')
+def results():
+    floor = load_fixture('floors.json')[0]
+    return compute_floor_surfaces(copy.deepcopy(floor['surfaces']), floor['floor_name'], OVERLAY_LEGACY)
+
+
+@pytest.mark.parametrize('case, text, _', CASES)
+def test_visa_matches_baseline(case, text, _):
+    context = visa_context(case['surfaces'], case['floor_name'], now=FIXED_NOW)
+
+    assert visa_renderer.render([context]) == text
+
+
+@pytest.mark.parametrize('case, _, text', CASES)
+def test_visa_with_results_matches_baseline(case, _, text, results):
+    context = visa_context(case['surfaces'], case['floor_name'], results, now=FIXED_NOW)
+
+    assert visa_renderer.render([context]) == text
+
+
+def test_written_report_matches_rendered_text(tmp_path, results):
+    contexts = [visa_context(case['surfaces'], case['floor_name'], results, now=FIXED_NOW)
+                for case in BASELINE['cases'][:3]]
+    path = tmp_path / 'visa.txt'
+
+    visa_renderer.write(iter(contexts), str(path))
+
+    expected = FLOOR_SEPARATOR.join(BASELINE['texts_with_results'][:3])
+    assert path.read_text(encoding='utf-8') == expected
+    assert visa_renderer.render(contexts) == expected
+
+
+@pytest.mark.parametrize('floor_name', ['RDC', 'Étage "haut"'])
+def test_returned_visa_file(client, user_folder, floor_name):
+    email, folder = user_folder
+    case = BASELINE['cases'][5]
+
+    response = client.post('/generate-visa-file', json={'email': email, 'surfaces': case['surfaces'],
+                                                        'floorName': floor_name, 'returnFile': True})
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    file_name = f"visa_{floor_name.replace(' ', '_')}.txt"
+    disposition = response.headers['Content-Disposition']
+    assert disposition.startswith('attachment;')
+    assert http.parse_options_header(disposition) == ('attachment', {'filename': file_name})
+    output = os.path.join(folder, 'Output')
+    assert os.listdir(output) == [file_name]
+    assert response.headers['X-File-Path'].isascii()
+    assert unquote(response.headers['X-File-Path']) == os.path.join(output, file_name)
+    with open(os.path.join(output, file_name), encoding='utf-8') as f:
+        assert f.read() == text
+
+
+def test_interrupted_visa_stream_leaves_no_file(client, user_folder):
+    email, folder = user_folder
+    case = BASELINE['cases'][5]
+
+    response = client.post('/generate-visa-file', json={'email': email, 'surfaces': case['surfaces'],
+                                                        'floorName': 'RDC', 'returnFile': True}, buffered=False)
+    next(iter(response.response))
+    response.close()
+
+    assert os.listdir(os.path.join(folder, 'Output')) == []
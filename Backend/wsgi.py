@@ -6,6 +6,7 @@ Used by gunicorn and other WSGI servers.
 import os
 import sys
 from app import create_app
+from app.services.report_jobs import report_jobs
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(__file__))
@@ -13,6 +14,9 @@ sys.path.insert(0, os.path.dirname(__file__))
 # Create the Flask application
 app = create_app()
 
+# Start the report job dispatchers of this worker instead of waiting for the first job request
+report_jobs.start()
+
 if __name__ == "__main__":
     # For development only
     app.run(host="0.0.0.0", port=5000, debug=False)
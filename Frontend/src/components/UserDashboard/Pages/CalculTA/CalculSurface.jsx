@@ -109,42 +109,22 @@ const CalculSurface = ({ extractedDataProjet, extractedDataExistant, setCalculRe
         return { email, folderPath };
     };
 
-    // Fonction pour générer le fichier visa.txt
-    const generateVisaFile = async (surfaces) => {
+    // Fonction pour générer le fichier visa.txt et le fichier Excel en un seul calcul
+    const generateReportFiles = async (surfaces) => {
         try {
             const { email, folderPath } = await getUserInfoAndFolder();
 
-            // Appel au service backend pour générer le fichier visa
-            const response = await axios.post(`${API_URL}/generate-visa-file`, {
+            // Appel au service backend : un seul calcul des surfaces pour le visa et l'Excel
+            const response = await axios.post(`${API_URL}/generate-report-files`, {
                 email: email,
                 surfaces: surfaces,
                 floorName: floorName || 'Sans nom',
                 folderPath: folderPath // Transmettre le dossier parent (M1, M2, etc.)
             });
 
-            return response.data.filePath;
+            return { visaPath: response.data.visaFilePath, excelPath: response.data.filePath };
         } catch (error) {
-            console.error('Erreur lors de la génération du fichier visa:', error);
-            throw error;
-        }
-    };
-
-    // Fonction pour générer le fichier Excel
-    const generateExcelFile = async (surfaces) => {
-        try {
-            const { email, folderPath } = await getUserInfoAndFolder();
-
-            // Appel au service backend pour générer le fichier Excel
-            const response = await axios.post(`${API_URL}/generate-excel-file`, {
-                email: email,
-                surfaces: surfaces,
-                floorName: floorName || 'Sans nom',
-                folderPath: folderPath
-            });
-
-            return response.data.filePath;
-        } catch (error) {
-            console.error('Erreur lors de la génération du fichier Excel:', error);
+            console.error('Erreur lors de la génération des fichiers visa et Excel:', error);
             throw error;
         }
     };
@@ -194,11 +174,8 @@ const CalculSurface = ({ extractedDataProjet, extractedDataExistant, setCalculRe
                     difference: difference
                 };
 
-                // Générer les fichiers visa.txt et Excel en parallèle
-                const [visaPath, excelPath] = await Promise.all([
-                    generateVisaFile(surfaces),
-                    generateExcelFile(surfaces)
-                ]);
+                // Générer les fichiers visa.txt et Excel à partir d'un seul calcul
+                const { visaPath, excelPath } = await generateReportFiles(surfaces);
                 
                 setVisaFilePath(visaPath);
                 setExcelFilePath(excelPath);